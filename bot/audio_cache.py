@@ -0,0 +1,237 @@
+"""On-disk audio cache: tracks that get replayed come off local disk.
+
+Session playlists are replayed every week, and every play used to pull the
+whole stream from YouTube again — in voice through ffmpeg, in the browser
+through the audio proxy. Now the first play streams from YouTube as before
+while a background task downloads the same stream into the cache; later plays
+read the local file. A byte budget caps the directory, and the tracks played
+least recently are evicted first.
+
+Files are named after the track's youtube_id. Recency survives restarts
+because a cache hit touches the file's mtime, and the index is rebuilt from
+the directory, oldest first, on first use. Streams whose container the URL
+does not name are not cached: the extension is what tells ffmpeg's Opus
+passthrough apart from a file that needs decoding.
+
+All file I/O runs in worker threads; the event loop only ever waits on it.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlparse
+
+import aiohttp
+
+from bot.db import DATA_DIR
+
+log = logging.getLogger(__name__)
+
+# Fetch in ranges: googlevideo throttles a single long-running request to
+# roughly playback speed, but serves each bounded range at full speed.
+_CHUNK_BYTES = 10 * 1024 * 1024
+_READ_BYTES = 65536
+# Downloaded bytes are handed to a worker thread in writes of about this size.
+_WRITE_BYTES = 1024 * 1024
+_MAX_CONCURRENT_FILLS = 2
+
+_CONTENT_TYPES = {"webm": "audio/webm", "m4a": "audio/mp4", "opus": "audio/ogg"}
+_EXT_BY_MIME = {"audio/webm": "webm", "audio/mp4": "m4a", "audio/ogg": "opus"}
+_NAME_RE = re.compile(r"^([A-Za-z0-9_-]{11})\.(\w+)$")
+
+
+def _budget_bytes() -> int:
+    try:
+        return int(float(os.environ.get("AUDIO_CACHE_MB", "2048")) * 1024 * 1024)
+    except ValueError:
+        log.warning("AUDIO_CACHE_MB is not a number; using 2048")
+        return 2048 * 1024 * 1024
+
+
+def _ext_for(url: str) -> str | None:
+    """Container extension from the `mime=` param of a googlevideo URL."""
+    mime = (parse_qs(urlparse(url).query).get("mime") or [""])[0]
+    return _EXT_BY_MIME.get(mime.split(";")[0].strip())
+
+
+def codec_for(path: str) -> str | None:
+    """The codec a cached file holds; YouTube's webm audio is always Opus."""
+    return "opus" if path.endswith((".webm", ".opus")) else None
+
+
+def content_type_for(path: str) -> str:
+    return _CONTENT_TYPES.get(path.rsplit(".", 1)[-1], "application/octet-stream")
+
+
+class AudioCache:
+    def __init__(self, directory: str, budget: int) -> None:
+        self.directory = directory
+        self.budget = budget
+        # youtube_id -> (path, size), least recently used first.
+        self._entries: OrderedDict[str, tuple[str, int]] = OrderedDict()
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self._fills: dict[str, asyncio.Task] = {}
+        self._fill_slots = asyncio.Semaphore(_MAX_CONCURRENT_FILLS)
+        self._client: aiohttp.ClientSession | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0
+
+    async def _load(self) -> None:
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            found = await asyncio.to_thread(self._scan)
+            for _, youtube_id, path, size in found:
+                self._entries[youtube_id] = (path, size)
+            self._loaded = True
+        if found:
+            log.info("Audio cache: %d tracks, %.0f MB", len(found), self._total() / 1e6)
+
+    def _scan(self) -> list[tuple[float, str, str, int]]:
+        """The cached files, least recently used first. Runs in a worker thread."""
+        os.makedirs(self.directory, exist_ok=True)
+        found: list[tuple[float, str, str, int]] = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".part"):
+                _unlink(entry.path)   # a fill the last run never finished
+                continue
+            m = _NAME_RE.match(entry.name)
+            if m and entry.is_file():
+                st = entry.stat()
+                found.append((st.st_mtime, m.group(1), entry.path, st.st_size))
+        return sorted(found)
+
+    def _total(self) -> int:
+        return sum(size for _, size in self._entries.values())
+
+    async def lookup(self, youtube_id: str) -> str | None:
+        """Path of the cached audio for youtube_id, marking it recently used."""
+        if not self.enabled:
+            return None
+        await self._load()
+        entry = self._entries.get(youtube_id)
+        if entry is None:
+            return None
+        path = entry[0]
+        try:
+            await asyncio.to_thread(os.utime, path)
+        except OSError:
+            self._entries.pop(youtube_id, None)   # deleted behind our back
+            return None
+        self._entries.move_to_end(youtube_id)
+        return path
+
+    def fill(self, youtube_id: str, url: str, headers: dict[str, str]) -> None:
+        """Download a resolved stream into the cache in the background.
+
+        A no-op when the track is already cached or already downloading, or
+        when the URL does not say which container the stream is in, so every
+        play path can call it without checking first.
+        """
+        if not self.enabled or youtube_id in self._fills or youtube_id in self._entries:
+            return
+        if _ext_for(url) is None:
+            log.debug("Audio cache: not caching %s, unknown container", youtube_id)
+            return
+        task = asyncio.create_task(self._fill(youtube_id, url, headers))
+        self._fills[youtube_id] = task
+        task.add_done_callback(lambda _t: self._fills.pop(youtube_id, None))
+
+    async def _fill(self, youtube_id: str, url: str, headers: dict[str, str]) -> None:
+        await self._load()
+        if youtube_id in self._entries:
+            return
+        final = os.path.join(self.directory, f"{youtube_id}.{_ext_for(url)}")
+        part = final + ".part"
+        async with self._fill_slots:
+            try:
+                size = await self._download(url, headers, part)
+            except Exception as exc:
+                log.info("Audio cache: fill failed for %s: %s", youtube_id, exc)
+                await asyncio.to_thread(_unlink, part)
+                return
+        await asyncio.to_thread(os.replace, part, final)
+        self._entries[youtube_id] = (final, size)
+        self._entries.move_to_end(youtube_id)
+        log.info("Audio cache: stored %s (%.1f MB)", youtube_id, size / 1e6)
+        await self._evict()
+
+    async def _download(self, url: str, headers: dict[str, str], dest: str) -> int:
+        if self._client is None or self._client.closed:
+            self._client = aiohttp.ClientSession()
+        written = 0
+        total: int | None = None
+        pending = bytearray()   # read but not yet handed to the writer thread
+        f = await asyncio.to_thread(open, dest, "wb")
+        try:
+            while total is None or written < total:
+                ranged = {**headers, "Range": f"bytes={written}-{written + _CHUNK_BYTES - 1}"}
+                async with self._client.get(url, headers=ranged) as resp:
+                    if resp.status not in (200, 206):
+                        raise RuntimeError(f"HTTP {resp.status}")
+                    if resp.status == 206:
+                        # "bytes 0-10485759/3456789"
+                        total = int(resp.headers.get("Content-Range", "").rsplit("/", 1)[-1])
+                    if total is not None and total > self.budget:
+                        raise RuntimeError("larger than the whole cache budget")
+                    before = written
+                    async for chunk in resp.content.iter_chunked(_READ_BYTES):
+                        pending += chunk
+                        written += len(chunk)
+                        if len(pending) >= _WRITE_BYTES:
+                            await asyncio.to_thread(f.write, pending)
+                            pending.clear()
+                    if resp.status == 200:
+                        break   # the server ignored Range and sent it all
+                    if written == before:
+                        raise RuntimeError("empty range response")
+            if pending:
+                await asyncio.to_thread(f.write, pending)
+        finally:
+            await asyncio.to_thread(f.close)
+        return written
+
+    async def discard(self, youtube_id: str) -> None:
+        """Drop a track's cached audio, e.g. when it leaves the library."""
+        await self._load()
+        entry = self._entries.pop(youtube_id, None)
+        if entry is not None:
+            await asyncio.to_thread(_unlink, entry[0])
+
+    async def _evict(self) -> None:
+        total = self._total()
+        evicted: list[str] = []
+        while total > self.budget and self._entries:
+            youtube_id, (path, size) = self._entries.popitem(last=False)
+            evicted.append(path)
+            total -= size
+            log.info("Audio cache: evicted %s", youtube_id)
+        for path in evicted:
+            await asyncio.to_thread(_unlink, path)
+
+    async def close(self) -> None:
+        for task in list(self._fills.values()):
+            task.cancel()
+        if self._client is not None:
+            await self._client.close()
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+cache = AudioCache(
+    os.environ.get("AUDIO_CACHE_DIR") or os.path.join(DATA_DIR, "audio"),
+    _budget_bytes(),
+)
@@ -9,8 +9,9 @@ from typing import TYPE_CHECKING
 import discord
 from discord import app_commands
 from discord.ext import commands
-from sqlalchemy import select
-from bot.db import Game, Player, async_session_factory
+from sqlalchemy import delete, select, update
+from bot.db import Game, Player, SchedulePoll, async_session_factory
+from bot.game_registry import GameInfo, registry as game_registry
 from bot.utils import count_games_where_dm, get_game_by_channel, get_game_by_name
 
 if TYPE_CHECKING:
@@ -31,8 +32,15 @@ CHANNEL_ORDER = [
 GAME_NAME_PATTERN = re.compile(r"^[\w\s\-']{1,100}$")
 
 
+def _character_name_update(game_id: int, user_id: int, is_dm: bool, name: str | None):
+    """UPDATE setting the DM's or a player's character name in one game."""
+    if is_dm:
+        return update(Game).where(Game.id == game_id).values(dm_character_name=name)
+    return update(Player).where(Player.game_id == game_id, Player.user_id == user_id).values(character_name=name)
+
+
 class DeleteGameView(discord.ui.View):
-    def __init__(self, game: Game, guild: discord.Guild, *, timeout: float = 60):
+    def __init__(self, game: GameInfo, guild: discord.Guild, *, timeout: float = 60):
         super().__init__(timeout=timeout)
         self.game = game
         self.guild = guild
@@ -61,7 +69,7 @@ class DeleteGameView(discord.ui.View):
 
 
 class TransferGameView(discord.ui.View):
-    def __init__(self, game: Game, new_dm: discord.Member, *, timeout: float = 60):
+    def __init__(self, game: GameInfo, new_dm: discord.Member, *, timeout: float = 60):
         super().__init__(timeout=timeout)
         self.game = game
         self.new_dm = new_dm
@@ -94,6 +102,18 @@ class GamesCog(commands.Cog):
         self.bot = bot
         self._register_commands()
 
+    @staticmethod
+    async def _poll_message_ids(session, game_id: int) -> set[int]:
+        return set((await session.scalars(
+            select(SchedulePoll.message_id).where(SchedulePoll.game_id == game_id)
+        )).all())
+
+    def _forget_polls(self, message_ids: set[int]) -> None:
+        """A deleted game's polls cascade away in SQLite; stop their reminders and tallies too."""
+        scheduling = self.bot.get_cog("SchedulingCog")
+        if message_ids and scheduling is not None:
+            scheduling.forget_polls(message_ids)
+
     async def _sync_dm_resource_role(self, guild: discord.Guild, user_id: int) -> None:
         """Add or remove the generic DM resource role so it matches whether this user is DM of any game."""
         role_id_str = os.environ.get("DM_RESOURCE_ROLE_ID", "").strip()
@@ -107,8 +127,7 @@ class GamesCog(commands.Cog):
         member = guild.get_member(user_id)
         if not role or not member:
             return
-        async with async_session_factory() as session:
-            count = await count_games_where_dm(session, guild.id, user_id)
+        count = await count_games_where_dm(guild.id, user_id)
         try:
             if count >= 1:
                 if role not in member.roles:
@@ -389,11 +408,9 @@ class GamesCog(commands.Cog):
                 ephemeral=True,
             )
             return
-        async with async_session_factory() as session:
-            existing = await get_game_by_name(session, interaction.guild.id, name)
-            if existing:
-                await interaction.response.send_message(f"A game named **{name}** already exists.", ephemeral=True)
-                return
+        if await get_game_by_name(interaction.guild.id, name):
+            await interaction.response.send_message(f"A game named **{name}** already exists.", ephemeral=True)
+            return
 
         await interaction.response.defer(ephemeral=True)
         try:
@@ -452,6 +469,7 @@ class GamesCog(commands.Cog):
                 session.add(game)
                 await session.commit()
                 await session.refresh(game)
+            game_registry.invalidate()
 
             await self._sync_dm_resource_role(guild, interaction.user.id)
             await interaction.followup.send(
@@ -468,21 +486,20 @@ class GamesCog(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
             return
-        async with async_session_factory() as session:
-            game = await get_game_by_name(session, interaction.guild.id, name)
-            if not game:
-                await interaction.response.send_message(f"No game named **{name}** found.", ephemeral=True)
-                return
-            if game.dm_user_id != interaction.user.id:
-                await interaction.response.send_message("Only the DM of that game can delete it.", ephemeral=True)
-                return
-            # Must be run outside game channels
-            if game.is_game_text_channel(interaction.channel_id):
-                await interaction.response.send_message(
-                    "Run this command **outside** the game channels (e.g. in a general server channel).",
-                    ephemeral=True,
-                )
-                return
+        game = await get_game_by_name(interaction.guild.id, name)
+        if not game:
+            await interaction.response.send_message(f"No game named **{name}** found.", ephemeral=True)
+            return
+        if game.dm_user_id != interaction.user.id:
+            await interaction.response.send_message("Only the DM of that game can delete it.", ephemeral=True)
+            return
+        # Must be run outside game channels
+        if game.is_game_text_channel(interaction.channel_id):
+            await interaction.response.send_message(
+                "Run this command **outside** the game channels (e.g. in a general server channel).",
+                ephemeral=True,
+            )
+            return
 
         view = DeleteGameView(game, interaction.guild)
         await interaction.response.send_message(
@@ -498,7 +515,7 @@ class GamesCog(commands.Cog):
 
         await self._do_delete_game(interaction, view, game)
 
-    async def _do_delete_game(self, interaction: discord.Interaction, view: DeleteGameView, game: Game):
+    async def _do_delete_game(self, interaction: discord.Interaction, view: DeleteGameView, game: GameInfo):
         guild = interaction.guild
         former_dm_id = game.dm_user_id
         try:
@@ -508,7 +525,7 @@ class GamesCog(commands.Cog):
                     await ch.delete()
             if cat:
                 await cat.delete()
-            dm_role = guild.get_role(getattr(game, "dm_role_id", None) or 0) if getattr(game, "dm_role_id", None) else None
+            dm_role = guild.get_role(game.dm_role_id) if game.dm_role_id else None
             if dm_role:
                 await dm_role.delete()
             role = guild.get_role(game.game_role_id)
@@ -517,8 +534,12 @@ class GamesCog(commands.Cog):
             async with async_session_factory() as session:
                 g = await session.get(Game, game.id)
                 if g:
+                    poll_ids = await self._poll_message_ids(session, game.id)
                     await session.delete(g)
                 await session.commit()
+            game_registry.invalidate()
+            if g:
+                self._forget_polls(poll_ids)
             await self._sync_dm_resource_role(guild, former_dm_id)
             await view.message.edit(content=f"Game **{game.name}** has been deleted.", view=None)
         except Exception as e:
@@ -529,29 +550,25 @@ class GamesCog(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
             return
-        async with async_session_factory() as session:
-            game = await get_game_by_channel(session, interaction.guild.id, interaction.channel_id)
-            if not game:
-                await interaction.response.send_message(
-                    "Run this command in one of the game's text channels (important, scheduling, or general).",
-                    ephemeral=True,
-                )
-                return
-            dm_member = interaction.guild.get_member(game.dm_user_id)
-            dm_mention = dm_member.mention if dm_member else f"<@{game.dm_user_id}>"
-            dm_display = f"{dm_mention} ({game.dm_character_name})" if getattr(game, "dm_character_name", None) else dm_mention
-            result = await session.execute(select(Player).where(Player.game_id == game.id))
-            players = result.scalars().all()
-            if not players:
-                player_list = "*No players yet.*"
-            else:
-                lines = []
-                for p in players:
-                    m = interaction.guild.get_member(p.user_id)
-                    mention = m.mention if m else f"<@{p.user_id}>"
-                    char = getattr(p, "character_name", None)
-                    lines.append(f"{mention} ({char})" if char else mention)
-                player_list = "\n".join(lines)
+        game = await get_game_by_channel(interaction.guild.id, interaction.channel_id)
+        if not game:
+            await interaction.response.send_message(
+                "Run this command in one of the game's text channels (important, scheduling, or general).",
+                ephemeral=True,
+            )
+            return
+        dm_member = interaction.guild.get_member(game.dm_user_id)
+        dm_mention = dm_member.mention if dm_member else f"<@{game.dm_user_id}>"
+        dm_display = f"{dm_mention} ({game.dm_character_name})" if game.dm_character_name else dm_mention
+        if not game.players:
+            player_list = "*No players yet.*"
+        else:
+            lines = []
+            for user_id, char in game.players.items():
+                m = interaction.guild.get_member(user_id)
+                mention = m.mention if m else f"<@{user_id}>"
+                lines.append(f"{mention} ({char})" if char else mention)
+            player_list = "\n".join(lines)
         embed = discord.Embed(
             title=game.name,
             description="DM and players for this game.",
@@ -570,28 +587,23 @@ class GamesCog(commands.Cog):
         if not name:
             await interaction.response.send_message("Please provide a character name (max 32 characters).", ephemeral=True)
             return
+        game = await get_game_by_channel(interaction.guild.id, interaction.channel_id)
+        if not game:
+            await interaction.response.send_message(
+                "Run this command in one of the game's text channels (important, scheduling, or general).",
+                ephemeral=True,
+            )
+            return
+        is_dm = game.dm_user_id == interaction.user.id
+        if not is_dm and interaction.user.id not in game.players:
+            await interaction.response.send_message("You are not a player in this game.", ephemeral=True)
+            return
+        # Checked against the registry first: the writer connection is only
+        # taken for the write, never held while Discord is answered.
         async with async_session_factory() as session:
-            game = await get_game_by_channel(session, interaction.guild.id, interaction.channel_id)
-            if not game:
-                await interaction.response.send_message(
-                    "Run this command in one of the game's text channels (important, scheduling, or general).",
-                    ephemeral=True,
-                )
-                return
-            if game.dm_user_id == interaction.user.id:
-                game_record = await session.get(Game, game.id)
-                if game_record:
-                    game_record.dm_character_name = name
-                await session.commit()
-                await interaction.response.send_message(f"Your character name for this game is now **{name}**.", ephemeral=True)
-                return
-            result = await session.execute(select(Player).where(Player.game_id == game.id, Player.user_id == interaction.user.id))
-            player = result.scalars().one_or_none()
-            if not player:
-                await interaction.response.send_message("You are not a player in this game.", ephemeral=True)
-                return
-            player.character_name = name
+            await session.execute(_character_name_update(game.id, interaction.user.id, is_dm, name))
             await session.commit()
+        game_registry.invalidate()
         await interaction.response.send_message(f"Your character name for this game is now **{name}**.", ephemeral=True)
 
     async def game_remove_nickname(self, interaction: discord.Interaction):
@@ -599,33 +611,24 @@ class GamesCog(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
             return
+        game = await get_game_by_channel(interaction.guild.id, interaction.channel_id)
+        if not game:
+            await interaction.response.send_message(
+                "Run this command in one of the game's text channels (important, scheduling, or general).",
+                ephemeral=True,
+            )
+            return
+        is_dm = game.dm_user_id == interaction.user.id
+        if not is_dm and interaction.user.id not in game.players:
+            await interaction.response.send_message("You are not a player in this game.", ephemeral=True)
+            return
+        if not game.character_name(interaction.user.id):
+            await interaction.response.send_message("You don't have a character name set for this game.", ephemeral=True)
+            return
         async with async_session_factory() as session:
-            game = await get_game_by_channel(session, interaction.guild.id, interaction.channel_id)
-            if not game:
-                await interaction.response.send_message(
-                    "Run this command in one of the game's text channels (important, scheduling, or general).",
-                    ephemeral=True,
-                )
-                return
-            if game.dm_user_id == interaction.user.id:
-                game_record = await session.get(Game, game.id)
-                if not game_record or not game_record.dm_character_name:
-                    await interaction.response.send_message("You don't have a character name set for this game.", ephemeral=True)
-                    return
-                game_record.dm_character_name = None
-                await session.commit()
-                await interaction.response.send_message("Your game character name has been removed.", ephemeral=True)
-                return
-            result = await session.execute(select(Player).where(Player.game_id == game.id, Player.user_id == interaction.user.id))
-            player = result.scalars().one_or_none()
-            if not player:
-                await interaction.response.send_message("You are not a player in this game.", ephemeral=True)
-                return
-            if not getattr(player, "character_name", None):
-                await interaction.response.send_message("You don't have a character name set for this game.", ephemeral=True)
-                return
-            player.character_name = None
+            await session.execute(_character_name_update(game.id, interaction.user.id, is_dm, None))
             await session.commit()
+        game_registry.invalidate()
         await interaction.response.send_message("Your game character name has been removed.", ephemeral=True)
 
     async def game_transfer(self, interaction: discord.Interaction, user: discord.Member):
@@ -639,17 +642,16 @@ class GamesCog(commands.Cog):
         if user.id == interaction.user.id:
             await interaction.response.send_message("You are already the DM.", ephemeral=True)
             return
-        async with async_session_factory() as session:
-            game = await get_game_by_channel(session, interaction.guild.id, interaction.channel_id)
-            if not game:
-                await interaction.response.send_message(
-                    "Run this command in one of the game's text channels (important, scheduling, or general).",
-                    ephemeral=True,
-                )
-                return
-            if game.dm_user_id != interaction.user.id:
-                await interaction.response.send_message("Only the current DM can transfer ownership.", ephemeral=True)
-                return
+        game = await get_game_by_channel(interaction.guild.id, interaction.channel_id)
+        if not game:
+            await interaction.response.send_message(
+                "Run this command in one of the game's text channels (important, scheduling, or general).",
+                ephemeral=True,
+            )
+            return
+        if game.dm_user_id != interaction.user.id:
+            await interaction.response.send_message("Only the current DM can transfer ownership.", ephemeral=True)
+            return
 
         view = TransferGameView(game, user)
         await interaction.response.send_message(
@@ -718,6 +720,7 @@ class GamesCog(commands.Cog):
                 if game_record:
                     game_record.dm_user_id = new_dm.id
                 await session.commit()
+            game_registry.invalidate()
             await self._sync_dm_resource_role(guild, new_dm.id)
             await self._sync_dm_resource_role(guild, old_dm_id)
             await view.message.edit(
@@ -733,26 +736,26 @@ class GamesCog(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
             return
+        game = await get_game_by_channel(interaction.guild.id, interaction.channel_id)
+        if not game:
+            await interaction.response.send_message(
+                "Run this command in one of the game's text channels (important, scheduling, or general).",
+                ephemeral=True,
+            )
+            return
+        if game.dm_user_id != interaction.user.id:
+            await interaction.response.send_message("Only the DM can add players.", ephemeral=True)
+            return
+        if user.id == game.dm_user_id:
+            await interaction.response.send_message("The DM is already in the game.", ephemeral=True)
+            return
+        if user.id in game.players:
+            await interaction.response.send_message(f"{user.display_name} is already in the game.", ephemeral=True)
+            return
         async with async_session_factory() as session:
-            game = await get_game_by_channel(session, interaction.guild.id, interaction.channel_id)
-            if not game:
-                await interaction.response.send_message(
-                    "Run this command in one of the game's text channels (important, scheduling, or general).",
-                    ephemeral=True,
-                )
-                return
-            if game.dm_user_id != interaction.user.id:
-                await interaction.response.send_message("Only the DM can add players.", ephemeral=True)
-                return
-            if user.id == game.dm_user_id:
-                await interaction.response.send_message("The DM is already in the game.", ephemeral=True)
-                return
-            existing = await session.execute(select(Player).where(Player.game_id == game.id, Player.user_id == user.id))
-            if existing.scalars().one_or_none():
-                await interaction.response.send_message(f"{user.display_name} is already in the game.", ephemeral=True)
-                return
             session.add(Player(game_id=game.id, user_id=user.id))
             await session.commit()
+        game_registry.invalidate()
 
         role = interaction.guild.get_role(game.game_role_id)
         if role:
@@ -763,27 +766,26 @@ class GamesCog(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
             return
+        game = await get_game_by_channel(interaction.guild.id, interaction.channel_id)
+        if not game:
+            await interaction.response.send_message(
+                "Run this command in one of the game's text channels (important, scheduling, or general).",
+                ephemeral=True,
+            )
+            return
+        if game.dm_user_id != interaction.user.id:
+            await interaction.response.send_message("Only the DM can remove players.", ephemeral=True)
+            return
+        if user.id == game.dm_user_id:
+            await interaction.response.send_message("You cannot remove the DM from the game.", ephemeral=True)
+            return
+        if user.id not in game.players:
+            await interaction.response.send_message("That user is not in this game.", ephemeral=True)
+            return
         async with async_session_factory() as session:
-            game = await get_game_by_channel(session, interaction.guild.id, interaction.channel_id)
-            if not game:
-                await interaction.response.send_message(
-                    "Run this command in one of the game's text channels (important, scheduling, or general).",
-                    ephemeral=True,
-                )
-                return
-            if game.dm_user_id != interaction.user.id:
-                await interaction.response.send_message("Only the DM can remove players.", ephemeral=True)
-                return
-            if user.id == game.dm_user_id:
-                await interaction.response.send_message("You cannot remove the DM from the game.", ephemeral=True)
-                return
-            result = await session.execute(select(Player).where(Player.game_id == game.id, Player.user_id == user.id))
-            player = result.scalars().one_or_none()
-            if not player:
-                await interaction.response.send_message("That user is not in this game.", ephemeral=True)
-                return
-            await session.delete(player)
+            await session.execute(delete(Player).where(Player.game_id == game.id, Player.user_id == user.id))
             await session.commit()
+        game_registry.invalidate()
 
         role = interaction.guild.get_role(game.game_role_id)
         if role and role in user.roles:
@@ -825,43 +827,49 @@ class GamesCog(commands.Cog):
         repaired: list[str] = []
         skipped: list[str] = []
         problems: list[str] = []
+        games: list[Game] = []
 
-        async with async_session_factory() as session:
-            existing = await session.execute(select(Game).where(Game.guild_id == guild.id))
-            known_categories = {g.category_id for g in existing.scalars().all()}
+        known_categories = {g.category_id for g in await game_registry.in_guild(guild.id)}
 
-            for category in guild.categories:
-                if category.name.strip().lower() in ignored:
-                    continue
-                if category.id in known_categories:
-                    skipped.append(category.name)
-                    continue
+        # The Discord work (roles, channels, permissions) can take minutes on a
+        # big server, so the rows are only collected here and written in one
+        # short transaction at the end: the writer connection is not held
+        # while Discord answers.
+        for category in guild.categories:
+            if category.name.strip().lower() in ignored:
+                continue
+            if category.id in known_categories:
+                skipped.append(category.name)
+                continue
 
-                try:
-                    result = await self._rebuild_one_game(
-                        guild, category, interaction.user, session, create_missing
-                    )
-                except discord.Forbidden:
-                    problems.append(f"**{category.name}** — missing permissions to repair it")
-                    continue
-                except Exception as exc:
-                    log.exception("rebuild failed for category %s", category.name)
-                    problems.append(f"**{category.name}** — {type(exc).__name__}: {exc}")
-                    continue
+            try:
+                result = await self._rebuild_one_game(guild, category, interaction.user, create_missing)
+            except discord.Forbidden:
+                problems.append(f"**{category.name}** — missing permissions to repair it")
+                continue
+            except Exception as exc:
+                log.exception("rebuild failed for category %s", category.name)
+                problems.append(f"**{category.name}** — {type(exc).__name__}: {exc}")
+                continue
 
-                if result is None:
-                    problems.append(
-                        f"**{category.name}** — no channels matched; "
-                        f"add it to `ignore` if it is not a game"
-                    )
-                    continue
+            if result is None:
+                problems.append(
+                    f"**{category.name}** — no channels matched; "
+                    f"add it to `ignore` if it is not a game"
+                )
+                continue
 
-                line, created = result
-                rebuilt.append(line)
-                if created:
-                    repaired.append(f"**{category.name}** — recreated {', '.join(created)}")
+            line, created, game = result
+            games.append(game)
+            rebuilt.append(line)
+            if created:
+                repaired.append(f"**{category.name}** — recreated {', '.join(created)}")
 
-            await session.commit()
+        if games:
+            async with async_session_factory() as session:
+                session.add_all(games)   # players cascade
+                await session.commit()
+            game_registry.invalidate()
 
         embed = discord.Embed(
             title="Game database rebuild",
@@ -889,10 +897,12 @@ class GamesCog(commands.Cog):
         guild: discord.Guild,
         category: discord.CategoryChannel,
         invoker: discord.Member,
-        session,
         create_missing: bool,
-    ) -> tuple[str, list[str]] | None:
-        """Rebuild one category into a Game row. Returns (summary, created_channels)."""
+    ) -> tuple[str, list[str], Game] | None:
+        """Rebuild one category into an unsaved Game row, players attached.
+
+        Returns (summary, created_channels, game).
+        """
         wanted = dict(CHANNEL_ORDER)
 
         found: dict[str, discord.abc.GuildChannel] = {}
@@ -945,6 +955,7 @@ class GamesCog(commands.Cog):
         if any(name not in found for name in wanted):
             return None
 
+        players = [m for m in game_role.members if not m.bot and m.id != dm.id]
         game = Game(
             guild_id=guild.id,
             name=category.name,
@@ -957,17 +968,13 @@ class GamesCog(commands.Cog):
             text_general_id=found["general"].id,
             voice_game_id=found["game"].id,
             voice_private_id=found["private"].id,
+            players=[Player(user_id=member.id) for member in players],
         )
-        session.add(game)
-        await session.flush()
-
-        players = [m for m in game_role.members if not m.bot and m.id != dm.id]
-        for member in players:
-            session.add(Player(game_id=game.id, user_id=member.id))
 
         return (
             f"**{category.name}** — DM {dm.display_name}, {len(players)} player(s)",
             created,
+            game,
         )
 
     async def game_forget(self, interaction: discord.Interaction, name: str):
@@ -982,32 +989,35 @@ class GamesCog(commands.Cog):
             await interaction.response.send_message("Use this in a server.", ephemeral=True)
             return
 
-        async with async_session_factory() as session:
-            game = await get_game_by_name(session, interaction.guild.id, name)
-            if not game:
-                result = await session.execute(select(Game).where(Game.guild_id == interaction.guild.id))
-                names = [g.name for g in result.scalars().all()]
-                await interaction.response.send_message(
-                    f"No game named **{name}**."
-                    + (f"\nKnown games: {', '.join(names)}" if names else " No games are registered."),
-                    ephemeral=True,
-                )
-                return
-
-            perms = interaction.user.guild_permissions
-            if not (perms.administrator or perms.manage_guild or game.dm_user_id == interaction.user.id):
-                await interaction.response.send_message(
-                    "Only the DM of that game or someone with Manage Server can unregister it.",
-                    ephemeral=True,
-                )
-                return
+        game = await get_game_by_name(interaction.guild.id, name)
+        if not game:
+            names = [g.name for g in await game_registry.in_guild(interaction.guild.id)]
+            await interaction.response.send_message(
+                f"No game named **{name}**."
+                + (f"\nKnown games: {', '.join(names)}" if names else " No games are registered."),
+                ephemeral=True,
+            )
+            return
 
-            game_name = game.name
-            player_count = len(
-                (await session.execute(select(Player).where(Player.game_id == game.id))).scalars().all()
+        perms = interaction.user.guild_permissions
+        if not (perms.administrator or perms.manage_guild or game.dm_user_id == interaction.user.id):
+            await interaction.response.send_message(
+                "Only the DM of that game or someone with Manage Server can unregister it.",
+                ephemeral=True,
             )
-            await session.delete(game)   # players and schedule polls cascade
+            return
+
+        game_name = game.name
+        player_count = len(game.players)
+        async with async_session_factory() as session:
+            record = await session.get(Game, game.id)
+            if record:
+                poll_ids = await self._poll_message_ids(session, game.id)
+                await session.delete(record)   # players and schedule polls cascade
             await session.commit()
+        game_registry.invalidate()
+        if record:
+            self._forget_polls(poll_ids)
 
         await interaction.response.send_message(
             f"Removed **{game_name}** from the database ({player_count} player record(s)).\n"
@@ -3,19 +3,28 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import os
 import random
 import shlex
 import time
 from functools import partial
-from typing import Optional
+from typing import Callable, Optional
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 from sqlalchemy import select
 
-from bot.db import Playlist, PlaylistTrack, Track, async_session_factory
-from bot.ytdlp import get_audio_source, import_url
+from bot.audio_cache import cache as audio_cache, codec_for
+from bot.db import PlaylistTrack, Track, read_session_factory
+from bot.import_jobs import ImportJob, jobs as import_jobs
+from bot.player_events import PlayerEvents
+from bot.playlist_index import PlaylistEntry, index as playlist_index
+from bot.ydl_pool import Priority, pool as ydl_pool
+from bot.ytdlp import (
+    AudioStream, extract_playlist_id, invalidate_audio_stream, prioritize_audio_stream,
+    resolve_audio_stream, stream_expiry,
+)
 
 log = logging.getLogger(__name__)
 
@@ -29,9 +38,44 @@ _MAX_CONSECUTIVE_FAILURES = 5
 # the event loop allows and hammers YouTube in a tight loop.
 _MIN_PLAYED_SEC = 3.0
 
+# A read-ahead URL is only used if it outlives the track it is for by this
+# much; ffmpeg reconnects mid-track and needs the signature to still hold.
+_EXPIRY_MARGIN_SEC = 120
 
-def _ffmpeg_before_options(headers: dict[str, str]) -> str:
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        log.warning("%s is not a number; using %s", name, default)
+        return default
+
+
+# Seconds before the current track ends to open ffmpeg on the next one, so the
+# switch does not wait on the stream's connect and first buffer. 0 disables it
+# (the next URL is still resolved ahead of time).
+_PRESPAWN_SEC = _env_float("MUSIC_PRESPAWN_SEC", 10.0)
+
+# Hand Opus streams to Discord as Opus instead of decoding them to PCM. Set
+# MUSIC_OPUS_PASSTHROUGH=off to force the PCM path for every stream.
+_OPUS_PASSTHROUGH = os.environ.get("MUSIC_OPUS_PASSTHROUGH", "on").strip().lower() not in (
+    "off", "0", "false", "no",
+)
+
+# Least time between progress edits on a /music add reply.
+_IMPORT_EDIT_SEC = 2.0
+
+
+def _is_local(stream: AudioStream) -> bool:
+    """True for a file in the audio cache rather than a YouTube URL."""
+    return not stream.url.startswith(("http://", "https://"))
+
+
+def _ffmpeg_before_options(stream: AudioStream) -> str:
     """Build ffmpeg input options that carry yt-dlp's auth headers."""
+    if _is_local(stream):
+        return ""
+    headers = stream.headers
     opts = [_RECONNECT_OPTS]
     ua = headers.get("User-Agent")
     if ua:
@@ -42,11 +86,30 @@ def _ffmpeg_before_options(headers: dict[str, str]) -> str:
     return " ".join(opts)
 
 
-def parse_tags(raw: str | None) -> list[str]:
-    """Split a playlist's tag string into normalised tags."""
-    if not raw:
-        return []
-    return [t.lower() for t in raw.replace(",", " ").split() if t]
+class _OpusSource(discord.FFmpegOpusAudio):
+    """Opus from ffmpeg straight to Discord, with the gain applied by ffmpeg.
+
+    The PCM path decodes every stream, scales each 20 ms frame in Python and
+    has the library encode it again. Here, at full volume the stream is copied
+    untouched; below it ffmpeg scales and encodes once, with no per-frame
+    Python work. ffmpeg cannot change gain mid-stream, so a volume change
+    reopens the stream at the current position (PlayerSession.set_volume).
+    """
+
+    def __init__(self, stream: AudioStream, volume: float, seek: float = 0.0) -> None:
+        before = _ffmpeg_before_options(stream)
+        if seek > 0:
+            before = f"{before} -ss {seek:.2f}".strip()
+        copy = volume >= 1.0
+        super().__init__(
+            stream.url,
+            # The library turns "opus"/"libopus" into a stream copy too, which
+            # ffmpeg refuses to combine with a filter; None makes it encode.
+            codec="copy" if copy else None,
+            before_options=before,
+            options="-vn" if copy else f"-vn -filter:a volume={volume:.3f}",
+        )
+        self.volume = volume
 
 
 def _fmt_duration(sec: int | None) -> str:
@@ -55,9 +118,72 @@ def _fmt_duration(sec: int | None) -> str:
     return f"{sec // 60}:{sec % 60:02d}"
 
 
-class MusicCog(commands.Cog, name="MusicCog"):
-    def __init__(self, bot: commands.Bot) -> None:
+async def _open_stream(track: Track, priority: Priority) -> AudioStream:
+    """The cached file for track if there is one, else a fresh YouTube stream."""
+    path = await audio_cache.lookup(track.youtube_id)
+    if path:
+        return AudioStream(path, {}, codec_for(path))
+    return await resolve_audio_stream(
+        track.youtube_id,
+        min_valid=(track.duration_sec or 0) + _EXPIRY_MARGIN_SEC,
+        priority=priority,
+    )
+
+
+def _outlives(audio_url: str, track: Track) -> bool:
+    """True if a stream URL stays valid for the whole of track, plus a margin."""
+    expires = stream_expiry(audio_url)
+    if expires is None:
+        return True   # unsigned or unknown: it was resolved moments ago
+    return expires - time.time() > (track.duration_sec or 0) + _EXPIRY_MARGIN_SEC
+
+
+def _busiest_voice_channel(guilds) -> Optional[discord.VoiceChannel]:
+    """The voice channel with the most humans in it, across the given guilds."""
+    best: Optional[discord.VoiceChannel] = None
+    best_count = 0
+    for guild in guilds:
+        for ch in guild.voice_channels:
+            humans = len([m for m in ch.members if not m.bot])
+            if humans > best_count:
+                best, best_count = ch, humans
+    return best
+
+
+class _Prefetch:
+    """The next track's stream, resolved (and maybe opened) ahead of time."""
+
+    def __init__(self, track_id: int, task: asyncio.Task) -> None:
+        self.track_id = track_id
+        self.task = task    # resolves to an AudioStream
+        self.source: Optional[discord.AudioSource] = None
+        self.spawner: Optional[asyncio.Task] = None
+
+    def discard(self) -> None:
+        self.task.cancel()
+        if self.spawner is not None:
+            self.spawner.cancel()
+        if self.source is not None:
+            self.source.cleanup()   # kills the pre-opened ffmpeg
+            self.source = None
+
+
+class PlayerSession:
+    """One guild's player: its voice connection, queue and play order.
+
+    Sessions are independent of each other, so two tables running games in
+    different guilds each get their own queue, volume and shuffle state, and
+    a playlist started in one never interrupts the other. MusicCog keeps the
+    registry; everything that plays, pauses or reports state goes through a
+    session.
+    """
+
+    def __init__(
+        self, bot: commands.Bot, guild_id: int, events: Optional[PlayerEvents] = None
+    ) -> None:
         self.bot = bot
+        self.guild_id = guild_id
+        self._events = events
         self._voice_client: Optional[discord.VoiceClient] = None
 
         # Play order: _queue holds the playlist in stored order, _order is the
@@ -72,7 +198,11 @@ class MusicCog(commands.Cog, name="MusicCog"):
         self._paused: bool = False
         self._shuffled: bool = False
         self._volume: float = 0.5
-        self._source: Optional[discord.PCMVolumeTransformer] = None
+        self._source: Optional[discord.AudioSource] = None
+        self._stream: Optional[AudioStream] = None   # what _source is reading
+        # An Opus source opened at an old volume, swapped out on resume: a swap
+        # while paused would restart the player behind our back.
+        self._reopen_pending: bool = False
 
         # Bumped whenever we deliberately replace or tear down a source, so the
         # FFmpeg "after" callback of the old source can tell it is stale and
@@ -88,6 +218,23 @@ class MusicCog(commands.Cog, name="MusicCog"):
         self._pause_start: float = 0.0  # monotonic time when pause was triggered
         self._pause_accum: float = 0.0  # total seconds spent paused this track
 
+        # Read-ahead for the track after the current one. Keyed by track id,
+        # so anything that reorders the queue only has to re-point it.
+        self._prefetch: Optional[_Prefetch] = None
+
+        # Bumped on every change to what state_dict reports (bar position);
+        # the snapshots of the queue it serves are cached per version.
+        self.version: int = 0
+        self._snapshots: dict[Optional[int], dict] = {}
+
+        # Monotonic time of the last play request; picks the default session
+        # for callers (the web UI, the desktop app) that do not name a guild.
+        self.last_used: float = 0.0
+
+    @property
+    def guild(self) -> Optional[discord.Guild]:
+        return self.bot.get_guild(self.guild_id)
+
     # ------------------------------------------------------------------
     # Public API (called from web server handlers and slash commands)
     # ------------------------------------------------------------------
@@ -111,11 +258,13 @@ class MusicCog(commands.Cog, name="MusicCog"):
         self._queue = tracks
         self._paused = False
         self._failures = 0
+        self.last_used = time.monotonic()
         self._rebuild_order(start_track_id)
 
         if channel is not None:
             await self._connect(channel)
         await self._play_current()
+        self._emit_state()   # a new queue: listeners need more than a track change
         return len(tracks)
 
     async def pause(self) -> None:
@@ -123,23 +272,30 @@ class MusicCog(commands.Cog, name="MusicCog"):
             self._voice_client.pause()
             self._paused = True
             self._pause_start = time.monotonic()
+            self._emit_paused()
 
     async def resume(self) -> None:
         if self._voice_client and self._voice_client.is_paused():
+            if self._reopen_pending:
+                self._reopen_at_position()
             self._voice_client.resume()
             self._paused = False
             self._pause_accum += time.monotonic() - self._pause_start
+            self._emit_paused()
 
     async def stop(self) -> None:
         self._generation += 1  # invalidate the running source's after-callback
+        self._drop_prefetch()
         self._queue = []
         self._order = []
         self._pos = 0
         self._playlist_id = None
         self._paused = False
         self._source = None
+        self._stream = None
         if self._voice_client and (self._voice_client.is_playing() or self._voice_client.is_paused()):
             self._voice_client.stop()
+        self._emit_state()
 
     async def skip(self) -> None:
         """Stop the current track; the after-callback advances the queue."""
@@ -158,6 +314,7 @@ class MusicCog(commands.Cog, name="MusicCog"):
             await self._play_current()
             return
         self._pos = (self._pos - 1) % len(self._order)
+        self._touch()
         self._failures = 0
         await self._play_current()
 
@@ -167,14 +324,24 @@ class MusicCog(commands.Cog, name="MusicCog"):
             return
         self._shuffled = shuffled
         if not self._queue:
+            self._emit_queue()
             return
         current = self._current_track()
         self._rebuild_order(current.id if current else None)
+        self._emit_queue()
+        if self.is_active():
+            self._schedule_prefetch()
 
     async def set_volume(self, volume: float) -> None:
         self._volume = max(0.0, min(1.0, volume))
-        if self._source:
+        self._emit_volume()
+        if isinstance(self._source, discord.PCMVolumeTransformer):
             self._source.volume = self._volume
+        elif isinstance(self._source, _OpusSource) and self._source.volume != self._volume:
+            if self._paused:
+                self._reopen_pending = True
+            else:
+                self._reopen_at_position()
 
     async def join_voice(
         self, channel_id: Optional[int] = None, prefer_user: Optional[discord.Member] = None
@@ -192,8 +359,9 @@ class MusicCog(commands.Cog, name="MusicCog"):
             try:
                 await self._voice_client.disconnect()
             except Exception as exc:
-                log.warning("MusicCog: disconnect failed: %s", exc)
+                log.warning("MusicCog[%d]: disconnect failed: %s", self.guild_id, exc)
             self._voice_client = None
+            self._emit_state()
 
     def position_sec(self) -> float:
         """Elapsed playback seconds for the current track, accounting for pauses."""
@@ -205,18 +373,28 @@ class MusicCog(commands.Cog, name="MusicCog"):
             return max(0.0, time.monotonic() - self._play_start - self._pause_accum)
         return 0.0
 
+    def is_connected(self) -> bool:
+        return bool(self._voice_client and self._voice_client.is_connected())
+
     def is_active(self) -> bool:
         """True when voice is the live playback device (connected with a queue)."""
-        return bool(
-            self._voice_client
-            and self._voice_client.is_connected()
-            and self._queue
-        )
-
-    def state_dict(self) -> dict:
-        track = self._current_track()
-        in_voice = bool(self._voice_client and self._voice_client.is_connected())
+        return bool(self.is_connected() and self._queue)
+
+    def state_dict(self, window: Optional[int] = None) -> dict:
+        """The player's state, as /api/now-playing serves it.
+
+        window limits the queue to the tracks within window places of the
+        current one (queue_offset says where that slice starts in the play
+        order); None sends the whole queue. The track dicts are built once per
+        version and window, not on every call.
+        """
+        cached = self._snapshots.get(window)
+        if cached is None:
+            cached = self._snapshots[window] = self._queue_state(window)
+        in_voice = self.is_connected()
         return {
+            "guild_id": str(self.guild_id),
+            "version": self.version,
             "playing": bool(self._voice_client and self._voice_client.is_playing()),
             "paused": self._paused,
             "shuffled": self._shuffled,
@@ -228,10 +406,112 @@ class MusicCog(commands.Cog, name="MusicCog"):
             "device": "voice" if self.is_active() else "browser",
             "connected": in_voice,
             "voice_channel_id": self._voice_client.channel.id if in_voice else None,
+            **cached,
+        }
+
+    def _queue_state(self, window: Optional[int]) -> dict:
+        track = self._current_track()
+        total = len(self._order)
+        if window is None:
+            start, stop = 0, total
+        else:
+            pos = self._pos % total if total else 0
+            start, stop = max(0, pos - window), min(total, pos + window + 1)
+        return {
             "current": _track_dict(track) if track else None,
-            "queue": [_track_dict(t) for t in self._ordered_queue()],
+            "queue": [_track_dict(t) for t in self._queue_slice(start, stop)],
+            "queue_offset": start,
+            "queue_index": self._pos % total if total else 0,
+            "queue_length": total,
         }
 
+    def queue_page(self, offset: int, limit: int) -> dict:
+        """One page of the play order, for clients that only hold a window of it."""
+        total = len(self._order)
+        offset = max(0, min(offset, total))
+        return {
+            "guild_id": str(self.guild_id),
+            "version": self.version,
+            "offset": offset,
+            "total": total,
+            "tracks": [_track_dict(t) for t in self._queue_slice(offset, offset + limit)],
+        }
+
+    def etag(self, window: Optional[int] = None) -> str:
+        """Changes whenever state_dict would, apart from position_sec ticking on.
+
+        The version covers everything the player does itself; the voice
+        flags cover the connection changing under it (a kick, a dropped call).
+        """
+        vc = self._voice_client
+        flags = f"{int(self.is_connected())}{int(bool(vc and vc.is_playing()))}"
+        return f'W/"{self.guild_id}-{self.version}-{flags}-{window}"'
+
+    def summary_dict(self) -> dict:
+        """The few fields a session picker needs, without the whole queue."""
+        track = self._current_track()
+        guild = self.guild
+        in_voice = self.is_connected()
+        return {
+            "guild_id": str(self.guild_id),
+            "guild_name": guild.name if guild else None,
+            "playing": bool(self._voice_client and self._voice_client.is_playing()),
+            "paused": self._paused,
+            "playlist_id": self._playlist_id,
+            "connected": in_voice,
+            "voice_channel_id": self._voice_client.channel.id if in_voice else None,
+            "current": _track_dict(track) if track else None,
+        }
+
+    # ------------------------------------------------------------------
+    # Change events (see bot.player_events)
+    # ------------------------------------------------------------------
+
+    def _changed(self, kind: str, event: Callable[[], dict]) -> None:
+        """Record a change: bump the version, and tell listeners what changed.
+
+        event builds the payload, and only runs when someone is listening.
+        """
+        self._touch()
+        if self._events is not None and self._events.listened:
+            self._events.publish(
+                {"type": kind, "guild_id": str(self.guild_id), "version": self.version, **event()}
+            )
+
+    def _touch(self) -> None:
+        """Bump the version for a change whose event comes later.
+
+        Moving to another track changes the queue position at once but only
+        emits once the new stream has resolved; bumping here keeps
+        /api/now-playing from answering 304 with the old track meanwhile.
+        """
+        self.version += 1
+        self._snapshots.clear()
+
+    def _emit_state(self) -> None:
+        """The whole state, for changes too broad for a small event (new queue, stop, voice)."""
+        self._changed("state", self.state_dict)
+
+    def _emit_track(self, track: Track) -> None:
+        self._changed("track", lambda: {
+            "current": _track_dict(track), "position_sec": 0.0, "playing": True, "paused": False,
+            "queue_index": self._pos,
+        })
+
+    def _emit_paused(self) -> None:
+        self._changed("paused", lambda: {"paused": self._paused, "position_sec": self.position_sec()})
+
+    def _emit_volume(self) -> None:
+        self._changed("volume", lambda: {"volume": self._volume})
+
+    def _emit_queue(self) -> None:
+        """The play order, as track ids: listeners already hold the tracks themselves."""
+        self._changed("queue", lambda: {
+            "shuffled": self._shuffled,
+            "order": [t.id for t in self._ordered_queue()],
+            "queue_index": self._pos,
+        })
+
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
@@ -243,6 +523,7 @@ class MusicCog(commands.Cog, name="MusicCog"):
         if self._shuffled:
             random.shuffle(self._order)
         self._pos = 0
+        self._touch()
         if start_track_id is None or not n:
             return
         ids = [t.id for t in self._queue]
@@ -256,7 +537,11 @@ class MusicCog(commands.Cog, name="MusicCog"):
         self._pos = 0
 
     def _ordered_queue(self) -> list[Track]:
-        return [self._queue[i] for i in self._order if 0 <= i < len(self._queue)]
+        return self._queue_slice(0, len(self._order))
+
+    def _queue_slice(self, start: int, stop: int) -> list[Track]:
+        """Tracks start..stop of the play order."""
+        return [self._queue[i] for i in self._order[start:stop] if 0 <= i < len(self._queue)]
 
     def _current_track(self) -> Optional[Track]:
         if not self._queue or not self._order:
@@ -268,21 +553,23 @@ class MusicCog(commands.Cog, name="MusicCog"):
         if not self._queue:
             return
 
-        if not self._voice_client or not self._voice_client.is_connected():
+        if not self.is_connected():
             if not await self.join_voice():
-                log.warning("MusicCog: no voice channel available for playback")
+                log.warning("MusicCog[%d]: no voice channel available for playback", self.guild_id)
                 return
 
         track = self._current_track()
         if not track:
             return
 
-        try:
-            audio_url, headers = await get_audio_source(track.youtube_id)
-        except Exception as exc:
-            log.error("MusicCog: audio URL failed for %s: %s", track.youtube_id, exc)
-            await self._handle_failure()
-            return
+        stream, source = await self._take_prefetch(track)
+        if stream is None:
+            try:
+                stream = await _open_stream(track, Priority.PLAYBACK)
+            except Exception as exc:
+                log.error("MusicCog[%d]: audio URL failed for %s: %s", self.guild_id, track.youtube_id, exc)
+                await self._handle_failure()
+                return
 
         # Bump the generation first: the currently running source's callback
         # will now see a stale generation and skip its advance.
@@ -292,15 +579,16 @@ class MusicCog(commands.Cog, name="MusicCog"):
             self._expected_stop = False   # the stale callback is ignored by generation
             self._voice_client.stop()
 
-        source = discord.PCMVolumeTransformer(
-            discord.FFmpegPCMAudio(
-                audio_url,
-                before_options=_ffmpeg_before_options(headers),
-                options="-vn",
-            ),
-            volume=self._volume,
-        )
+        if isinstance(source, discord.PCMVolumeTransformer):
+            source.volume = self._volume   # may have changed since it was opened
+        elif source is not None and source.volume != self._volume:
+            source.cleanup()               # Opus gain is fixed at open time
+            source = None
+        if source is None:
+            source = self._build_source(stream)
         self._source = source
+        self._stream = stream
+        self._reopen_pending = False
 
         self._play_start = time.monotonic()
         self._pause_accum = 0.0
@@ -312,7 +600,7 @@ class MusicCog(commands.Cog, name="MusicCog"):
 
         def _after(error: Optional[Exception], gen: int = my_gen) -> None:
             if error:
-                log.warning("MusicCog: playback error: %s", error)
+                log.warning("MusicCog[%d]: playback error: %s", self.guild_id, error)
             if gen != self._generation:
                 return  # superseded by a newer source; that one owns the queue
             # ffmpeg exiting immediately means the stream never opened (a 403 on
@@ -329,7 +617,8 @@ class MusicCog(commands.Cog, name="MusicCog"):
                 asyncio.run_coroutine_threadsafe(self._advance(), loop)
 
         self._voice_client.play(source, after=_after)
-        log.info("MusicCog: playing '%s' (track_id=%d)", track.title, track.id)
+        log.info("MusicCog[%d]: playing '%s' (track_id=%d)", self.guild_id, track.title, track.id)
+        self._emit_track(track)
 
         async def _clear_failures() -> None:
             await asyncio.sleep(_MIN_PLAYED_SEC)
@@ -337,21 +626,141 @@ class MusicCog(commands.Cog, name="MusicCog"):
                 self._failures = 0   # it is genuinely playing
 
         asyncio.create_task(_clear_failures())
+        if not _is_local(stream):
+            audio_cache.fill(track.youtube_id, stream.url, stream.headers)
+        self._schedule_prefetch()
+
+    def _build_source(self, stream: AudioStream, seek: float = 0.0) -> discord.AudioSource:
+        """Opus passthrough when the stream is Opus, else decode to PCM."""
+        if _OPUS_PASSTHROUGH and stream.codec == "opus":
+            return _OpusSource(stream, self._volume, seek)
+        return discord.PCMVolumeTransformer(
+            discord.FFmpegPCMAudio(
+                stream.url,
+                before_options=_ffmpeg_before_options(stream),
+                options="-vn",
+            ),
+            volume=self._volume,
+        )
+
+    def _reopen_at_position(self) -> None:
+        """Swap the playing Opus source for one at the current volume and position."""
+        self._reopen_pending = False
+        vc = self._voice_client
+        if self._stream is None or not vc or not (vc.is_playing() or vc.is_paused()):
+            return
+        old = self._source
+        new = self._build_source(self._stream, seek=self.position_sec())
+        # The player keeps its after-callback across a source swap, so the
+        # generation and failure bookkeeping carry on untouched.
+        vc.source = new
+        self._source = new
+        if old is not None:
+            old.cleanup()
+
+    # ------------------------------------------------------------------
+    # Read-ahead
+    # ------------------------------------------------------------------
+
+    def _peek_next(self) -> Optional[Track]:
+        """The track _advance will play next, or None when that is not known yet."""
+        if not self._order:
+            return None
+        nxt = self._pos + 1
+        if nxt >= len(self._order):
+            if self._shuffled:
+                return None   # the next pass is reshuffled when it starts
+            nxt = 0
+        idx = self._order[nxt]
+        return self._queue[idx] if 0 <= idx < len(self._queue) else None
+
+    def _schedule_prefetch(self) -> None:
+        """Point the read-ahead at the upcoming track, keeping it if it already is."""
+        nxt = self._peek_next()
+        if self._prefetch is not None and nxt is not None and self._prefetch.track_id == nxt.id:
+            return
+        self._drop_prefetch()
+        if nxt is None:
+            return
+        pf = _Prefetch(nxt.id, asyncio.create_task(_open_stream(nxt, Priority.STREAM)))
+        # Retrieve the exception so a failed read-ahead is not logged as
+        # "never retrieved"; _play_current resolves again on its own.
+        pf.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        if _PRESPAWN_SEC > 0:
+            pf.spawner = asyncio.create_task(self._prespawn(pf, nxt))
+        self._prefetch = pf
+
+    def _drop_prefetch(self) -> None:
+        if self._prefetch is not None:
+            self._prefetch.discard()
+            self._prefetch = None
+
+    async def _take_prefetch(
+        self, track: Track
+    ) -> tuple[Optional[AudioStream], Optional[discord.AudioSource]]:
+        """Claim the read-ahead for track: (stream, opened source or None).
+
+        Returns (None, None) when there is nothing usable — a different
+        track, a failed resolve, or a URL that would expire mid-track.
+        """
+        pf = self._prefetch
+        if pf is None or pf.track_id != track.id:
+            return None, None
+        self._prefetch = None
+        if pf.spawner is not None:
+            pf.spawner.cancel()
+        if not pf.task.done():
+            # The read-ahead is now what a listener is waiting on.
+            prioritize_audio_stream(track.youtube_id, Priority.PLAYBACK)
+        try:
+            stream = await pf.task
+        except Exception as exc:
+            log.info("MusicCog[%d]: read-ahead failed for %s: %s", self.guild_id, track.youtube_id, exc)
+            pf.discard()
+            return None, None
+        if not _outlives(stream.url, track):
+            pf.discard()
+            return None, None
+        return stream, pf.source
+
+    async def _prespawn(self, pf: _Prefetch, track: Track) -> None:
+        """Open ffmpeg on the next track shortly before the current one ends."""
+        try:
+            stream = await asyncio.shield(pf.task)
+        except Exception:
+            return
+        while self._prefetch is pf:
+            current = self._current_track()
+            if current is None or not current.duration_sec:
+                return   # no known end to count down to
+            remaining = current.duration_sec - self.position_sec() - _PRESPAWN_SEC
+            if remaining <= 0 and not self._paused:
+                break
+            await asyncio.sleep(min(max(remaining, 1.0), 30.0))
+        else:
+            return
+        if _outlives(stream.url, track):
+            pf.source = self._build_source(stream)
 
     async def _handle_failure(self) -> None:
         """Count a failed track, move on, and stop once the whole queue fails."""
         track = self._current_track()
+        if track is not None:
+            # Most instant failures are a stream URL YouTube now refuses; make
+            # the next attempt at this track resolve a fresh one.
+            invalidate_audio_stream(track.youtube_id)
         self._failures += 1
         limit = min(_MAX_CONSECUTIVE_FAILURES, len(self._queue) or 1)
         if self._failures >= limit:
             log.error(
-                "MusicCog: %d tracks failed in a row (last: %s) — stopping playback",
-                self._failures, track.title if track else "?",
+                "MusicCog[%d]: %d tracks failed in a row (last: %s) — stopping playback",
+                self.guild_id, self._failures, track.title if track else "?",
             )
             await self.stop()
             return
         if self._order:
             self._pos = (self._pos + 1) % len(self._order)
+            self._touch()
         # Small backoff so a bad run cannot become a tight retry loop.
         await asyncio.sleep(1.0)
         await self._play_current()
@@ -365,80 +774,134 @@ class MusicCog(commands.Cog, name="MusicCog"):
             self._pos = 0
             if self._shuffled:
                 random.shuffle(self._order)
+                self._emit_queue()
+        self._touch()
         await self._play_current()
 
     async def _find_voice_channel(
         self, channel_id: Optional[int], prefer_user: Optional[discord.Member] = None
     ) -> Optional[discord.VoiceChannel]:
+        # Every candidate must belong to this session's guild: a session that
+        # wandered into another guild's channel would be that guild's player.
         if channel_id:
             ch = self.bot.get_channel(channel_id)
-            if isinstance(ch, discord.VoiceChannel):
+            if isinstance(ch, discord.VoiceChannel) and ch.guild.id == self.guild_id:
                 return ch
 
         # The channel the requester is sitting in wins.
         if prefer_user is not None and prefer_user.voice and prefer_user.voice.channel:
             ch = prefer_user.voice.channel
-            if isinstance(ch, discord.VoiceChannel):
+            if isinstance(ch, discord.VoiceChannel) and ch.guild.id == self.guild_id:
                 return ch
 
         # Otherwise stay where we are, else pick the busiest populated channel.
-        if self._voice_client and self._voice_client.is_connected():
+        if self.is_connected():
             ch = self._voice_client.channel
             if isinstance(ch, discord.VoiceChannel):
                 return ch
 
-        best: Optional[discord.VoiceChannel] = None
-        best_count = 0
-        for guild in self.bot.guilds:
-            for ch in guild.voice_channels:
-                humans = len([m for m in ch.members if not m.bot])
-                if humans > best_count:
-                    best, best_count = ch, humans
-        return best
+        guild = self.guild
+        return _busiest_voice_channel([guild] if guild else [])
 
     async def _connect(self, channel: discord.VoiceChannel) -> None:
-        if self._voice_client and self._voice_client.is_connected():
+        if self.is_connected():
             if self._voice_client.channel.id == channel.id:
                 return
             await self._voice_client.move_to(channel)
         else:
             self._voice_client = await channel.connect()
-        log.info("MusicCog: connected to #%s (%d)", channel.name, channel.id)
+        log.info("MusicCog[%d]: connected to #%s (%d)", self.guild_id, channel.name, channel.id)
+        self._emit_state()
+
+
+class MusicCog(commands.Cog, name="MusicCog"):
+    """Registry of per-guild player sessions, plus the /music commands."""
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+        self._sessions: dict[int, PlayerSession] = {}
+        # Every session publishes its changes here; the web server streams them.
+        self.events = PlayerEvents()
+
+    async def cog_unload(self) -> None:
+        await audio_cache.close()
+        await ydl_pool.close()
+
+    # ------------------------------------------------------------------
+    # Session registry
+    # ------------------------------------------------------------------
+
+    def get_session(self, guild_id: int) -> PlayerSession:
+        """The guild's player, created on first use."""
+        session = self._sessions.get(guild_id)
+        if session is None:
+            session = self._sessions[guild_id] = PlayerSession(self.bot, guild_id, self.events)
+        return session
+
+    def sessions(self) -> list[PlayerSession]:
+        return list(self._sessions.values())
+
+    def resolve_session(
+        self, guild_id: Optional[int] = None, channel_id: Optional[int] = None
+    ) -> Optional[PlayerSession]:
+        """Pick the session a caller means.
+
+        An explicit guild wins, then the guild of an explicit voice channel.
+        Callers that name neither (the desktop hotkeys, an older web UI) get
+        the most recently started session still in voice, else the guild with
+        the busiest voice channel, else the bot's only guild. A guild the bot
+        is not in gets None: ids come straight from web requests, and a
+        session made for each would grow the registry without bound.
+        """
+        if guild_id is not None:
+            if guild_id in self._sessions or self.bot.get_guild(guild_id) is not None:
+                return self.get_session(guild_id)
+            return None
+        if channel_id is not None:
+            ch = self.bot.get_channel(channel_id)
+            if isinstance(ch, discord.VoiceChannel):
+                return self.get_session(ch.guild.id)
+            return None
+
+        live = [s for s in self._sessions.values() if s.is_connected()]
+        if live:
+            return max(live, key=lambda s: s.last_used)
+        busiest = _busiest_voice_channel(self.bot.guilds)
+        if busiest is not None:
+            return self.get_session(busiest.guild.id)
+        if len(self.bot.guilds) == 1:
+            return self.get_session(self.bot.guilds[0].id)
+        return None
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after) -> None:
         """Stop and disconnect once the bot is alone in a channel."""
-        vc = self._voice_client
-        if member.bot or not vc or not vc.is_connected():
+        session = self._sessions.get(member.guild.id)
+        if member.bot or session is None or not session.is_connected():
             return
+        vc = session._voice_client
         if before.channel is None or before.channel.id != vc.channel.id:
             return
         if any(not m.bot for m in vc.channel.members):
             return
-        log.info("MusicCog: left alone in #%s, disconnecting", vc.channel.name)
-        await self.leave_voice()
+        log.info("MusicCog[%d]: left alone in #%s, disconnecting", session.guild_id, vc.channel.name)
+        await session.leave_voice()
 
     # ------------------------------------------------------------------
     # Slash commands
     # ------------------------------------------------------------------
 
-    music = app_commands.Group(name="music", description="Play playlists in voice chat")
+    # Guild-only: every command addresses the guild's own player session.
+    music = app_commands.Group(
+        name="music", description="Play playlists in voice chat", guild_only=True
+    )
 
     async def _playlist_autocomplete(
         self, _interaction: discord.Interaction, current: str
     ) -> list[app_commands.Choice[str]]:
-        q = current.lower().strip()
-        async with async_session_factory() as session:
-            rows = await session.execute(select(Playlist).order_by(Playlist.name))
-            playlists = rows.scalars().all()
-        matches = [
-            p for p in playlists
-            if not q or q in p.name.lower() or any(q in t for t in parse_tags(p.tags))
-        ]
-        return [
-            app_commands.Choice(name=p.name[:100], value=str(p.id))
-            for p in matches[:25]
-        ]
+        # Answered from memory: Discord asks on every keystroke.
+        matches = await playlist_index.match(current, 25)
+        return [app_commands.Choice(name=p.name[:100], value=str(p.id)) for p in matches]
 
     @music.command(name="play", description="Play a playlist in your voice channel")
     @app_commands.describe(playlist="Playlist to play", shuffle="Shuffle the playlist (default: yes)")
@@ -460,12 +923,13 @@ class MusicCog(commands.Cog, name="MusicCog"):
             await interaction.followup.send("Join a voice channel first.", ephemeral=True)
             return
 
-        count = await self.play_playlist(pl.id, shuffled=shuffle, channel=channel)
+        player = self.get_session(interaction.guild_id)
+        count = await player.play_playlist(pl.id, shuffled=shuffle, channel=channel)
         if not count:
             await interaction.followup.send(f"**{pl.name}** has no tracks yet.", ephemeral=True)
             return
 
-        track = self._current_track()
+        track = player._current_track()
         await interaction.followup.send(
             f"{'🔀' if shuffle else '▶️'} Playing **{pl.name}** ({count} tracks) in "
             f"**{channel.name}**\nNow playing: *{track.title if track else '…'}*"
@@ -473,51 +937,53 @@ class MusicCog(commands.Cog, name="MusicCog"):
 
     @music.command(name="pause", description="Pause playback")
     async def cmd_pause(self, interaction: discord.Interaction) -> None:
-        await self.pause()
+        await self.get_session(interaction.guild_id).pause()
         await interaction.response.send_message("⏸️ Paused.", ephemeral=True)
 
     @music.command(name="resume", description="Resume playback")
     async def cmd_resume(self, interaction: discord.Interaction) -> None:
-        await self.resume()
+        await self.get_session(interaction.guild_id).resume()
         await interaction.response.send_message("▶️ Resumed.", ephemeral=True)
 
     @music.command(name="skip", description="Skip to the next track")
     async def cmd_skip(self, interaction: discord.Interaction) -> None:
-        if not self._queue:
+        player = self.get_session(interaction.guild_id)
+        if not player._queue:
             await interaction.response.send_message("Nothing is playing.", ephemeral=True)
             return
-        await self.skip()
+        await player.skip()
         await interaction.response.send_message("⏭️ Skipped.", ephemeral=True)
 
     @music.command(name="shuffle", description="Turn shuffle on or off")
     async def cmd_shuffle(self, interaction: discord.Interaction, on: bool = True) -> None:
-        await self.set_shuffled(on)
+        await self.get_session(interaction.guild_id).set_shuffled(on)
         await interaction.response.send_message(
             f"🔀 Shuffle {'on' if on else 'off'}.", ephemeral=True
         )
 
     @music.command(name="volume", description="Set playback volume (0-100)")
     async def cmd_volume(self, interaction: discord.Interaction, percent: app_commands.Range[int, 0, 100]) -> None:
-        await self.set_volume(percent / 100)
+        await self.get_session(interaction.guild_id).set_volume(percent / 100)
         await interaction.response.send_message(f"🔊 Volume {percent}%.", ephemeral=True)
 
     @music.command(name="stop", description="Stop playback and leave the voice channel")
     async def cmd_stop(self, interaction: discord.Interaction) -> None:
-        await self.leave_voice()
+        await self.get_session(interaction.guild_id).leave_voice()
         await interaction.response.send_message("⏹️ Stopped.", ephemeral=True)
 
     @music.command(name="now", description="Show what is playing")
     async def cmd_now(self, interaction: discord.Interaction) -> None:
-        track = self._current_track()
+        player = self.get_session(interaction.guild_id)
+        track = player._current_track()
         if not track:
             await interaction.response.send_message("Nothing is playing.", ephemeral=True)
             return
-        upcoming = self._ordered_queue()[self._pos + 1:self._pos + 6]
+        upcoming = player._ordered_queue()[player._pos + 1:player._pos + 6]
         embed = discord.Embed(
             title=track.title,
             url=f"https://www.youtube.com/watch?v={track.youtube_id}",
-            description=f"`{_fmt_duration(int(self.position_sec()))} / {_fmt_duration(track.duration_sec)}`"
-                        f"{' · 🔀 shuffled' if self._shuffled else ''}",
+            description=f"`{_fmt_duration(int(player.position_sec()))} / {_fmt_duration(track.duration_sec)}`"
+                        f"{' · 🔀 shuffled' if player._shuffled else ''}",
             color=discord.Color.green(),
         )
         if track.thumbnail_url:
@@ -532,12 +998,7 @@ class MusicCog(commands.Cog, name="MusicCog"):
 
     @music.command(name="playlists", description="List playlists, optionally filtered by tag")
     async def cmd_playlists(self, interaction: discord.Interaction, tag: Optional[str] = None) -> None:
-        async with async_session_factory() as session:
-            rows = await session.execute(select(Playlist).order_by(Playlist.name))
-            playlists = rows.scalars().all()
-        if tag:
-            wanted = tag.lower().strip()
-            playlists = [p for p in playlists if wanted in parse_tags(p.tags)]
+        playlists = await (playlist_index.tagged(tag) if tag else playlist_index.all())
         if not playlists:
             await interaction.response.send_message(
                 f"No playlists{f' tagged `{tag}`' if tag else ''} yet.", ephemeral=True
@@ -545,7 +1006,7 @@ class MusicCog(commands.Cog, name="MusicCog"):
             return
         lines = []
         for p in playlists:
-            tags = parse_tags(p.tags)
+            tags = p.tags
             lines.append(f"• **{p.name}**" + (f" — `{'` `'.join(tags)}`" if tags else ""))
         embed = discord.Embed(
             title=f"Playlists{f' tagged “{tag}”' if tag else ''}",
@@ -557,24 +1018,40 @@ class MusicCog(commands.Cog, name="MusicCog"):
     @music.command(name="add", description="Import a YouTube video or playlist into the library")
     async def cmd_add(self, interaction: discord.Interaction, url: str) -> None:
         await interaction.response.defer(thinking=True, ephemeral=True)
-        try:
-            tracks, skipped = await import_url(url)
-        except ValueError as exc:
-            await interaction.followup.send(str(exc), ephemeral=True)
-            return
-        except Exception as exc:
-            log.error("cmd_add failed for %s: %s", url, exc)
-            await interaction.followup.send("Could not fetch that from YouTube.", ephemeral=True)
-            return
-        if len(tracks) == 1:
-            await interaction.followup.send(f"Added **{tracks[0].title}** to the library.", ephemeral=True)
+        # The import runs as a background job; this only reports on it, so a
+        # long playlist shows progress instead of a bare "thinking…".
+        job, _ = import_jobs.start(url)
+        shown = ""
+        while not job.finished:
+            version = job.version
+            text = _import_progress(job)
+            if text and text != shown:
+                await interaction.edit_original_response(content=text)
+                shown = text
+                await asyncio.sleep(_IMPORT_EDIT_SEC)   # Discord rate-limits message edits
+            await job.wait_changed(since=version)
+
+        if job.status == "failed":
+            await interaction.edit_original_response(content=job.error or "Import failed.")
+        elif len(job.tracks) == 1:
+            await interaction.edit_original_response(
+                content=f"Added **{job.tracks[0].title}** to the library."
+            )
         else:
-            note = f" ({skipped} unavailable skipped)" if skipped else ""
-            await interaction.followup.send(
-                f"Added **{len(tracks)}** tracks to the library{note}.", ephemeral=True
+            note = f" ({job.skipped} unavailable skipped)" if job.skipped else ""
+            await interaction.edit_original_response(
+                content=f"Added **{len(job.tracks)}** tracks to the library{note}."
             )
 
 
+def _import_progress(job: ImportJob) -> str:
+    if job.status == "saving" and job.seen > 1:
+        return f"Importing… {job.imported}/{job.seen - job.skipped} tracks saved."
+    if job.status == "fetching" and extract_playlist_id(job.url):
+        return "Fetching playlist — this can take a moment…"
+    return ""
+
+
 def _track_dict(t: Track) -> dict:
     return {
         "id": t.id,
@@ -587,7 +1064,7 @@ def _track_dict(t: Track) -> dict:
 
 async def load_playlist_tracks(playlist_id: int) -> list[Track]:
     """Load a playlist's tracks in stored order (one query, no N+1)."""
-    async with async_session_factory() as session:
+    async with read_session_factory() as session:
         rows = await session.execute(
             select(Track)
             .join(PlaylistTrack, PlaylistTrack.track_id == Track.id)
@@ -597,20 +1074,11 @@ async def load_playlist_tracks(playlist_id: int) -> list[Track]:
         return list(rows.scalars().all())
 
 
-async def _resolve_playlist(value: str) -> Optional[Playlist]:
+async def _resolve_playlist(value: str) -> Optional[PlaylistEntry]:
     """Resolve an autocomplete value (an id) or a typed playlist name."""
-    async with async_session_factory() as session:
-        if value.isdigit():
-            pl = await session.get(Playlist, int(value))
-            if pl:
-                return pl
-        rows = await session.execute(select(Playlist).order_by(Playlist.name))
-        playlists = rows.scalars().all()
-    needle = value.lower().strip()
-    for p in playlists:
-        if p.name.lower() == needle:
-            return p
-    for p in playlists:
-        if needle in p.name.lower():
-            return p
-    return None
+    if value.isdigit():
+        pl = await playlist_index.get(int(value))
+        if pl:
+            return pl
+    best = await playlist_index.match(value, 1)
+    return best[0] if best else None
@@ -2,22 +2,50 @@
 from __future__ import annotations
 
 import asyncio
-from datetime import datetime, timezone
-from typing import TYPE_CHECKING, Set
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import TYPE_CHECKING, NamedTuple, Set
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 from discord.http import Route
-from sqlalchemy import select
+from sqlalchemy import delete, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from bot.db import Game, SchedulePoll, async_session_factory
+from bot.db import PollVote, SchedulePoll, async_session_factory
+from bot.dm_fanout import FAILED, FORBIDDEN, UNKNOWN_USER, DmResult, send_dms
+from bot.game_registry import GameInfo, registry as game_registry
+from bot.poll_tally import PollTallies
+from bot.reminder_queue import ReminderQueue
 from bot.utils import get_game_by_channel, get_game_by_scheduling_channel, get_player_ids
 
 if TYPE_CHECKING:
     from bot.main import Bot
 
+log = logging.getLogger(__name__)
+
+
+class _DuePoll(NamedTuple):
+    """What a queued reminder needs to run without reading the poll back."""
+    poll_id: int
+    game_id: int
+    channel_id: int
+    attempt: int = 0
+
+
+# A reminder whose poll votes cannot be read is retried this often, this
+# many seconds apart, rather than DMing players who may well have voted.
+_REMINDER_ATTEMPTS = 3
+_REMINDER_RETRY = 300
+
+# Startup catch-up: recent messages read per scheduling channel, and
+# channels read at once.
+_CATCH_UP_MESSAGES = 20
+_CATCH_UP_CONCURRENCY = 4
+
 
 def _poll_answer_ids(poll) -> list[int]:
     """Get answer IDs from a discord Poll object."""
@@ -29,30 +57,76 @@ def _poll_answer_ids(poll) -> list[int]:
     return out
 
 
-async def _get_poll_voter_ids(bot: Bot, channel_id: int, message_id: int, poll) -> Set[int]:
-    """Call Discord API to get all user IDs who voted on any answer of this poll."""
+# Voters per request: Discord's maximum page.
+_VOTERS_PAGE = 100
+# Voter pages in flight at once, across all polls. discord.py already holds
+# requests back to the route's rate-limit bucket; this keeps one big poll
+# from taking the whole bucket while other commands wait behind it.
+_voter_requests = asyncio.Semaphore(4)
+# How long fetched votes are reused: repeated /schedule remind calls within
+# this window do not ask Discord again.
+_VOTES_TTL = 30.0
+_votes_cache: dict[int, tuple[float, dict[int, Set[int]]]] = {}   # message id -> (expires, votes)
+
+
+async def _get_answer_voter_ids(bot: Bot, channel_id: int, message_id: int, answer_id: int) -> Set[int]:
+    """Every voter on one answer, following pages to the end."""
     voter_ids: Set[int] = set()
+    after = None
+    while True:
+        async with _voter_requests:
+            data = await bot.http.get_poll_answer_voters(
+                channel_id, message_id, answer_id, after=after, limit=_VOTERS_PAGE
+            )
+        users = data.get("users", [])
+        voter_ids.update(int(u["id"]) for u in users)
+        if len(users) < _VOTERS_PAGE:
+            return voter_ids
+        after = users[-1]["id"]
+
+
+async def _get_poll_votes(
+    bot: Bot, channel_id: int, message_id: int, poll, *, use_cache: bool = True
+) -> dict[int, Set[int]]:
+    """Answer id -> ids of the users who picked it, all answers fetched at once.
+
+    With use_cache=False the votes are always read fresh and not cached:
+    a tally resync must not start from a read that is up to _VOTES_TTL old.
+
+    Raises discord.HTTPException if any answer cannot be read: a partial
+    answer would count voters as non-voters.
+    """
+    now = time.monotonic()
+    cached = _votes_cache.get(message_id) if use_cache else None
+    if cached and cached[0] > now:
+        return cached[1]
     answer_ids = _poll_answer_ids(poll)
-    if not answer_ids:
-        return voter_ids
-    http = bot._connection.http
-    for answer_id in answer_ids:
-        route = Route(
-            "GET",
-            "/channels/{channel_id}/polls/{message_id}/answers/{answer_id}",
-            channel_id=channel_id,
-            message_id=message_id,
-            answer_id=answer_id,
-        )
-        try:
-            data = await http.request(route)
-            for u in data.get("users", []):
-                uid = u.get("id")
-                if uid:
-                    voter_ids.add(int(uid))
-        except Exception:
-            continue
-    return voter_ids
+    voters = await asyncio.gather(
+        *(_get_answer_voter_ids(bot, channel_id, message_id, a) for a in answer_ids)
+    )
+    votes = dict(zip(answer_ids, voters))
+    if not use_cache:
+        return votes
+    for mid in [mid for mid, (expires, _) in _votes_cache.items() if expires <= now]:
+        del _votes_cache[mid]
+    _votes_cache[message_id] = (now + _VOTES_TTL, votes)
+    return votes
+
+
+def _outcome_summary(results: list[DmResult]) -> str:
+    """One line per kind of outcome, for the DM who ran /schedule remind."""
+    sent = [r.name for r in results if r.ok]
+    lines = [f"Reminded {len(sent)} of {len(results)} player(s) who haven't voted."]
+    closed = [r.name for r in results if r.status == FORBIDDEN]
+    if closed:
+        lines.append(f"DMs closed: {', '.join(closed)}")
+    errors = [r.name for r in results if r.status == FAILED]
+    if errors:
+        lines.append(f"Discord error: {', '.join(errors)}")
+    unknown = [r.name for r in results if r.status == UNKNOWN_USER]
+    if unknown:
+        lines.append(f"No longer on Discord: {', '.join(unknown)}")
+    return "\n".join(lines)
 
 
 def _poll_expiry(poll) -> datetime | None:
@@ -77,9 +151,18 @@ def _message_created_at(msg: discord.Message) -> datetime:
 class SchedulingCog(commands.Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
-        self._scheduled_tasks: list[asyncio.Task] = []
+        # message id -> its poll's halfway reminder, all on one task.
+        self._reminders: ReminderQueue[int] = ReminderQueue(self._send_reminder, name="poll reminders")
+        self._tallies = PollTallies()
+        self._registering: set[int] = set()   # message ids being stored right now
         self._register_commands()
 
+    async def cog_load(self) -> None:
+        self._reminders.start()
+
+    async def cog_unload(self) -> None:
+        await self._reminders.stop()
+
     def _register_commands(self):
         schedule_group = app_commands.Group(
             name="schedule",
@@ -90,71 +173,90 @@ class SchedulingCog(commands.Cog):
                 self.schedule_remind
             )
         )
+        schedule_group.add_command(
+            app_commands.command(name="missing", description="Show who hasn't voted on the open scheduling poll")(
+                self.schedule_missing
+            )
+        )
         self.bot.tree.add_command(schedule_group)
 
-    async def _remind_non_voters(self, game: Game, channel_id: int, message_id: int, guild_id: int):
-        """DM all players (not DM) who haven't voted, with link to the poll message."""
+    async def _poll_votes(self, channel: discord.abc.Messageable, message_id: int) -> dict[int, Set[int]] | None:
+        """Who picked what on a poll: from its live tally when that is current,
+        otherwise over REST (resyncing the tally if the poll is tracked).
+        None if the message or its poll is gone. Raises discord.HTTPException
+        if the votes cannot be read.
+        """
+        votes = self._tallies.votes(message_id)
+        if votes is not None:
+            return votes
+        try:
+            message = await channel.fetch_message(message_id)
+        except Exception:
+            return None
+        poll = getattr(message, "poll", None)
+        if not poll:
+            return None
+        if self._tallies.tracked(message_id):
+            fetch = partial(_get_poll_votes, self.bot, channel.id, message_id, poll, use_cache=False)
+            return await self._tallies.resync(message_id, fetch)
+        return await _get_poll_votes(self.bot, channel.id, message_id, poll)
+
+    async def _remind_non_voters(
+        self, game: GameInfo, channel_id: int, message_id: int, guild_id: int
+    ) -> list[DmResult] | None:
+        """DM all players (not DM) who haven't voted, with link to the poll message.
+
+        Returns one result per player DMed, or None if the guild, channel or poll
+        is gone. Raises discord.HTTPException if the votes cannot be read;
+        nobody is DMed then.
+        """
         guild = self.bot.get_guild(guild_id)
         if not guild:
             return
         channel = guild.get_channel(channel_id)
         if not channel:
             return
-        try:
-            message = await channel.fetch_message(message_id)
-        except Exception:
+        votes = await self._poll_votes(channel, message_id)
+        if votes is None:
             return
-        poll = getattr(message, "poll", None)
-        if not poll:
-            return
-        voter_ids = await _get_poll_voter_ids(self.bot, channel_id, message_id, poll)
+        voter_ids = set().union(*votes.values())
         link = f"https://discord.com/channels/{guild_id}/{channel_id}/{message_id}"
-        async with async_session_factory() as session:
-            player_ids = await get_player_ids(session, game.id)
+        player_ids = await get_player_ids(game.id)
         non_voters = player_ids - voter_ids
-        failed = []
-        for uid in non_voters:
-            user = guild.get_member(uid) or await self.bot.fetch_user(uid)
-            if not user:
-                continue
-            try:
-                await user.send(
-                    f"You haven't voted on the session scheduling for **{game.name}**. "
-                    f"Please vote here: {link}"
-                )
-            except discord.Forbidden:
-                failed.append(user.display_name)
-        return failed
+        return await send_dms(
+            self.bot,
+            guild,
+            non_voters,
+            f"You haven't voted on the session scheduling for **{game.name}**. "
+            f"Please vote here: {link}",
+        )
 
-    async def _run_reminder_at(self, poll_id: int):
-        """Wait until reminder_at then send reminders and mark reminder_sent."""
-        async with async_session_factory() as session:
-            poll = await session.get(SchedulePoll, poll_id)
-            if not poll or poll.reminder_sent:
-                return
-            reminder_at = poll.reminder_at
-            if reminder_at.tzinfo is None:
-                reminder_at = reminder_at.replace(tzinfo=timezone.utc)
-        now = datetime.now(timezone.utc)
-        delay = (reminder_at - now).total_seconds()
-        if delay > 0:
-            await asyncio.sleep(delay)
-        async with async_session_factory() as session:
-            poll = await session.get(SchedulePoll, poll_id)
-            if not poll or poll.reminder_sent:
-                return
-            game = await session.get(Game, poll.game_id)
-            if not game:
+    async def _send_reminder(self, message_id: int, due: _DuePoll):
+        """Reminder came due (fired by the reminder queue): remind, then mark it sent."""
+        game = await game_registry.get(due.game_id)
+        if not game:
+            return   # game deleted; its polls went with it
+        guild_id = game.guild_id
+        channel_id = due.channel_id
+        try:
+            results = await self._remind_non_voters(game, channel_id, message_id, guild_id)
+        except discord.HTTPException as exc:
+            if due.attempt + 1 >= _REMINDER_ATTEMPTS:
+                log.warning("Poll %s: could not read votes, reminder dropped: %s", message_id, exc)
                 return
-            channel_id = poll.channel_id
-            message_id = poll.message_id
-            guild_id = game.guild_id
-        failed = await self._remind_non_voters(game, channel_id, message_id, guild_id)
+            log.info("Poll %s: could not read votes, retrying in %ds: %s", message_id, _REMINDER_RETRY, exc)
+            self._reminders.schedule(
+                message_id,
+                datetime.now(timezone.utc) + timedelta(seconds=_REMINDER_RETRY),
+                due._replace(attempt=due.attempt + 1),
+            )
+            return
         async with async_session_factory() as session:
-            poll = await session.get(SchedulePoll, poll_id)
-            if poll:
-                poll.reminder_sent = True
-                await session.commit()
+            await session.execute(
+                update(SchedulePoll).where(SchedulePoll.id == due.poll_id).values(reminder_sent=True)
+            )
+            await session.commit()
+        failed = [r.name for r in results or () if not r.ok]
         if failed and guild_id:
             guild = self.bot.get_guild(guild_id)
             if guild:
@@ -168,34 +270,95 @@ class SchedulingCog(commands.Cog):
                         pass
 
     async def _start_poll_reminder_scheduler(self):
-        """On startup, schedule reminder tasks for all unsent SchedulePolls with reminder_at in the future."""
+        """On startup, queue the reminder of every open poll that has not had one.
+
+        A reminder that came due while the bot was down is sent now, as long as
+        its poll is still open.
+        """
         await self.bot.wait_until_ready()
         async with async_session_factory() as session:
-            result = await session.execute(
-                select(SchedulePoll).where(
+            rows = (await session.execute(
+                select(
+                    SchedulePoll.id, SchedulePoll.game_id, SchedulePoll.channel_id,
+                    SchedulePoll.message_id, SchedulePoll.reminder_at,
+                ).where(
                     SchedulePoll.reminder_sent == False,
-                    SchedulePoll.reminder_at > datetime.now(timezone.utc).replace(tzinfo=None),
+                    SchedulePoll.expiry > datetime.now(timezone.utc).replace(tzinfo=None),
                 )
-            )
-            rows = result.scalars().all()
-        for poll in rows:
-            task = asyncio.create_task(self._run_reminder_at(poll.id))
-            self._scheduled_tasks.append(task)
+            )).all()
+        for poll_id, game_id, channel_id, message_id, reminder_at in rows:
+            self._reminders.schedule(message_id, reminder_at, _DuePoll(poll_id, game_id, channel_id))
+        log.info("Poll reminders: %d pending", len(rows))
+        log.info("Poll tallies: %d open polls loaded", await self._tallies.load())
+        log.info("Scheduling polls posted while offline: %d", await self._catch_up_polls())
+
+    async def _catch_up_polls(self) -> int:
+        """Register polls posted in scheduling channels while the bot was offline.
+
+        One look at each scheduling channel's recent messages, once per start;
+        after this, on_message sees every new poll as it is posted.
+        """
+        async with async_session_factory() as session:
+            newest = dict((await session.execute(
+                select(SchedulePoll.channel_id, func.max(SchedulePoll.message_id))
+                .group_by(SchedulePoll.channel_id)
+            )).all())
+        gate = asyncio.Semaphore(_CATCH_UP_CONCURRENCY)
 
-    async def _on_poll_created(self, message: discord.Message, game: Game):
-        """New message with poll in a scheduling channel: store and schedule halfway reminder."""
+        async def scan(game: GameInfo) -> int:
+            guild = self.bot.get_guild(game.guild_id)
+            channel = guild.get_channel(game.text_scheduling_id) if guild else None
+            if channel is None:
+                return 0
+            async with gate:
+                try:
+                    messages = [m async for m in channel.history(limit=_CATCH_UP_MESSAGES)]
+                except discord.HTTPException as exc:
+                    log.info("Could not read #%s of %s: %s", channel.name, game.name, exc)
+                    return 0
+            seen = newest.get(channel.id, 0)
+            # Oldest first, so the newest poll is also the newest registered.
+            new = [m for m in reversed(messages) if m.id > seen and getattr(m, "poll", None)]
+            return sum([await self._on_poll_created(m, game) for m in new])
+
+        return sum(await asyncio.gather(*(scan(g) for g in await game_registry.all())))
+
+    async def _on_poll_created(self, message: discord.Message, game: GameInfo) -> bool:
+        """New message with poll in a scheduling channel: store and schedule halfway reminder.
+
+        Returns whether the poll was registered (not already known, not closed).
+        """
         poll = getattr(message, "poll", None)
-        if not poll:
-            return
+        if not poll or self._tallies.tracked(message.id) or message.id in self._registering:
+            return False
         expiry = _poll_expiry(poll)
-        if not expiry:
-            return
+        if not expiry or expiry <= datetime.now(timezone.utc) or poll.is_finalized():
+            return False
+        self._registering.add(message.id)
+        try:
+            schedule_poll_id = await self._store_poll(message, game, expiry)
+        finally:
+            self._registering.discard(message.id)
+        # Track votes from here on; the one REST read catches any that came in
+        # before the poll was registered.
+        self._tallies.register(schedule_poll_id, message.id, message.channel.id, expiry)
+        try:
+            await self._tallies.resync(
+                message.id,
+                partial(_get_poll_votes, self.bot, message.channel.id, message.id, poll, use_cache=False),
+            )
+        except discord.HTTPException as exc:
+            log.info("Poll %s: initial vote read failed, retried on first use: %s", message.id, exc)
+        return True
+
+    async def _store_poll(self, message: discord.Message, game: GameInfo, expiry: datetime) -> int:
+        """Insert the schedule_polls row and queue the halfway reminder. Returns the row id."""
         created = _message_created_at(message)
         half = (expiry - created).total_seconds() / 2
         reminder_at = created.timestamp() + half
+        # In the past only for a poll found by the startup catch-up: the
+        # reminder queue sends it straight away, as for any missed reminder.
         reminder_dt = datetime.fromtimestamp(reminder_at, tz=timezone.utc)
-        if reminder_dt <= datetime.now(timezone.utc):
-            return
         async with async_session_factory() as session:
             schedule_poll = SchedulePoll(
                 game_id=game.id,
@@ -207,17 +370,75 @@ class SchedulingCog(commands.Cog):
             session.add(schedule_poll)
             await session.commit()
             await session.refresh(schedule_poll)
-        task = asyncio.create_task(self._run_reminder_at(schedule_poll.id))
-        self._scheduled_tasks.append(task)
+        self._reminders.schedule(
+            message.id, reminder_dt, _DuePoll(schedule_poll.id, game.id, message.channel.id)
+        )
+        return schedule_poll.id
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Also fires after a reconnect that could not resume the gateway
+        # session; vote events sent in between are lost.
+        self._tallies.mark_unverified()
+
+    @commands.Cog.listener()
+    async def on_raw_poll_vote_add(self, payload: discord.RawPollVoteActionEvent):
+        await self._tallies.vote(payload.message_id, payload.answer_id, payload.user_id, True)
+
+    @commands.Cog.listener()
+    async def on_raw_poll_vote_remove(self, payload: discord.RawPollVoteActionEvent):
+        await self._tallies.vote(payload.message_id, payload.answer_id, payload.user_id, False)
+
+    def forget_polls(self, message_ids: set[int]) -> tuple[set[int], set[int]]:
+        """Drop these polls' reminders and tallies from memory only; the caller
+        handles their rows (GamesCog calls this after deleting a game, whose
+        polls cascade). Returns (polls that were tracked, reminders cancelled).
+        """
+        cancelled = {mid for mid in message_ids if self._reminders.cancel(mid)}
+        return cancelled | set(self._tallies.forget(message_ids)), cancelled
+
+    async def _poll_gone(self, message_ids: set[int], *, deleted: bool) -> None:
+        """Call off the reminders and tallies of polls deleted or ended early."""
+        ids, cancelled = self.forget_polls(message_ids)
+        if not ids:
+            return
+        async with async_session_factory() as session:
+            polls = SchedulePoll.message_id.in_(ids)
+            if deleted:
+                await session.execute(delete(PollVote).where(
+                    PollVote.poll_id.in_(select(SchedulePoll.id).where(polls))
+                ))
+                await session.execute(delete(SchedulePoll).where(polls))
+            else:
+                # Ended early: it closed now, so a restart does not queue it again.
+                await session.execute(
+                    update(SchedulePoll).where(polls)
+                    .values(expiry=datetime.now(timezone.utc).replace(tzinfo=None))
+                )
+            await session.commit()
+        log.info("Scheduling polls %s: %d (%d reminders cancelled)",
+                 "deleted" if deleted else "ended", len(ids), len(cancelled))
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        await self._poll_gone({payload.message_id}, deleted=True)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        await self._poll_gone(set(payload.message_ids), deleted=True)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        # A poll ended early (or at expiry) arrives as an edit with final results.
+        results = (payload.data.get("poll") or {}).get("results") or {}
+        if results.get("is_finalized"):
+            await self._poll_gone({payload.message_id}, deleted=False)
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         if not message.guild or not getattr(message, "poll", None):
             return
-        async with async_session_factory() as session:
-            game = await get_game_by_scheduling_channel(
-                session, message.guild.id, message.channel.id
-            )
+        game = await get_game_by_scheduling_channel(message.guild.id, message.channel.id)
         if game:
             await self._on_poll_created(message, game)
 
@@ -228,22 +449,19 @@ class SchedulingCog(commands.Cog):
                 ephemeral=True,
             )
             return
-        async with async_session_factory() as session:
-            game = await get_game_by_channel(
-                session, interaction.guild.id, interaction.channel_id
+        game = await get_game_by_channel(interaction.guild.id, interaction.channel_id)
+        if not game:
+            await interaction.response.send_message(
+                "Run this command in one of the game's text channels (important, scheduling, or general).",
+                ephemeral=True,
             )
-            if not game:
-                await interaction.response.send_message(
-                    "Run this command in one of the game's text channels (important, scheduling, or general).",
-                    ephemeral=True,
-                )
-                return
-            if game.dm_user_id != interaction.user.id:
-                await interaction.response.send_message(
-                    "Only the DM can run this.",
-                    ephemeral=True,
-                )
-                return
+            return
+        if game.dm_user_id != interaction.user.id:
+            await interaction.response.send_message(
+                "Only the DM can run this.",
+                ephemeral=True,
+            )
+            return
 
         channel = interaction.guild.get_channel(game.text_scheduling_id)
         if not channel:
@@ -252,40 +470,87 @@ class SchedulingCog(commands.Cog):
                 ephemeral=True,
             )
             return
+        # The newest open poll, from the poll registry: no channel history read.
+        poll_message_id = self._tallies.latest_open(channel.id)
+        if poll_message_id is None:
+            await interaction.response.send_message(
+                "No open scheduling poll in this game. Create a poll in the scheduling channel first.",
+                ephemeral=True,
+            )
+            return
+
+        await interaction.response.defer(ephemeral=True)
         try:
-            messages = [m async for m in channel.history(limit=20)]
-        except Exception:
+            results = await self._remind_non_voters(
+                game,
+                game.text_scheduling_id,
+                poll_message_id,
+                interaction.guild.id,
+            )
+        except discord.HTTPException:
+            await interaction.followup.send(
+                "Could not read the poll's votes from Discord, so nobody was reminded. Try again in a minute.",
+                ephemeral=True,
+            )
+            return
+        if results is None:
+            await interaction.followup.send(
+                "The scheduling poll could not be found any more.",
+                ephemeral=True,
+            )
+        elif not results:
+            await interaction.followup.send(
+                "Every player has already voted.",
+                ephemeral=True,
+            )
+        else:
+            await interaction.followup.send(_outcome_summary(results), ephemeral=True)
+
+    async def schedule_missing(self, interaction: discord.Interaction):
+        """List the players who have not voted on the game's open scheduling poll."""
+        if not interaction.guild:
             await interaction.response.send_message(
-                "Could not read the scheduling channel.",
+                "This command can only be used in a server.",
                 ephemeral=True,
             )
             return
-        poll_message = None
-        for m in messages:
-            if getattr(m, "poll", None):
-                poll_message = m
-                break
-        if not poll_message:
+        game = await get_game_by_channel(interaction.guild.id, interaction.channel_id)
+        if not game:
             await interaction.response.send_message(
-                "No scheduling poll found in this channel. Create a poll here first.",
+                "Run this command in one of the game's text channels (important, scheduling, or general).",
                 ephemeral=True,
             )
             return
-
+        message_id = self._tallies.latest_open(game.text_scheduling_id)
+        channel = interaction.guild.get_channel(game.text_scheduling_id)
+        if message_id is None or not channel:
+            await interaction.response.send_message(
+                "No open scheduling poll in this game. Create a poll in the scheduling channel first.",
+                ephemeral=True,
+            )
+            return
+        # A tally that needs a resync (after a restart or reconnect) is read
+        # over REST, which can outlast the 3 s an interaction has to answer.
         await interaction.response.defer(ephemeral=True)
-        failed = await self._remind_non_voters(
-            game,
-            game.text_scheduling_id,
-            poll_message.id,
-            interaction.guild.id,
-        )
-        if failed:
+        try:
+            votes = await self._poll_votes(channel, message_id)
+        except discord.HTTPException:
+            votes = None
+        if votes is None:
             await interaction.followup.send(
-                f"Reminder sent. Could not DM: {', '.join(failed)}",
+                "Could not read the poll's votes from Discord. Try again in a minute.",
                 ephemeral=True,
             )
+            return
+        player_ids = await get_player_ids(game.id)
+        missing = player_ids - set().union(*votes.values())
+        link = f"https://discord.com/channels/{interaction.guild.id}/{channel.id}/{message_id}"
+        if not missing:
+            description = f"Every player has voted on the [scheduling poll]({link})."
         else:
-            await interaction.followup.send(
-                "Reminders sent to players who haven't voted.",
-                ephemeral=True,
+            description = (
+                f"{len(missing)} of {len(player_ids)} player(s) haven't voted on the [scheduling poll]({link}):\n"
+                + "\n".join(f"<@{uid}>" for uid in sorted(missing))
             )
+        embed = discord.Embed(title=f"{game.name}: votes", description=description, color=discord.Color.blue())
+        await interaction.followup.send(embed=embed, ephemeral=True)
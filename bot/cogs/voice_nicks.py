@@ -7,7 +7,6 @@ from typing import TYPE_CHECKING
 import discord
 from discord.ext import commands
 
-from bot.db import async_session_factory
 from bot.utils import get_character_name_for_voice_channel
 
 if TYPE_CHECKING:
@@ -73,10 +72,8 @@ class VoiceNickCog(commands.Cog):
         # Joined or moved to a channel — set nickname if game voice and has character name
         if after.channel is None:
             return
-        async with async_session_factory() as session:
-            character_name = await get_character_name_for_voice_channel(
-                session, guild_id, after.channel.id, user_id
-            )
+        # Served from the game registry: no database round trip per voice move.
+        character_name = await get_character_name_for_voice_channel(guild_id, after.channel.id, user_id)
         if not character_name:
             log.debug("voice_nick: channel %s is not a game voice for %s or no character name", after_id, member.name)
             return
@@ -1,10 +1,15 @@
 """Database models and async engine for SQLite."""
 import logging
 import os
+from contextlib import asynccontextmanager
+from functools import partial
 from datetime import datetime, timezone
-from sqlalchemy import String, Integer, BigInteger, Boolean, DateTime, ForeignKey, Text, UniqueConstraint
+from sqlalchemy import (
+    String, Integer, BigInteger, Boolean, DateTime, ForeignKey, Index, Text, UniqueConstraint, event, func,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncAttrs
+from typing import AsyncIterator, Iterator, Sequence, TypeVar
 
 log = logging.getLogger(__name__)
 
@@ -22,6 +27,9 @@ if "sqlite" in DATABASE_URL:
         if d:
             os.makedirs(d, exist_ok=True)
 
+# Where other on-disk state (the audio cache) lives: next to the database.
+DATA_DIR = os.path.dirname(os.path.abspath(_default_path))
+
 
 class Base(AsyncAttrs, DeclarativeBase):
     pass
@@ -37,11 +45,13 @@ class Game(Base):
     category_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
     game_role_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
     dm_role_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)  # DM-only role for manage_channels etc.
-    text_important_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
-    text_scheduling_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
-    text_general_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
-    voice_game_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
-    voice_private_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    # Channel columns are indexed: every message, command and voice move in a
+    # guild is resolved to its game through one of them.
+    text_important_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    text_scheduling_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    text_general_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    voice_game_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    voice_private_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
     dm_character_name: Mapped[str | None] = mapped_column(String(32), nullable=True)
 
@@ -65,7 +75,10 @@ class Player(Base):
 
     game: Mapped["Game"] = relationship("Game", back_populates="players")
 
-    __table_args__ = ({"sqlite_autoincrement": True},)
+    __table_args__ = (
+        Index("ix_players_game_user", "game_id", "user_id"),
+        {"sqlite_autoincrement": True},
+    )
 
 
 class SchedulePoll(Base):
@@ -81,6 +94,35 @@ class SchedulePoll(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
 
     game: Mapped["Game"] = relationship("Game", back_populates="schedule_polls")
+    votes: Mapped[list["PollVote"]] = relationship(cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_schedule_polls_game_id", "game_id"),
+        # The reminder scheduler's startup query: unsent, due in the future.
+        Index("ix_schedule_polls_reminder", "reminder_sent", "reminder_at"),
+        # Open polls (the live tallies loaded at startup).
+        Index("ix_schedule_polls_expiry", "expiry"),
+        # Message delete/edit events name the poll by message id; the startup
+        # catch-up asks for each channel's newest poll.
+        Index("ix_schedule_polls_message_id", "message_id"),
+        Index("ix_schedule_polls_channel_message", "channel_id", "message_id"),
+    )
+
+
+class PollVote(Base):
+    """One user's pick on one answer of a scheduling poll (see bot/poll_tally.py).
+
+    Kept up to date from gateway vote events, so the bot knows who has voted
+    without asking Discord.
+    """
+
+    __tablename__ = "poll_votes"
+
+    poll_id: Mapped[int] = mapped_column(
+        ForeignKey("schedule_polls.id", ondelete="CASCADE"), primary_key=True
+    )
+    answer_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
 
 
 # ---------------------------------------------------------------------------
@@ -95,10 +137,15 @@ class Track(Base):
     title: Mapped[str] = mapped_column(String(200), nullable=False)
     duration_sec: Mapped[int | None] = mapped_column(Integer, nullable=True)
     thumbnail_url: Mapped[str | None] = mapped_column(Text, nullable=True)
-    added_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    added_at: Mapped[datetime] = mapped_column(
+        DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None), index=True
+    )
 
     playlist_entries: Mapped[list["PlaylistTrack"]] = relationship("PlaylistTrack", back_populates="track", cascade="all, delete-orphan")
 
+    # The library's title sorts (bot/library.py) order by lower(title).
+    __table_args__ = (Index("ix_tracks_title_lower", func.lower(title)),)
+
 
 class Playlist(Base):
     __tablename__ = "playlists"
@@ -117,12 +164,60 @@ class Playlist(Base):
     tracks: Mapped[list["PlaylistTrack"]] = relationship("PlaylistTrack", back_populates="playlist", cascade="all, delete-orphan", order_by="PlaylistTrack.position")
 
 
+def parse_tags(raw: str | None) -> list[str]:
+    """Split a playlist's tag string into normalised tags."""
+    if not raw:
+        return []
+    return [t.lower() for t in raw.replace(",", " ").split() if t]
+
+
+class Tag(Base):
+    """One tag, shared by every playlist that carries it.
+
+    Playlist.tags keeps the text as typed (for display and full-text search);
+    tags/playlist_tags hold the same words normalised, so "playlists tagged
+    x" and per-tag counts are index lookups rather than a parse of every
+    playlist's string.
+    """
+
+    __tablename__ = "tags"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(100), nullable=False, unique=True)
+
+
+class PlaylistTag(Base):
+    __tablename__ = "playlist_tags"
+
+    playlist_id: Mapped[int] = mapped_column(ForeignKey("playlists.id", ondelete="CASCADE"), primary_key=True)
+    # The primary key covers lookups by playlist; this covers them by tag.
+    tag_id: Mapped[int] = mapped_column(ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+
+# Playlist positions are sparse: entries are laid out this far apart, so a
+# track moved between two neighbours takes a free number between theirs and
+# only its own row changes. Only order matters; the numbers mean nothing.
+POSITION_GAP = 1024
+
+# Ids per IN (...) list; older SQLite builds cap bound parameters at 999.
+IN_CHUNK = 500
+
+_T = TypeVar("_T")
+
+
+def in_chunks(ids: Sequence[_T]) -> Iterator[Sequence[_T]]:
+    """ids in slices of at most IN_CHUNK, each small enough for one IN (...) list."""
+    for i in range(0, len(ids), IN_CHUNK):
+        yield ids[i:i + IN_CHUNK]
+
+
 class PlaylistTrack(Base):
     __tablename__ = "playlist_tracks"
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     playlist_id: Mapped[int] = mapped_column(ForeignKey("playlists.id", ondelete="CASCADE"), nullable=False)
-    track_id: Mapped[int] = mapped_column(ForeignKey("tracks.id", ondelete="CASCADE"), nullable=False)
+    # Indexed for track deletes (cascade) and per-playlist track counts.
+    track_id: Mapped[int] = mapped_column(ForeignKey("tracks.id", ondelete="CASCADE"), nullable=False, index=True)
     position: Mapped[int] = mapped_column(Integer, nullable=False)
 
     playlist: Mapped["Playlist"] = relationship("Playlist", back_populates="tracks")
@@ -156,77 +251,122 @@ class Hotkey(Base):
     playlist: Mapped["Playlist"] = relationship("Playlist")
 
 
+class MaintenanceTask(Base):
+    """Progress of a long repair job (see bot/maintenance.py).
+
+    cursor is how far the job got, so an interrupted run picks up there
+    instead of starting over.
+    """
+
+    __tablename__ = "maintenance_tasks"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    status: Mapped[str] = mapped_column(String(16), nullable=False)  # pending | running | done
+    cursor: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    affected: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        default=lambda: datetime.now(timezone.utc).replace(tzinfo=None),
+        onupdate=lambda: datetime.now(timezone.utc).replace(tzinfo=None),
+    )
+
+
+def _int_from_env(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)))
+    except ValueError:
+        log.warning("%s is not a number; using %d", name, default)
+        return default
+
+
+def _choice_from_env(name: str, default: str, choices: tuple[str, ...]) -> str:
+    value = os.environ.get(name, default).strip().upper()
+    if value not in choices:
+        log.warning("%s must be one of %s; using %s", name, ", ".join(choices), default)
+        return default
+    return value
+
+
+# SQLite profile, applied to every connection. WAL lets the web UI keep
+# reading while an import writes; with it, synchronous=NORMAL is still safe
+# against corruption (a power cut can lose the last commits, not the file).
+# busy_timeout makes a blocked writer wait instead of failing with "database
+# is locked". Foreign keys turn on the ON DELETE CASCADEs the models declare.
+# SQLITE_PROFILE=off skips all of it (driver defaults, one shared pool).
+_PROFILE = _choice_from_env("SQLITE_PROFILE", "TUNED", ("TUNED", "OFF"))
+_JOURNAL_MODE = _choice_from_env("SQLITE_JOURNAL_MODE", "WAL", ("WAL", "DELETE", "TRUNCATE"))
+_SYNCHRONOUS = _choice_from_env("SQLITE_SYNCHRONOUS", "NORMAL", ("OFF", "NORMAL", "FULL"))
+_PRAGMAS = (
+    f"PRAGMA journal_mode = {_JOURNAL_MODE}",
+    f"PRAGMA synchronous = {_SYNCHRONOUS}",
+    f"PRAGMA busy_timeout = {max(0, _int_from_env('SQLITE_BUSY_TIMEOUT_MS', 5000))}",
+    f"PRAGMA cache_size = {-1024 * max(1, _int_from_env('SQLITE_CACHE_MB', 16))}",   # negative: KiB
+    f"PRAGMA mmap_size = {1024 * 1024 * max(0, _int_from_env('SQLITE_MMAP_MB', 256))}",
+    "PRAGMA foreign_keys = ON",
+)
+# Read-only connections beside the one writer. 0 keeps a single ordinary
+# pool for reads and writes alike (the behaviour before the split).
+_READ_POOL = max(0, _int_from_env("SQLITE_READ_POOL", 8))
+
+
+def _apply_pragmas(dbapi_conn, _record, *, read_only: bool = False) -> None:
+    cursor = dbapi_conn.cursor()
+    for pragma in _PRAGMAS:
+        cursor.execute(pragma)
+    if read_only:
+        cursor.execute("PRAGMA query_only = ON")
+    cursor.close()
+
+
+_sqlite = "sqlite" in DATABASE_URL
+_connect_args = {"check_same_thread": False} if _sqlite else {}
+# An in-memory database is private to its one connection: nothing to split.
+_pooled = _sqlite and ":memory:" not in DATABASE_URL
+
+_tuned = _sqlite and _PROFILE == "TUNED"
+_split = _tuned and _pooled and _READ_POOL > 0
+
+# With the split, writes go through a single connection. SQLite runs one
+# writer at a time whatever the pool size; queueing for the connection here
+# means a write waits its turn in Python instead of spinning on the file
+# lock, and a transaction can never hit "database is locked" half-way.
 engine = create_async_engine(
     DATABASE_URL,
     echo=False,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
+    connect_args=_connect_args,
+    **({"pool_size": 1, "max_overflow": 0} if _split else {}),
 )
 async_session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Reads that never write (listings, search, lookups) use a pool of their
+# own, so they neither queue behind an import nor hold up the writer. Under
+# WAL they see the last committed state while a write is in progress.
+if _split:
+    read_engine = create_async_engine(
+        DATABASE_URL,
+        echo=False,
+        connect_args=_connect_args,
+        pool_size=_READ_POOL,
+        max_overflow=0,
+    )
+    event.listen(read_engine.sync_engine, "connect", partial(_apply_pragmas, read_only=True))
+else:
+    read_engine = engine
+read_session_factory = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+if _tuned:
+    event.listen(engine.sync_engine, "connect", _apply_pragmas)
+
+
+@asynccontextmanager
+async def session_scope(session: AsyncSession | None = None) -> AsyncIterator[AsyncSession]:
+    """The caller's session if given, else a fresh one committed on exit.
 
-async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
-    # Add new columns to existing tables (no-op if already present)
-    if "sqlite" in DATABASE_URL:
-        import sqlite3
-        raw_path = DATABASE_URL.replace("sqlite+aiosqlite:///", "").split("?")[0]
-        sync_conn = sqlite3.connect(raw_path)
-        for sql in (
-            "ALTER TABLE games ADD COLUMN dm_character_name VARCHAR(32)",
-            "ALTER TABLE players ADD COLUMN character_name VARCHAR(32)",
-            "ALTER TABLE games ADD COLUMN dm_role_id BIGINT",
-            "ALTER TABLE playlists ADD COLUMN cover_path TEXT",
-            "ALTER TABLE playlists ADD COLUMN tags TEXT",
-            "ALTER TABLE playlists ADD COLUMN updated_at DATETIME",
-        ):
-            try:
-                sync_conn.execute(sql)
-            except sqlite3.OperationalError:
-                pass  # column already exists
-        sync_conn.commit()
-
-        # Repair is best-effort: a database from an older schema must never
-        # stop the bot from starting, so failures here are logged, not raised.
-        try:
-            # Repair: playlist entries can be left pointing at tracks that no longer
-            # exist (an interrupted import, a hand-edited DB, an older schema). They
-            # are invisible in the UI but still counted, and any code that assumes
-            # the track resolves will fail on them. Drop them and close the gaps in
-            # the position sequence so the unique (playlist_id, position) index holds.
-            orphans = sync_conn.execute(
-                "SELECT COUNT(*) FROM playlist_tracks WHERE track_id NOT IN (SELECT id FROM tracks)"
-            ).fetchone()[0]
-            if orphans:
-                rows = sync_conn.execute(
-                    "SELECT playlist_id, COUNT(*) FROM playlist_tracks "
-                    "WHERE track_id NOT IN (SELECT id FROM tracks) GROUP BY playlist_id"
-                ).fetchall()
-                sync_conn.execute(
-                    "DELETE FROM playlist_tracks WHERE track_id NOT IN (SELECT id FROM tracks)"
-                )
-                for playlist_id, _ in rows:
-                    remaining = sync_conn.execute(
-                        "SELECT id FROM playlist_tracks WHERE playlist_id = ? ORDER BY position, id",
-                        (playlist_id,),
-                    ).fetchall()
-                    # Park positions negative first so renumbering cannot collide
-                    # with a row that still holds the target position.
-                    for offset, (row_id,) in enumerate(remaining):
-                        sync_conn.execute(
-                            "UPDATE playlist_tracks SET position = ? WHERE id = ?", (-1 - offset, row_id)
-                        )
-                    for pos, (row_id,) in enumerate(remaining):
-                        sync_conn.execute(
-                            "UPDATE playlist_tracks SET position = ? WHERE id = ?", (pos, row_id)
-                        )
-                sync_conn.commit()
-                detail = ", ".join(f"playlist {pid}: {n}" for pid, n in rows)
-                log.warning(
-                    "Removed %d playlist entries pointing at missing tracks (%s)", orphans, detail
-                )
-        except sqlite3.Error as exc:
-            log.warning("Skipped playlist repair: %s", exc)
-
-        sync_conn.close()
+    Lets a helper run standalone or inside a larger transaction: with a
+    session passed in, committing is the caller's job.
+    """
+    if session is not None:
+        yield session
+        return
+    async with async_session_factory() as own:
+        yield own
+        await own.commit()
@@ -0,0 +1,102 @@
+"""Send one DM to many users at once, and report what happened to each.
+
+Reminders used to go out one player at a time, with a fetch_user call before
+each send when the member was not cached: a ten-player reminder was up to
+twenty HTTP round trips in a row. Here recipients are resolved in bulk
+(the member cache first, then a single gateway member request for the rest,
+REST only for users no longer in the guild) and the sends run side by side.
+
+discord.py already queues every request behind its route's rate-limit
+bucket and retries 429s, so the only limit kept here is how many sends are
+in flight at once, well under the global request rate.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Iterable, NamedTuple
+
+import discord
+
+if TYPE_CHECKING:
+    from discord.ext import commands
+
+log = logging.getLogger(__name__)
+
+# DMs in flight at once.
+_CONCURRENCY = 5
+# Most user ids the gateway accepts in one member request.
+_CHUNK = 100
+
+SENT, FORBIDDEN, FAILED, UNKNOWN_USER = "sent", "forbidden", "failed", "unknown user"
+
+
+class DmResult(NamedTuple):
+    user_id: int
+    name: str          # display name, or the id when the user could not be resolved
+    status: str        # SENT, FORBIDDEN (DMs closed / blocked), FAILED or UNKNOWN_USER
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == SENT
+
+
+async def resolve_users(
+    bot: commands.Bot, guild: discord.Guild | None, user_ids: Iterable[int]
+) -> dict[int, discord.abc.User]:
+    """Users by id: cached members, then one member request per 100 ids, then REST.
+
+    Ids that resolve to nobody are left out.
+    """
+    wanted = set(user_ids)
+    found: dict[int, discord.abc.User] = {}
+    if guild is not None:
+        for uid in wanted:
+            member = guild.get_member(uid)
+            if member is not None:
+                found[uid] = member
+        missing = sorted(wanted - found.keys())
+        if missing and bot.intents.members:
+            for i in range(0, len(missing), _CHUNK):
+                try:
+                    members = await guild.query_members(user_ids=missing[i:i + _CHUNK], limit=_CHUNK)
+                except asyncio.TimeoutError:
+                    log.info("Member request for %d users in %s timed out", len(missing[i:i + _CHUNK]), guild.id)
+                    continue
+                found.update((m.id, m) for m in members)
+    for uid in wanted - found.keys():
+        # Left the guild (or no guild): the user may still accept DMs.
+        user = bot.get_user(uid)
+        if user is None:
+            try:
+                user = await bot.fetch_user(uid)
+            except discord.HTTPException:
+                continue
+        found[uid] = user
+    return found
+
+
+async def send_dms(
+    bot: commands.Bot, guild: discord.Guild | None, user_ids: Iterable[int], content: str
+) -> list[DmResult]:
+    """DM content to every user, _CONCURRENCY at a time. One result per user, in id order."""
+    user_ids = sorted(set(user_ids))
+    users = await resolve_users(bot, guild, user_ids)
+    gate = asyncio.Semaphore(_CONCURRENCY)
+
+    async def send(uid: int) -> DmResult:
+        user = users.get(uid)
+        if user is None:
+            return DmResult(uid, str(uid), UNKNOWN_USER)
+        async with gate:
+            try:
+                await user.send(content)
+            except discord.Forbidden as exc:
+                return DmResult(uid, user.display_name, FORBIDDEN, exc.text or None)
+            except discord.HTTPException as exc:
+                log.warning("DM to %s failed: %s", uid, exc)
+                return DmResult(uid, user.display_name, FAILED, str(exc))
+        return DmResult(uid, user.display_name, SENT)
+
+    return list(await asyncio.gather(*(send(uid) for uid in user_ids)))
@@ -0,0 +1,150 @@
+"""In-memory registry of games, keyed by guild and channel.
+
+Every voice move in a guild, every poll posted in a scheduling channel and
+every /game and /schedule command is resolved to its game by channel id,
+and games change only through a handful of commands. So the games and their
+players live here, loaded once from SQLite when the bot starts; GamesCog
+calls invalidate() after each write (create, delete, transfer, add or remove
+a player, set or clear a character name, rebuild, forget), and the next
+lookup reloads. A voice join between those writes never touches the
+database.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import NamedTuple
+
+from sqlalchemy import select
+
+from bot.db import Game, Player, read_session_factory
+
+
+class GameInfo(NamedTuple):
+    """A game as of the last load. Read-only: write through a session, then invalidate()."""
+
+    id: int
+    guild_id: int
+    name: str
+    dm_user_id: int
+    dm_character_name: str | None
+    category_id: int
+    game_role_id: int
+    dm_role_id: int | None
+    text_important_id: int
+    text_scheduling_id: int
+    text_general_id: int
+    voice_game_id: int
+    voice_private_id: int
+    players: dict[int, str | None]   # user id -> character name, in the order they joined
+
+    def is_game_text_channel(self, channel_id: int) -> bool:
+        return channel_id in (self.text_important_id, self.text_scheduling_id, self.text_general_id)
+
+    def character_name(self, user_id: int) -> str | None:
+        """The DM's or a player's character name in this game, if they set one."""
+        if user_id == self.dm_user_id:
+            return self.dm_character_name or None
+        return self.players.get(user_id) or None
+
+
+# Which of a game's channels an id is, as stored in _Snapshot.by_channel.
+IMPORTANT, SCHEDULING, GENERAL, VOICE_GAME, VOICE_PRIVATE, CATEGORY = (
+    "important", "scheduling", "general", "game", "private", "category",
+)
+TEXT_CHANNELS = frozenset((IMPORTANT, SCHEDULING, GENERAL))
+VOICE_CHANNELS = frozenset((VOICE_GAME, VOICE_PRIVATE))
+
+_GAME_COLUMNS = [c for c in GameInfo._fields if c != "players"]
+
+
+class _Snapshot(NamedTuple):
+    by_id: dict[int, GameInfo]
+    by_channel: dict[tuple[int, int], tuple[GameInfo, str]]   # (guild, channel) -> (game, kind)
+    by_name: dict[tuple[int, str], GameInfo]                  # (guild, name)
+
+
+def _build(games: list[GameInfo]) -> _Snapshot:
+    by_channel: dict[tuple[int, int], tuple[GameInfo, str]] = {}
+    for game in games:
+        for kind, channel_id in (
+            (CATEGORY, game.category_id),
+            (IMPORTANT, game.text_important_id),
+            (SCHEDULING, game.text_scheduling_id),
+            (GENERAL, game.text_general_id),
+            (VOICE_GAME, game.voice_game_id),
+            (VOICE_PRIVATE, game.voice_private_id),
+        ):
+            by_channel[(game.guild_id, channel_id)] = (game, kind)
+    return _Snapshot(
+        {g.id: g for g in games},
+        by_channel,
+        {(g.guild_id, g.name): g for g in games},
+    )
+
+
+class GameRegistry:
+    def __init__(self) -> None:
+        self._snapshot: _Snapshot | None = None   # None: (re)load on next use
+        # Bumped by invalidate(), so a load that raced a write is not kept.
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        """Drop the registry; call after committing any change to a game or its players."""
+        self._snapshot = None
+        self._generation += 1
+
+    async def warm(self) -> None:
+        """Load now, so the first voice join after startup does not wait on SQLite."""
+        await self._load()
+
+    async def _load(self) -> _Snapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        async with self._lock:
+            if self._snapshot is not None:
+                return self._snapshot
+            generation = self._generation
+            async with read_session_factory() as session:
+                # One read transaction, so the players match the games.
+                game_rows = (await session.execute(
+                    select(*(getattr(Game, c) for c in _GAME_COLUMNS)).order_by(Game.id)
+                )).all()
+                player_rows = (await session.execute(
+                    select(Player.game_id, Player.user_id, Player.character_name).order_by(Player.id)
+                )).all()
+            players: dict[int, dict[int, str | None]] = {}
+            for game_id, user_id, character_name in player_rows:
+                players.setdefault(game_id, {})[user_id] = character_name
+            snapshot = _build([
+                GameInfo(*row, players=players.get(row.id, {})) for row in game_rows
+            ])
+            if generation == self._generation:
+                self._snapshot = snapshot
+            return snapshot
+
+    async def get(self, game_id: int) -> GameInfo | None:
+        return (await self._load()).by_id.get(game_id)
+
+    async def by_channel(
+        self, guild_id: int, channel_id: int, kinds: frozenset[str] | None = None
+    ) -> GameInfo | None:
+        """The game owning this channel or category; with kinds, only if it is one of those."""
+        hit = (await self._load()).by_channel.get((guild_id, channel_id))
+        if hit is None or (kinds is not None and hit[1] not in kinds):
+            return None
+        return hit[0]
+
+    async def by_name(self, guild_id: int, name: str) -> GameInfo | None:
+        return (await self._load()).by_name.get((guild_id, name))
+
+    async def in_guild(self, guild_id: int) -> list[GameInfo]:
+        """The guild's games, oldest first."""
+        return [g for g in (await self._load()).by_id.values() if g.guild_id == guild_id]
+
+    async def all(self) -> list[GameInfo]:
+        return list((await self._load()).by_id.values())
+
+
+registry = GameRegistry()
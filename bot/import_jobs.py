@@ -0,0 +1,193 @@
+"""Library imports as background jobs.
+
+Walking a big playlist takes yt-dlp a while, and the HTTP request or slash
+command that asked for it used to hang on until every row was written — long
+enough for a reverse proxy to give up on it, with no word to the user in the
+meantime. An import is now a job: start() hands back its id at once, the
+work runs in the background (a few jobs at a time), and its progress can be
+polled or streamed. Asking for a URL that is already being imported joins the
+running job instead of starting a second one.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Any
+
+from bot.db import Track, async_session_factory
+from bot.library import append_to_playlists
+from bot.ytdlp import (
+    extract_playlist_id, extract_youtube_id, fetch_playlist_rows, import_track, upsert_tracks,
+)
+
+log = logging.getLogger(__name__)
+
+# Rows written between progress updates; all of a job's rows still commit together.
+_SAVE_CHUNK = 200
+# Finished jobs stay visible this long, for clients polling for the outcome.
+_KEEP_FINISHED_SEC = 600
+
+
+def _max_concurrent() -> int:
+    try:
+        return max(1, int(os.environ.get("IMPORT_CONCURRENCY", "2")))
+    except ValueError:
+        log.warning("IMPORT_CONCURRENCY is not a number; using 2")
+        return 2
+
+
+def _job_key(url: str) -> str:
+    """What makes two import requests the same import, however the URL is spelled."""
+    list_id = extract_playlist_id(url)
+    if list_id:
+        return f"list:{list_id}"
+    youtube_id = extract_youtube_id(url)
+    return f"video:{youtube_id}" if youtube_id else url.strip()
+
+
+class ImportJob:
+    def __init__(self, job_id: str, url: str, key: str) -> None:
+        self.id = job_id
+        self.url = url
+        self.key = key
+        self.status = "queued"   # queued -> fetching -> saving -> done | failed
+        self.seen = 0
+        self.imported = 0
+        self.skipped = 0
+        self.added_to_playlist = 0
+        self.playlist_ids: list[int] = []
+        self.tracks: list[Track] = []
+        self.error: str | None = None
+        self.finished_at: float | None = None
+        self.task: asyncio.Task | None = None
+        self.version = 0   # bumped on every update
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def _update(self, **fields: Any) -> None:
+        for name, value in fields.items():
+            setattr(self, name, value)
+        if self.finished and self.finished_at is None:
+            self.finished_at = time.monotonic()
+        self.version += 1
+        # Wake everyone waiting on this change; later waiters get a fresh event.
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_changed(self, since: int | None = None, timeout: float | None = None) -> None:
+        """Return once version has moved past since (default: now), or after timeout seconds."""
+        if self.finished or (since is not None and self.version != since):
+            return
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def wait(self) -> None:
+        """Return once the job has finished, whatever the outcome."""
+        while not self.finished:
+            await self.wait_changed()
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "url": self.url,
+            "status": self.status,
+            "seen": self.seen,
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "added_to_playlist": self.added_to_playlist,
+            "error": self.error,
+        }
+
+
+class ImportManager:
+    def __init__(self, max_concurrent: int) -> None:
+        self._jobs: dict[str, ImportJob] = {}
+        # key -> job still able to take on another request for the same URL
+        self._active: dict[str, ImportJob] = {}
+        self._slots = asyncio.Semaphore(max_concurrent)
+
+    def start(self, url: str, playlist_id: int | None = None) -> tuple[ImportJob, bool]:
+        """Start importing url, or join the import of it already running.
+
+        Returns (job, started): started is False when the request was merged
+        into a running job, which then also adds its tracks to playlist_id.
+        """
+        self._prune()
+        key = _job_key(url)
+        job = self._active.get(key)
+        started = job is None
+        if job is None:
+            job = ImportJob(uuid.uuid4().hex[:12], url.strip(), key)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            job.task = asyncio.create_task(self._run(job))
+        if playlist_id is not None and playlist_id not in job.playlist_ids:
+            job.playlist_ids.append(playlist_id)
+        return job, started
+
+    def get(self, job_id: str) -> ImportJob | None:
+        self._prune()
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> list[ImportJob]:
+        self._prune()
+        return list(self._jobs.values())
+
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - _KEEP_FINISHED_SEC
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+    async def _run(self, job: ImportJob) -> None:
+        try:
+            async with self._slots:
+                await self._import(job)
+        except ValueError as exc:
+            job._update(status="failed", error=str(exc))
+        except Exception as exc:
+            log.error("import job %s failed for %s: %s", job.id, job.url, exc)
+            job._update(status="failed", error="Failed to fetch that from YouTube")
+        finally:
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+
+    async def _import(self, job: ImportJob) -> None:
+        job._update(status="fetching")
+        # One transaction for the new tracks and their playlist entries: an
+        # import lands whole or not at all. It only begins with the first
+        # write, after the slow yt-dlp part.
+        async with async_session_factory() as session:
+            if extract_playlist_id(job.url):
+                rows, skipped = await fetch_playlist_rows(job.url)
+                job._update(status="saving", seen=len(rows) + skipped, skipped=skipped)
+                tracks: list[Track] = []
+                for i in range(0, len(rows), _SAVE_CHUNK):
+                    tracks += await upsert_tracks(session, rows[i:i + _SAVE_CHUNK])
+                    job._update(imported=len(tracks))
+            else:
+                job._update(seen=1)
+                tracks = [await import_track(job.url, session)]
+                job._update(status="saving", imported=1)
+            if not tracks:
+                raise ValueError("Nothing importable was found at that URL")
+
+            # From here on the playlist targets are fixed; a repeat request
+            # starts a new (quick, everything is in the library) job instead.
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+            added = await append_to_playlists(job.playlist_ids, [t.id for t in tracks], session)
+            await session.commit()
+        job.tracks = tracks
+        job._update(status="done", imported=len(tracks), added_to_playlist=sum(added.values()))
+
+
+jobs = ImportManager(_max_concurrent())
@@ -0,0 +1,325 @@
+"""Library queries and writes shared by the web API, slash commands and import jobs."""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.db import (
+    POSITION_GAP, Playlist, PlaylistTag, PlaylistTrack, Tag, Track, in_chunks, parse_tags,
+    read_session_factory, session_scope,
+)
+
+# Columns a library listing can be asked for (?fields=); the default is all but added_at.
+TRACK_FIELDS = ("id", "youtube_id", "title", "duration_sec", "thumbnail_url", "added_at")
+DEFAULT_TRACK_FIELDS = TRACK_FIELDS[:-1]
+
+# sort name -> (key expression, descending). Every sort breaks ties on id in
+# the same direction, so (key, id) is unique and a page boundary is exact.
+_SORTS = {
+    "newest": (Track.added_at, True),
+    "oldest": (Track.added_at, False),
+    "title": (func.lower(Track.title), False),
+    "title_desc": (func.lower(Track.title), True),
+}
+SORTS = tuple(_SORTS)
+
+
+def _encode_cursor(sort: str, key: Any, track_id: int) -> str:
+    if isinstance(key, datetime):
+        key = key.isoformat()
+    raw = json.dumps([sort, key, track_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: str) -> tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, key, track_id = json.loads(raw)
+        if cursor_sort != sort or not isinstance(track_id, int):
+            raise ValueError
+        if sort in ("newest", "oldest"):
+            key = datetime.fromisoformat(key)
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise ValueError("Invalid cursor") from None
+    return key, track_id
+
+
+async def list_tracks(
+    *,
+    limit: int,
+    cursor: str | None = None,
+    q: str | None = None,
+    sort: str = "newest",
+    fields: tuple[str, ...] = DEFAULT_TRACK_FIELDS,
+) -> tuple[list[dict[str, Any]], str | None, int | None]:
+    """
+    One page of the library: (rows, next_cursor, total).
+
+    Keyset pagination: a page costs the same however deep into the library it
+    is, and tracks imported while someone scrolls do not shift the pages
+    after it. q matches titles case-insensitively. rows carry only fields.
+    total is counted on the first page only (cursor None), and next_cursor
+    is None on the last page. Raises ValueError on an unknown sort, field or
+    a cursor from a different sort.
+    """
+    if sort not in _SORTS:
+        raise ValueError(f"sort must be one of: {', '.join(SORTS)}")
+    unknown = [f for f in fields if f not in TRACK_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field: {unknown[0]}")
+    key, descending = _SORTS[sort]
+
+    filters = []
+    if q:
+        filters.append(Track.title.icontains(q, autoescape=True))
+    page_filters = list(filters)
+    if cursor:
+        after_key, after_id = _decode_cursor(cursor, sort)
+        # (key, id) past the cursor, spelled out: SQLite seeks an index on
+        # "key >= k" but walks an expression index from the top for a row value.
+        if descending:
+            page_filters += [key <= after_key, or_(key < after_key, Track.id < after_id)]
+        else:
+            page_filters += [key >= after_key, or_(key > after_key, Track.id > after_id)]
+
+    columns = [getattr(Track, f) for f in fields]
+    order = (key.desc(), Track.id.desc()) if descending else (key.asc(), Track.id.asc())
+    stmt = (
+        select(*columns, key.label("_key"), Track.id.label("_id"))
+        .where(*page_filters)
+        .order_by(*order)
+        .limit(limit + 1)   # one extra row says whether another page exists
+    )
+    async with read_session_factory() as session:
+        rows = (await session.execute(stmt)).all()
+        total = None
+        if not cursor:
+            total = (await session.execute(
+                select(func.count()).select_from(Track).where(*filters)
+            )).scalar()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(sort, rows[-1]._key, rows[-1]._id)
+    out = []
+    for row in rows:
+        item = {f: getattr(row, f) for f in fields}
+        if isinstance(item.get("added_at"), datetime):
+            item["added_at"] = item["added_at"].isoformat()
+        out.append(item)
+    return out, next_cursor, total
+
+
+async def append_tracks(
+    pl_id: int, track_ids: list[int], session: AsyncSession | None = None
+) -> int:
+    """Append tracks to a playlist, skipping ones already on it. Returns count added.
+
+    With session, runs in the caller's transaction and the caller commits.
+    """
+    added = await append_to_playlists([pl_id], track_ids, session)
+    return added.get(pl_id, 0)
+
+
+async def append_to_playlists(
+    pl_ids: list[int], track_ids: list[int], session: AsyncSession | None = None
+) -> dict[int, int]:
+    """Append tracks to several playlists at once. Returns {playlist id: count added}.
+
+    Set-based whatever the sizes: one query each for the playlists, the
+    tracks, what is already on the playlists (those two per IN_CHUNK track
+    ids) and where they end, then one INSERT for every new entry. Playlists that do not exist are left out of
+    the result, ids that are not tracks are skipped, and so is a track
+    already on a playlist. With session, runs in the caller's transaction and
+    the caller commits.
+    """
+    pl_ids = list(dict.fromkeys(pl_ids))
+    track_ids = list(dict.fromkeys(track_ids))
+    async with session_scope(session) as session:
+        found = set((await session.execute(
+            select(Playlist.id).where(Playlist.id.in_(pl_ids))
+        )).scalars().all())
+        pl_ids = [p for p in pl_ids if p in found]
+        if not pl_ids:
+            return {}
+        # An import can bring thousands of tracks: their ids go in chunks.
+        real: set[int] = set()
+        existing: set[tuple[int, int]] = set()
+        for chunk in in_chunks(track_ids):
+            real.update((await session.execute(
+                select(Track.id).where(Track.id.in_(chunk))
+            )).scalars().all())
+            existing.update((await session.execute(
+                select(PlaylistTrack.playlist_id, PlaylistTrack.track_id).where(
+                    PlaylistTrack.playlist_id.in_(pl_ids), PlaylistTrack.track_id.in_(chunk)
+                )
+            )).tuples().all())
+        track_ids = [t for t in track_ids if t in real]
+        # Positions are sparse (POSITION_GAP); 0 is a valid last position on
+        # older playlists, hence the explicit None checks.
+        ends = dict((await session.execute(
+            select(PlaylistTrack.playlist_id, func.max(PlaylistTrack.position))
+            .where(PlaylistTrack.playlist_id.in_(pl_ids))
+            .group_by(PlaylistTrack.playlist_id)
+        )).tuples().all())
+
+        added = {p: 0 for p in pl_ids}
+        values = []
+        for pl_id in pl_ids:
+            end = ends.get(pl_id)
+            next_pos = POSITION_GAP if end is None else end + POSITION_GAP
+            for track_id in track_ids:
+                if (pl_id, track_id) in existing:
+                    continue
+                values.append({"playlist_id": pl_id, "track_id": track_id, "position": next_pos})
+                next_pos += POSITION_GAP
+                added[pl_id] += 1
+        if values:
+            await session.execute(insert(PlaylistTrack), values)
+    return added
+
+
+async def renumber_playlist(
+    session: AsyncSession, pl_id: int, track_ids: list[int] | None = None
+) -> None:
+    """Lay a playlist's positions out POSITION_GAP apart again.
+
+    In track_ids order if given (it must list exactly the playlist's tracks),
+    else keeping the current order. Runs in the caller's transaction.
+    """
+    rows = (await session.execute(
+        select(PlaylistTrack.id, PlaylistTrack.track_id)
+        .where(PlaylistTrack.playlist_id == pl_id)
+        .order_by(PlaylistTrack.position, PlaylistTrack.id)
+    )).all()
+    if track_ids is not None:
+        by_track = {track_id: row_id for row_id, track_id in rows}
+        row_ids = [by_track[t] for t in track_ids]
+    else:
+        row_ids = [row_id for row_id, _ in rows]
+    # Park every position below zero first (positions are never negative, and
+    # -p - 1 keeps them distinct) so no assignment can collide with a row
+    # that still holds its old number under uq_playlist_position.
+    await session.execute(
+        update(PlaylistTrack)
+        .where(PlaylistTrack.playlist_id == pl_id)
+        .values(position=-PlaylistTrack.position - 1)
+    )
+    if row_ids:
+        await session.execute(
+            update(PlaylistTrack),
+            [{"id": row_id, "position": i * POSITION_GAP} for i, row_id in enumerate(row_ids, 1)],
+        )
+
+
+async def move_track(
+    session: AsyncSession,
+    pl_id: int,
+    track_id: int,
+    *,
+    before: int | None = None,
+    after: int | None = None,
+) -> int:
+    """Move a playlist's track to just before or just after another of its tracks.
+
+    Gives the track a position between its new neighbours, so a move writes
+    one row; only when the two are adjacent numbers is the playlist
+    renumbered first. Returns the new position. Raises LookupError when
+    track_id is not on the playlist and ValueError for a bad anchor. Runs in
+    the caller's transaction.
+    """
+    if (before is None) == (after is None):
+        raise ValueError("Give exactly one of before or after")
+    anchor_id = before if before is not None else after
+    if anchor_id == track_id:
+        raise ValueError("A track cannot move relative to itself")
+
+    def entry(tid: int):
+        return select(PlaylistTrack).where(
+            PlaylistTrack.playlist_id == pl_id, PlaylistTrack.track_id == tid
+        )
+
+    for attempt in range(2):
+        row = (await session.execute(entry(track_id))).scalars().one_or_none()
+        if row is None:
+            raise LookupError(track_id)
+        anchor = (await session.execute(entry(anchor_id))).scalars().one_or_none()
+        if anchor is None:
+            raise ValueError("That track is not on this playlist")
+
+        others = (PlaylistTrack.playlist_id == pl_id, PlaylistTrack.id != row.id)
+        if before is not None:
+            high = anchor.position
+            low = (await session.execute(
+                select(func.max(PlaylistTrack.position)).where(*others, PlaylistTrack.position < high)
+            )).scalar()
+            low = 0 if low is None else low
+        else:
+            low = anchor.position
+            high = (await session.execute(
+                select(func.min(PlaylistTrack.position)).where(*others, PlaylistTrack.position > low)
+            )).scalar()
+            if high is None:
+                high = low + 2 * POSITION_GAP   # moving to the end: one full gap on
+        if high - low >= 2:
+            row.position = (low + high) // 2
+            await session.flush()
+            return row.position
+        if attempt == 0:
+            await renumber_playlist(session, pl_id)
+            # The bulk updates bypassed the identity map; reload the rows.
+            session.expire_all()
+    raise AssertionError("no room after renumbering")
+
+
+async def set_playlist_tags(session: AsyncSession, pl_id: int, raw: str | None) -> None:
+    """Bring playlist_tags for a playlist in line with its tag string raw.
+
+    Runs in the caller's transaction, next to the write of Playlist.tags, so
+    the two never disagree; the caller commits. Tags no playlist carries any
+    more are dropped.
+    """
+    names = list(dict.fromkeys(parse_tags(raw)))
+    old_ids = set((await session.execute(
+        select(PlaylistTag.tag_id).where(PlaylistTag.playlist_id == pl_id)
+    )).scalars().all())
+    new_ids: set[int] = set()
+    if names:
+        await session.execute(
+            sqlite_insert(Tag).on_conflict_do_nothing(index_elements=["name"]),
+            [{"name": n} for n in names],
+        )
+        new_ids = set((await session.execute(
+            select(Tag.id).where(Tag.name.in_(names))
+        )).scalars().all())
+    if old_ids - new_ids:
+        await session.execute(delete(PlaylistTag).where(
+            PlaylistTag.playlist_id == pl_id, PlaylistTag.tag_id.in_(old_ids - new_ids)
+        ))
+        still_used = select(PlaylistTag.tag_id).where(PlaylistTag.tag_id == Tag.id).exists()
+        await session.execute(delete(Tag).where(Tag.id.in_(old_ids - new_ids), ~still_used))
+    if new_ids - old_ids:
+        await session.execute(
+            sqlite_insert(PlaylistTag),
+            [{"playlist_id": pl_id, "tag_id": t} for t in new_ids - old_ids],
+        )
+
+
+async def tag_counts() -> list[tuple[str, int]]:
+    """Every tag in use with its number of playlists, most used first."""
+    cnt = func.count(PlaylistTag.playlist_id)
+    stmt = (
+        select(Tag.name, cnt)
+        .join(PlaylistTag, PlaylistTag.tag_id == Tag.id)
+        .group_by(Tag.id)
+        .order_by(cnt.desc(), Tag.name)
+    )
+    async with read_session_factory() as session:
+        return [(name, n) for name, n in await session.execute(stmt)]
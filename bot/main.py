@@ -8,7 +8,10 @@ from discord import app_commands
 from discord.ext import commands
 from dotenv import load_dotenv
 
-from bot.db import init_db, async_session_factory
+from bot import maintenance
+from bot.db import async_session_factory
+from bot.game_registry import registry as game_registry
+from bot.migrations import init_db
 from bot.cogs.games import GamesCog
 from bot.cogs.music import MusicCog
 from bot.cogs.scheduling import SchedulingCog
@@ -31,6 +34,7 @@ intents.messages = True
 intents.message_content = True
 intents.members = True
 intents.voice_states = True  # required for on_voice_state_update (game voice nicknames)
+intents.guild_polls = True  # required for on_raw_poll_vote_add/remove (live poll tallies)
 
 bot = commands.Bot(command_prefix="/", intents=intents)
 
@@ -137,6 +141,9 @@ async def on_ready():
     # with a bot that answers /help while port 5000 refuses connections.
     try:
         await init_db()
+        # Repairs queued by migrations; they run alongside everything else.
+        asyncio.create_task(maintenance.run_pending())
+        await game_registry.warm()
     except Exception:
         log.exception("Database init failed — the API will not work until this is fixed")
 
@@ -0,0 +1,148 @@
+"""Long-running data repairs, run in the background and resumable.
+
+A migration that needs to touch every row of a big table does not do the
+work itself: it queues a task here (a maintenance_tasks row, status
+"pending"). The bot runs pending tasks after startup, a batch per
+transaction, saving its cursor after each, so a restart mid-way carries on
+from the last batch rather than from the top. A task can also be queued by
+hand: python -m bot.maintenance <name> runs it to the end in the foreground.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+from typing import Awaitable, Callable
+
+from sqlalchemy import delete, exists, select
+
+from bot.db import MaintenanceTask, Playlist, PlaylistTrack, Track, async_session_factory
+from bot.migrations import init_db
+
+log = logging.getLogger(__name__)
+
+# Playlists checked per transaction by the orphan repair.
+_ORPHAN_BATCH = 50
+
+
+async def _repair_playlist_orphans(cursor: int | None) -> tuple[int | None, int]:
+    """One batch: drop entries pointing at missing tracks, for the next playlists.
+
+    Such entries come from interrupted imports, hand-edited databases and
+    older schemas. They are invisible in the UI but still counted, and any
+    code that assumes the track resolves fails on them. The gaps they leave
+    in positions are harmless (positions are sparse). Returns (new cursor,
+    entries removed); a None cursor means done.
+    """
+    async with async_session_factory() as session:
+        ids = (await session.execute(
+            select(Playlist.id)
+            .where(Playlist.id > (cursor or 0))
+            .order_by(Playlist.id)
+            .limit(_ORPHAN_BATCH)
+        )).scalars().all()
+        if not ids:
+            return None, 0
+        missing = ~exists().where(Track.id == PlaylistTrack.track_id)
+        result = await session.execute(
+            delete(PlaylistTrack).where(PlaylistTrack.playlist_id.in_(ids), missing)
+        )
+        await session.commit()
+    if result.rowcount:
+        log.warning(
+            "Removed %d playlist entries pointing at missing tracks (playlists %d-%d)",
+            result.rowcount, ids[0], ids[-1],
+        )
+    return ids[-1], result.rowcount
+
+
+# name -> batch function: takes the saved cursor, returns (next cursor or
+# None when finished, rows affected).
+TASKS: dict[str, Callable[[int | None], Awaitable[tuple[int | None, int]]]] = {
+    "playlist-orphans": _repair_playlist_orphans,
+}
+
+_running: dict[str, asyncio.Task] = {}
+
+
+async def queue(name: str) -> None:
+    """Mark a task to run again from the start."""
+    if name not in TASKS:
+        raise ValueError(f"Unknown maintenance task: {name}")
+    async with async_session_factory() as session:
+        task = await session.get(MaintenanceTask, name)
+        if task is None:
+            session.add(MaintenanceTask(name=name, status="pending"))
+        else:
+            task.status, task.cursor, task.affected = "pending", None, 0
+        await session.commit()
+
+
+async def _run(name: str) -> None:
+    batch = TASKS[name]
+    async with async_session_factory() as session:
+        task = await session.get(MaintenanceTask, name)
+        cursor, total = task.cursor, task.affected
+        task.status = "running"
+        await session.commit()
+    log.info("Maintenance task %s %s", name, "resuming" if cursor else "starting")
+    while True:
+        cursor, affected = await batch(cursor)
+        total += affected
+        async with async_session_factory() as session:
+            task = await session.get(MaintenanceTask, name)
+            task.cursor, task.affected = cursor, total
+            if cursor is None:
+                task.status = "done"
+            await session.commit()
+        if cursor is None:
+            break
+        await asyncio.sleep(0)   # let the bot's own queries in between batches
+    log.info("Maintenance task %s done (%d rows affected)", name, total)
+
+
+async def run(name: str) -> None:
+    """Run a task to the end, or wait for the run already going."""
+    running = _running.get(name)
+    if running is None:
+        running = _running[name] = asyncio.create_task(_run(name))
+        running.add_done_callback(lambda _t: _running.pop(name, None))
+    await running
+
+
+async def run_pending() -> None:
+    """Run every queued or interrupted task, one after another. Errors are logged."""
+    async with async_session_factory() as session:
+        names = (await session.execute(
+            select(MaintenanceTask.name).where(MaintenanceTask.status != "done")
+        )).scalars().all()
+    for name in names:
+        if name not in TASKS:
+            log.warning("Skipping unknown maintenance task %s", name)
+            continue
+        try:
+            await run(name)
+        except Exception:
+            log.exception("Maintenance task %s failed; it resumes on the next start", name)
+
+
+async def status() -> list[dict]:
+    async with async_session_factory() as session:
+        rows = (await session.execute(select(MaintenanceTask))).scalars().all()
+    return [
+        {"name": t.name, "status": t.status, "cursor": t.cursor, "affected": t.affected,
+         "updated_at": t.updated_at.isoformat() if t.updated_at else None}
+        for t in rows
+    ]
+
+
+async def _main(names: list[str]) -> None:
+    await init_db()
+    for name in names or list(TASKS):
+        await queue(name)
+        await run(name)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s [%(name)s] %(message)s")
+    asyncio.run(_main(sys.argv[1:]))
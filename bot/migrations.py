@@ -0,0 +1,227 @@
+"""Versioned schema migrations.
+
+init_db used to run every schema fix-up on every start: create_all, six
+ALTER TABLEs whose "duplicate column" errors it swallowed, and a scan of
+playlist_tracks for orphaned entries, all on a second, synchronous sqlite3
+connection that blocked the event loop while it worked. Now each change is a
+numbered step, schema_version records the last one applied, and a start with
+nothing pending costs the one query that reads it. Steps run through the
+async engine, each in its own transaction together with its version bump.
+
+Step 1 creates every table the models define today, so on a new database
+the later steps find their tables already there: a step that adds a table,
+column or index has to tolerate that (IF NOT EXISTS, checkfirst, checking
+PRAGMA table_info). Heavy data repairs do not belong here; a step queues them
+as maintenance tasks (bot/maintenance.py), which run in the background and
+resume where they stopped.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Callable
+
+from sqlalchemy import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateIndex
+
+from bot.db import Base, MaintenanceTask, PollVote, SchedulePoll, engine, parse_tags
+
+log = logging.getLogger(__name__)
+
+
+def _create_tables(conn: Connection) -> None:
+    Base.metadata.create_all(conn)
+
+
+# Columns added to existing tables before there were migrations.
+_LEGACY_COLUMNS = (
+    ("games", "dm_character_name", "VARCHAR(32)"),
+    ("players", "character_name", "VARCHAR(32)"),
+    ("games", "dm_role_id", "BIGINT"),
+    ("playlists", "cover_path", "TEXT"),
+    ("playlists", "tags", "TEXT"),
+    ("playlists", "updated_at", "DATETIME"),
+)
+
+
+def _add_legacy_columns(conn: Connection) -> None:
+    for table, column, ddl in _LEGACY_COLUMNS:
+        present = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+        if column not in present:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+def _backfill_playlist_tags(conn: Connection) -> None:
+    """Fill tags/playlist_tags from the playlists' tag strings."""
+    if conn.exec_driver_sql("SELECT 1 FROM playlist_tags LIMIT 1").first():
+        return
+    rows = conn.exec_driver_sql(
+        "SELECT id, tags FROM playlists WHERE tags IS NOT NULL AND tags != ''"
+    ).all()
+    linked = 0
+    for playlist_id, raw in rows:
+        for name in dict.fromkeys(parse_tags(raw)):
+            conn.exec_driver_sql("INSERT OR IGNORE INTO tags (name) VALUES (?)", (name,))
+            linked += conn.exec_driver_sql(
+                "INSERT OR IGNORE INTO playlist_tags (playlist_id, tag_id) "
+                "SELECT ?, id FROM tags WHERE name = ?",
+                (playlist_id, name),
+            ).rowcount
+    if linked:
+        log.info("Indexed %d playlist tags", linked)
+
+
+# Full-text search (see bot/search.py). External-content FTS5 tables: the text
+# lives once, in tracks/playlists, and the triggers keep the index in step with
+# every write, whichever code path makes it.
+_FTS_TABLES = {
+    "tracks_fts": (
+        "CREATE VIRTUAL TABLE tracks_fts USING fts5("
+        "title, content='tracks', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    ),
+    "playlists_fts": (
+        "CREATE VIRTUAL TABLE playlists_fts USING fts5("
+        "name, tags, content='playlists', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    ),
+}
+
+_FTS_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS tracks_fts_ai AFTER INSERT ON tracks BEGIN
+        INSERT INTO tracks_fts(rowid, title) VALUES (new.id, new.title);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tracks_fts_ad AFTER DELETE ON tracks BEGIN
+        INSERT INTO tracks_fts(tracks_fts, rowid, title) VALUES ('delete', old.id, old.title);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tracks_fts_au AFTER UPDATE OF title ON tracks BEGIN
+        INSERT INTO tracks_fts(tracks_fts, rowid, title) VALUES ('delete', old.id, old.title);
+        INSERT INTO tracks_fts(rowid, title) VALUES (new.id, new.title);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS playlists_fts_ai AFTER INSERT ON playlists BEGIN
+        INSERT INTO playlists_fts(rowid, name, tags) VALUES (new.id, new.name, new.tags);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS playlists_fts_ad AFTER DELETE ON playlists BEGIN
+        INSERT INTO playlists_fts(playlists_fts, rowid, name, tags)
+        VALUES ('delete', old.id, old.name, old.tags);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS playlists_fts_au AFTER UPDATE OF name, tags ON playlists BEGIN
+        INSERT INTO playlists_fts(playlists_fts, rowid, name, tags)
+        VALUES ('delete', old.id, old.name, old.tags);
+        INSERT INTO playlists_fts(rowid, name, tags) VALUES (new.id, new.name, new.tags);
+    END""",
+)
+
+
+def _install_search_index(conn: Connection) -> None:
+    """Create the FTS5 tables and triggers, indexing existing rows the first time."""
+    existing = {
+        name for (name,) in conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%_fts'"
+        )
+    }
+    try:
+        for table, ddl in _FTS_TABLES.items():
+            if table not in existing:
+                conn.exec_driver_sql(ddl)
+                conn.exec_driver_sql(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+                log.info("Built search index %s", table)
+    except OperationalError as exc:
+        # An SQLite built without FTS5; search falls back to LIKE. Not retried:
+        # the library it runs on will not grow FTS5 between starts.
+        log.warning("Full-text search unavailable: %s", exc.orig)
+        return
+    for ddl in _FTS_TRIGGERS:
+        conn.exec_driver_sql(ddl)
+
+
+def _queue_orphan_repair(conn: Connection) -> None:
+    # Used to run inline on every start; now once, in the background.
+    MaintenanceTask.__table__.create(conn, checkfirst=True)
+    conn.exec_driver_sql(
+        "INSERT OR IGNORE INTO maintenance_tasks (name, status, updated_at) "
+        "VALUES ('playlist-orphans', 'pending', CURRENT_TIMESTAMP)"
+    )
+
+
+# Indexes for hot lookups, added after their tables existed.
+_SECONDARY_INDEXES = (
+    "ix_games_text_important_id",
+    "ix_games_text_scheduling_id",
+    "ix_games_text_general_id",
+    "ix_games_voice_game_id",
+    "ix_games_voice_private_id",
+    "ix_players_game_user",
+    "ix_schedule_polls_game_id",
+    "ix_schedule_polls_reminder",
+    "ix_tracks_added_at",
+    "ix_tracks_title_lower",
+    "ix_playlist_tracks_track_id",
+)
+
+
+def _create_secondary_indexes(conn: Connection) -> None:
+    indexes = {i.name: i for table in Base.metadata.sorted_tables for i in table.indexes}
+    for name in _SECONDARY_INDEXES:
+        # IF NOT EXISTS rather than checkfirst, which cannot see expression indexes.
+        conn.execute(CreateIndex(indexes[name], if_not_exists=True))
+    # Lets the planner see the new indexes' statistics; cheap, unlike ANALYZE.
+    conn.exec_driver_sql("PRAGMA optimize")
+
+
+def _create_schedule_poll_indexes(conn: Connection, names: tuple[str, ...]) -> None:
+    for index in SchedulePoll.__table__.indexes:
+        if index.name in names:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def _create_poll_votes(conn: Connection) -> None:
+    PollVote.__table__.create(conn, checkfirst=True)
+    _create_schedule_poll_indexes(conn, ("ix_schedule_polls_expiry",))
+
+
+def _index_polls_by_message(conn: Connection) -> None:
+    _create_schedule_poll_indexes(
+        conn, ("ix_schedule_polls_message_id", "ix_schedule_polls_channel_message")
+    )
+
+
+# (version, description, step). Append only: never renumber or edit a step
+# that has shipped; fix it with a new one.
+_STEPS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "create tables", _create_tables),
+    (2, "add columns missing from older databases", _add_legacy_columns),
+    (3, "fill tags/playlist_tags from playlist tag strings", _backfill_playlist_tags),
+    (4, "full-text search index", _install_search_index),
+    (5, "queue the orphaned playlist entry repair", _queue_orphan_repair),
+    (6, "secondary indexes for channel, player, poll and library lookups", _create_secondary_indexes),
+    (7, "poll_votes table and open-poll index for live poll tallies", _create_poll_votes),
+    (8, "schedule_polls indexes by message and by channel", _index_polls_by_message),
+]
+LATEST = _STEPS[-1][0]
+
+
+async def schema_version() -> int:
+    async with engine.connect() as conn:
+        try:
+            return (await conn.exec_driver_sql("SELECT version FROM schema_version")).scalar() or 0
+        except OperationalError:
+            return 0   # no table yet: a new database, or one from before migrations
+
+
+def _set_version(conn: Connection, version: int) -> None:
+    conn.exec_driver_sql("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    if not conn.exec_driver_sql("UPDATE schema_version SET version = ?", (version,)).rowcount:
+        conn.exec_driver_sql("INSERT INTO schema_version (version) VALUES (?)", (version,))
+
+
+async def init_db() -> None:
+    """Bring the database schema up to date. Raises if a step fails; later steps wait."""
+    current = await schema_version()
+    for version, description, step in _STEPS:
+        if version <= current:
+            continue
+        async with engine.begin() as conn:
+            await conn.run_sync(step)
+            await conn.run_sync(_set_version, version)
+        log.info("Applied schema migration %d: %s", version, description)
@@ -0,0 +1,46 @@
+"""Fan-out of player changes to live listeners.
+
+The web UI used to learn about the bot's player by polling /api/now-playing
+every few seconds, and each poll serialized the whole queue. Sessions now
+publish small events here as things happen (track changed, paused, volume,
+queue reordered) and the web server streams them to every open browser and
+desktop app, so a change shows up at once and an idle player costs nothing.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Optional
+
+# Events a listener may fall behind by before it is resynced.
+_BACKLOG = 256
+
+
+class PlayerEvents:
+    def __init__(self) -> None:
+        self._listeners: set[asyncio.Queue] = set()
+
+    @property
+    def listened(self) -> bool:
+        """False when nobody is listening, so publishers can skip building events."""
+        return bool(self._listeners)
+
+    def subscribe(self) -> asyncio.Queue:
+        """A queue of event dicts. None in it means "events were lost: resync"."""
+        queue: asyncio.Queue[Optional[dict]] = asyncio.Queue(maxsize=_BACKLOG)
+        self._listeners.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._listeners.discard(queue)
+
+    def publish(self, event: dict) -> None:
+        for queue in self._listeners:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A listener that stopped reading. Its backlog is worthless
+                # now; swap it for one resync marker so it catches up from a
+                # fresh snapshot instead of replaying stale events.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
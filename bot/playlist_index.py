@@ -0,0 +1,119 @@
+"""In-memory index of playlist names and tags, for slash-command lookups.
+
+Discord calls the /music autocomplete on every keystroke and throws away
+answers that take longer than about three seconds, and playlists change
+rarely. So the names and parsed tags live here, loaded once from SQLite;
+the web API calls invalidate() after creating, renaming, retagging or
+deleting a playlist, and the next lookup reloads. Matching never touches the
+database.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import NamedTuple
+
+from sqlalchemy import select
+
+from bot.db import Playlist, parse_tags, read_session_factory
+
+
+class PlaylistEntry(NamedTuple):
+    id: int
+    name: str
+    tags: tuple[str, ...]
+    folded: str   # name.casefold(), matched against
+
+
+# Match quality, best first: how a query relates to a playlist.
+_EXACT, _PREFIX, _WORD_PREFIX, _TAG, _TAG_PREFIX, _SUBSTRING, _TAG_SUBSTRING = range(7)
+
+
+def _rank(entry: PlaylistEntry, q: str) -> int | None:
+    if entry.folded == q:
+        return _EXACT
+    if entry.folded.startswith(q):
+        return _PREFIX
+    if any(word.startswith(q) for word in entry.folded.split()):
+        return _WORD_PREFIX
+    if q in entry.tags:
+        return _TAG
+    if any(tag.startswith(q) for tag in entry.tags):
+        return _TAG_PREFIX
+    if q in entry.folded:
+        return _SUBSTRING
+    if any(q in tag for tag in entry.tags):
+        return _TAG_SUBSTRING
+    return None
+
+
+class _Snapshot(NamedTuple):
+    entries: list[PlaylistEntry]   # by name
+    by_id: dict[int, PlaylistEntry]
+    by_tag: dict[str, list[PlaylistEntry]]
+
+
+class PlaylistIndex:
+    def __init__(self) -> None:
+        self._snapshot: _Snapshot | None = None   # None: (re)load on next use
+        # Bumped by invalidate(), so a load that raced a change is not kept.
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        """Drop the index; call after any change to a playlist's name or tags."""
+        self._snapshot = None
+        self._generation += 1
+
+    async def _load(self) -> _Snapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        async with self._lock:
+            if self._snapshot is not None:
+                return self._snapshot
+            generation = self._generation
+            async with read_session_factory() as session:
+                rows = await session.execute(
+                    select(Playlist.id, Playlist.name, Playlist.tags).order_by(Playlist.name)
+                )
+                entries = [
+                    PlaylistEntry(pid, name, tuple(dict.fromkeys(parse_tags(tags))), name.casefold())
+                    for pid, name, tags in rows
+                ]
+            by_tag: dict[str, list[PlaylistEntry]] = {}
+            for entry in entries:
+                for tag in entry.tags:
+                    by_tag.setdefault(tag, []).append(entry)
+            snapshot = _Snapshot(entries, {e.id: e for e in entries}, by_tag)
+            if generation == self._generation:
+                self._snapshot = snapshot
+            return snapshot
+
+    async def all(self) -> list[PlaylistEntry]:
+        """Every playlist, by name."""
+        return list((await self._load()).entries)
+
+    async def get(self, playlist_id: int) -> PlaylistEntry | None:
+        return (await self._load()).by_id.get(playlist_id)
+
+    async def tagged(self, tag: str) -> list[PlaylistEntry]:
+        """Playlists carrying tag, by name."""
+        return list((await self._load()).by_tag.get(tag.lower().strip(), ()))
+
+    async def match(self, query: str, limit: int = 25) -> list[PlaylistEntry]:
+        """Playlists matching query, best first: exact name, name prefix, a word
+        of the name, a tag, then substrings of either. Ties stay in name order."""
+        entries = (await self._load()).entries
+        q = query.casefold().strip()
+        if not q:
+            return entries[:limit]
+        ranked = []
+        for order, entry in enumerate(entries):
+            rank = _rank(entry, q)
+            if rank is not None:
+                ranked.append((rank, order, entry))
+        ranked.sort()
+        return [entry for _, _, entry in ranked[:limit]]
+
+
+index = PlaylistIndex()
@@ -0,0 +1,231 @@
+"""Open scheduling polls by channel, with live tallies kept from gateway vote events.
+
+Finding out who has voted on a poll over REST takes a message fetch plus at
+least one request per answer. The gateway already reports every vote as it
+happens, so the scheduling cog registers each poll here when it is posted
+(seeding it from REST once, to catch votes that raced the registration),
+feeds it the vote add/remove events, and reads reminders and /schedule
+missing straight from memory. Every change is written to poll_votes, so a
+restart starts from the last known tally instead of an empty one.
+
+The same registry answers "which polls are open in this channel, newest
+first", so /schedule remind finds its poll without reading channel history.
+A poll leaves it when it is deleted, ends early or expires.
+
+Events sent while the bot was disconnected are lost, though, so a tally
+loaded at startup, or held across a reconnect that started a new gateway
+session, is marked unverified. The first read of it fetches the votes over
+REST once (resync) and it is live again from then on.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from bot.db import PollVote, SchedulePoll, async_session_factory
+
+log = logging.getLogger(__name__)
+
+Votes = dict[int, set[int]]   # answer id -> ids of users who picked it
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class _Tally:
+    __slots__ = ("poll_id", "channel_id", "expiry", "votes", "verified", "pending", "resyncing")
+
+    def __init__(self, poll_id: int, channel_id: int, expiry: datetime, votes: Votes, verified: bool) -> None:
+        self.poll_id = poll_id
+        self.channel_id = channel_id
+        self.expiry = expiry   # naive UTC, as stored
+        self.votes = votes
+        self.verified = verified
+        # Events seen while a resync is in flight, replayed over its result.
+        self.pending: list[tuple[int, int, bool]] | None = None
+        # The resync in flight, which later callers wait on instead of starting another.
+        self.resyncing: asyncio.Future[None] | None = None
+
+    def apply(self, answer_id: int, user_id: int, added: bool) -> None:
+        if added:
+            self.votes.setdefault(answer_id, set()).add(user_id)
+        else:
+            self.votes.get(answer_id, set()).discard(user_id)
+
+
+class PollTallies:
+    def __init__(self) -> None:
+        self._tallies: dict[int, _Tally] = {}   # message id -> tally
+        self._by_channel: dict[int, set[int]] = {}   # channel id -> message ids
+        # poll_votes writes run one at a time, each writing what memory says
+        # now, so a quick add/remove pair cannot land in the wrong order.
+        self._write_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tallies)
+
+    def tracked(self, message_id: int) -> bool:
+        return message_id in self._tallies
+
+    async def load(self) -> int:
+        """Load the stored tallies of every open poll, unverified. Returns how many."""
+        async with async_session_factory() as session:
+            rows = (await session.execute(
+                select(
+                    SchedulePoll.id, SchedulePoll.message_id, SchedulePoll.channel_id, SchedulePoll.expiry,
+                    PollVote.answer_id, PollVote.user_id,
+                )
+                .outerjoin(PollVote, PollVote.poll_id == SchedulePoll.id)
+                .where(SchedulePoll.expiry > _utcnow())
+            )).all()
+        for poll_id, message_id, channel_id, expiry, answer_id, user_id in rows:
+            tally = self._tallies.get(message_id)
+            if tally is None:
+                tally = self._add(message_id, _Tally(poll_id, channel_id, expiry, {}, verified=False))
+            if answer_id is not None:
+                tally.apply(answer_id, user_id, True)
+        return len(self._tallies)
+
+    def mark_unverified(self) -> None:
+        """Events may have been missed (a new gateway session): resync each tally on next read."""
+        for tally in self._tallies.values():
+            tally.verified = False
+
+    def register(self, poll_id: int, message_id: int, channel_id: int, expiry: datetime) -> None:
+        """Start tracking a new poll, unverified until its first resync."""
+        if expiry.tzinfo is not None:
+            expiry = expiry.astimezone(timezone.utc).replace(tzinfo=None)
+        self.prune()
+        self._add(message_id, _Tally(poll_id, channel_id, expiry, {}, verified=False))
+
+    def _add(self, message_id: int, tally: _Tally) -> _Tally:
+        self._tallies[message_id] = tally
+        self._by_channel.setdefault(tally.channel_id, set()).add(message_id)
+        return tally
+
+    def forget(self, message_ids: set[int]) -> list[int]:
+        """Stop tracking these polls (deleted or closed). Returns the ones that were tracked."""
+        forgotten = []
+        for mid in message_ids:
+            tally = self._tallies.pop(mid, None)
+            if tally is None:
+                continue
+            in_channel = self._by_channel.get(tally.channel_id)
+            if in_channel is not None:
+                in_channel.discard(mid)
+                if not in_channel:
+                    del self._by_channel[tally.channel_id]
+            forgotten.append(mid)
+        return forgotten
+
+    def prune(self) -> list[int]:
+        """Forget polls past their expiry, in case their final-results edit never arrived."""
+        now = _utcnow()
+        return self.forget({mid for mid, t in self._tallies.items() if t.expiry <= now})
+
+    def votes(self, message_id: int) -> Votes | None:
+        """The live tally, or None if the poll is not tracked or needs a resync first."""
+        tally = self._tallies.get(message_id)
+        if tally is None or not tally.verified:
+            return None
+        return {answer: set(users) for answer, users in tally.votes.items()}
+
+    def open_polls(self, channel_id: int) -> list[int]:
+        """Message ids of the open polls in this channel, newest first."""
+        now = _utcnow()
+        return sorted(
+            (mid for mid in self._by_channel.get(channel_id, ()) if self._tallies[mid].expiry > now),
+            reverse=True,
+        )
+
+    def latest_open(self, channel_id: int) -> int | None:
+        open_ids = self.open_polls(channel_id)
+        return open_ids[0] if open_ids else None
+
+    async def resync(self, message_id: int, fetch: Callable[[], Awaitable[Votes]]) -> Votes:
+        """Replace a tracked poll's tally with fetch()'s result and store it.
+
+        Votes that arrive while fetch() runs are replayed over its result, so
+        none are lost whether or not the fetch already saw them. A resync
+        already running for this poll is joined rather than started again;
+        its fetch is the one that counts.
+        """
+        tally = self._tallies[message_id]
+        if tally.resyncing is None:
+            tally.resyncing = asyncio.ensure_future(self._resync(message_id, tally, fetch))
+        # Shielded: one caller giving up must not cancel it for the others.
+        await asyncio.shield(tally.resyncing)
+        return {answer: set(users) for answer, users in tally.votes.items()}
+
+    async def _resync(self, message_id: int, tally: _Tally, fetch: Callable[[], Awaitable[Votes]]) -> None:
+        tally.pending = []
+        try:
+            fetched = await fetch()
+            votes = {answer: set(users) for answer, users in fetched.items()}
+            pending, tally.pending = tally.pending, None
+            tally.votes = votes
+            for event in pending:
+                tally.apply(*event)
+            tally.verified = True
+            if self._tallies.get(message_id) is tally:   # not deleted or closed meanwhile
+                await self._store(message_id, tally)
+        finally:
+            tally.pending = None
+            tally.resyncing = None
+
+    async def vote(self, message_id: int, answer_id: int, user_id: int, added: bool) -> None:
+        """Apply a gateway vote add/remove event; polls not tracked here are ignored."""
+        tally = self._tallies.get(message_id)
+        if tally is None:
+            return
+        tally.apply(answer_id, user_id, added)
+        if tally.pending is not None:
+            tally.pending.append((answer_id, user_id, added))
+            return   # the resync stores the whole tally when it finishes
+        async with self._write_lock:
+            present = user_id in tally.votes.get(answer_id, ())
+            try:
+                async with async_session_factory() as session:
+                    if present:
+                        await session.execute(
+                            sqlite_insert(PollVote)
+                            .values(poll_id=tally.poll_id, answer_id=answer_id, user_id=user_id)
+                            .on_conflict_do_nothing()
+                        )
+                    else:
+                        await session.execute(delete(PollVote).where(
+                            PollVote.poll_id == tally.poll_id,
+                            PollVote.answer_id == answer_id,
+                            PollVote.user_id == user_id,
+                        ))
+                    await session.commit()
+            except IntegrityError:
+                self._orphaned(message_id, tally)
+
+    async def _store(self, message_id: int, tally: _Tally) -> None:
+        async with self._write_lock:
+            rows = [
+                {"poll_id": tally.poll_id, "answer_id": answer, "user_id": user}
+                for answer, users in tally.votes.items() for user in users
+            ]
+            try:
+                async with async_session_factory() as session:
+                    await session.execute(delete(PollVote).where(PollVote.poll_id == tally.poll_id))
+                    if rows:
+                        await session.execute(sqlite_insert(PollVote), rows)
+                    await session.commit()
+            except IntegrityError:
+                self._orphaned(message_id, tally)
+
+    def _orphaned(self, message_id: int, tally: _Tally) -> None:
+        """Its schedule_polls row is gone (the game was deleted): stop tracking it."""
+        if self._tallies.get(message_id) is tally:
+            self.forget({message_id})
+        log.info("Poll %s: no longer stored, tally dropped", message_id)
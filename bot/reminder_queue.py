@@ -0,0 +1,127 @@
+"""One task that fires callbacks at their due times, for any number of keys.
+
+The scheduling cog used to start a task per poll that slept until its
+reminder was due: hundreds of dormant coroutines for hundreds of games, none
+of which could be called off when its poll went away. Here the due times sit
+in a min-heap and a single task sleeps until the earliest one, waking early
+only when something is scheduled ahead of it. Cancelling or rescheduling
+just forgets the key's current heap entry; stale entries are skipped when
+they surface and swept out once they outnumber the live ones.
+
+Due times are not stored here. The caller persists them (schedule_polls.
+reminder_at) and schedules them again on startup.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Generic, Hashable, TypeVar
+
+log = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+
+# Longest single sleep. Bounds how far a wall-clock jump (suspend, NTP step)
+# can push a reminder past its due time.
+_MAX_SLEEP = 300.0
+# Sweep stale heap entries once there are this many and they outnumber live ones.
+_COMPACT_MIN = 64
+
+
+def _timestamp(when: datetime) -> float:
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when.timestamp()
+
+
+class ReminderQueue(Generic[K]):
+    def __init__(self, fire: Callable[[K, Any], Awaitable[None]], name: str = "reminders") -> None:
+        """fire(key, payload) runs in its own task when key comes due; errors are logged."""
+        self._fire = fire
+        self._name = name
+        self._heap: list[tuple[float, int, K]] = []   # (due timestamp, seq, key)
+        self._live: dict[K, tuple[int, float, Any]] = {}   # key -> (seq, due, payload) of its current entry
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._firing: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._live
+
+    def due(self, key: K) -> datetime | None:
+        entry = self._live.get(key)
+        return datetime.fromtimestamp(entry[1], tz=timezone.utc) if entry else None
+
+    def schedule(self, key: K, when: datetime, payload: Any = None) -> None:
+        """Fire key at when (naive means UTC), replacing any time it already had."""
+        due = _timestamp(when)
+        seq = next(self._seq)
+        self._live[key] = (seq, due, payload)
+        heapq.heappush(self._heap, (due, seq, key))
+        if self._heap[0][1] == seq:
+            self._wake.set()   # new earliest: the loop is sleeping for a later one
+        self._maybe_compact()
+
+    def cancel(self, key: K) -> bool:
+        """Forget key. Returns whether it was scheduled (not already fired or cancelled)."""
+        if self._live.pop(key, None) is None:
+            return False
+        self._maybe_compact()
+        return True
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=f"{self._name} queue")
+
+    async def stop(self) -> None:
+        """Stop the loop and wait for callbacks already running. Scheduled keys stay."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._firing:
+            await asyncio.gather(*self._firing, return_exceptions=True)
+
+    def _stale(self, seq: int, key: K) -> bool:
+        entry = self._live.get(key)
+        return entry is None or entry[0] != seq
+
+    def _maybe_compact(self) -> None:
+        if len(self._heap) >= _COMPACT_MIN and len(self._heap) > 2 * len(self._live):
+            self._heap = [(due, seq, key) for key, (seq, due, _payload) in self._live.items()]
+            heapq.heapify(self._heap)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wake.clear()
+            while self._heap and self._stale(self._heap[0][1], self._heap[0][2]):
+                heapq.heappop(self._heap)
+            if not self._heap:
+                await self._wake.wait()
+                continue
+            delay = self._heap[0][0] - datetime.now(timezone.utc).timestamp()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), min(delay, _MAX_SLEEP))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _due, _seq, key = heapq.heappop(self._heap)
+            _seq, _due, payload = self._live.pop(key)
+            task = loop.create_task(self._call(key, payload))
+            self._firing.add(task)
+            task.add_done_callback(self._firing.discard)
+
+    async def _call(self, key: K, payload: Any) -> None:
+        try:
+            await self._fire(key, payload)
+        except Exception:
+            log.exception("%s: callback for %r failed", self._name, key)
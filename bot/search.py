@@ -0,0 +1,96 @@
+"""Ranked search over track titles and playlist names and tags.
+
+Backed by the FTS5 tables bot.migrations installs (tracks_fts, playlists_fts), so a
+lookup is an index probe rather than a Python scan of every row: every word
+typed is a prefix, all of them must match, and results come back best match
+first (bm25; a playlist's name outweighs its tags). An SQLite without FTS5
+still works, through plain LIKE matching in name order.
+"""
+from __future__ import annotations
+
+import logging
+import re
+
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+
+from bot.db import Playlist, Track, read_session_factory
+
+log = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# bm25 column weights for playlists_fts(name, tags).
+_NAME_WEIGHT = 10.0
+_TAGS_WEIGHT = 4.0
+
+_fts_missing = False
+
+
+def fts_query(raw: str) -> str | None:
+    """FTS5 MATCH expression for what a user typed: every word, as a prefix.
+
+    Words are quoted, so FTS syntax in the input (AND, NEAR, a stray quote
+    or column filter) is searched for as text, never interpreted.
+    """
+    words = _WORD_RE.findall(raw.lower())
+    if not words:
+        return None
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def _note_fts_error(exc: OperationalError) -> None:
+    """Fall back to LIKE for this search; for good only if FTS5 itself is missing.
+
+    Anything else (a locked database, say) is worth trying FTS again next time.
+    """
+    global _fts_missing
+    reason = str(exc.orig)
+    if "no such table" in reason or "no such module" in reason:
+        if not _fts_missing:
+            log.warning("Full-text index unavailable, searching with LIKE: %s", reason)
+        _fts_missing = True
+    else:
+        log.info("Full-text search failed, using LIKE this once: %s", reason)
+
+
+async def search_tracks(raw: str, limit: int = 25) -> list[Track]:
+    match = fts_query(raw)
+    if match is None:
+        return []
+    async with read_session_factory() as session:
+        if not _fts_missing:
+            try:
+                stmt = select(Track).from_statement(text(
+                    "SELECT tracks.* FROM tracks_fts JOIN tracks ON tracks.id = tracks_fts.rowid "
+                    "WHERE tracks_fts MATCH :match ORDER BY bm25(tracks_fts) LIMIT :limit"
+                ).bindparams(match=match, limit=limit))
+                return list((await session.execute(stmt)).scalars())
+            except OperationalError as exc:
+                _note_fts_error(exc)
+        stmt = select(Track).where(Track.title.icontains(raw.strip(), autoescape=True))
+        return list((await session.execute(stmt.order_by(Track.title).limit(limit))).scalars())
+
+
+async def search_playlists(raw: str, limit: int = 25) -> list[Playlist]:
+    match = fts_query(raw)
+    if match is None:
+        return []
+    async with read_session_factory() as session:
+        if not _fts_missing:
+            try:
+                stmt = select(Playlist).from_statement(text(
+                    "SELECT playlists.* FROM playlists_fts "
+                    "JOIN playlists ON playlists.id = playlists_fts.rowid "
+                    "WHERE playlists_fts MATCH :match "
+                    f"ORDER BY bm25(playlists_fts, {_NAME_WEIGHT}, {_TAGS_WEIGHT}) LIMIT :limit"
+                ).bindparams(match=match, limit=limit))
+                return list((await session.execute(stmt)).scalars())
+            except OperationalError as exc:
+                _note_fts_error(exc)
+        needle = raw.strip()
+        stmt = select(Playlist).where(
+            Playlist.name.icontains(needle, autoescape=True)
+            | Playlist.tags.icontains(needle, autoescape=True)
+        )
+        return list((await session.execute(stmt.order_by(Playlist.name).limit(limit))).scalars())
@@ -1,68 +1,38 @@
-"""Helpers: resolve game from channel, check permissions."""
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+"""Helpers: resolve game from channel, check permissions.
 
-from bot.db import Game, Player
+Served from the in-memory game registry (bot/game_registry.py), not SQLite;
+whatever writes a game or its players must call registry.invalidate() after
+committing.
+"""
+from bot.game_registry import SCHEDULING, TEXT_CHANNELS, VOICE_CHANNELS, GameInfo, registry
 
+_SCHEDULING = frozenset((SCHEDULING,))
 
-async def get_game_by_channel(session: AsyncSession, guild_id: int, channel_id: int) -> Game | None:
-    result = await session.execute(
-        select(Game).where(Game.guild_id == guild_id).where(
-            (Game.text_important_id == channel_id)
-            | (Game.text_scheduling_id == channel_id)
-            | (Game.text_general_id == channel_id)
-        )
-    )
-    return result.scalars().one_or_none()
 
+async def get_game_by_channel(guild_id: int, channel_id: int) -> GameInfo | None:
+    """The game whose important, scheduling or general channel this is."""
+    return await registry.by_channel(guild_id, channel_id, TEXT_CHANNELS)
 
-async def get_game_by_name(session: AsyncSession, guild_id: int, name: str) -> Game | None:
-    result = await session.execute(
-        select(Game).where(Game.guild_id == guild_id, Game.name == name.strip())
-    )
-    return result.scalars().one_or_none()
 
+async def get_game_by_name(guild_id: int, name: str) -> GameInfo | None:
+    return await registry.by_name(guild_id, name.strip())
 
-async def get_game_by_scheduling_channel(session: AsyncSession, guild_id: int, channel_id: int) -> Game | None:
-    result = await session.execute(
-        select(Game).where(Game.guild_id == guild_id, Game.text_scheduling_id == channel_id)
-    )
-    return result.scalars().one_or_none()
 
+async def get_game_by_scheduling_channel(guild_id: int, channel_id: int) -> GameInfo | None:
+    return await registry.by_channel(guild_id, channel_id, _SCHEDULING)
 
-async def count_games_where_dm(session: AsyncSession, guild_id: int, user_id: int) -> int:
+
+async def count_games_where_dm(guild_id: int, user_id: int) -> int:
     """Return how many games in this guild have this user as DM."""
-    from sqlalchemy import func
-    result = await session.execute(
-        select(func.count()).select_from(Game).where(Game.guild_id == guild_id, Game.dm_user_id == user_id)
-    )
-    return result.scalar() or 0
+    return sum(1 for g in await registry.in_guild(guild_id) if g.dm_user_id == user_id)
 
 
-async def get_player_ids(session: AsyncSession, game_id: int) -> set[int]:
-    result = await session.execute(select(Player.user_id).where(Player.game_id == game_id))
-    return {r[0] for r in result.all()}
+async def get_player_ids(game_id: int) -> set[int]:
+    game = await registry.get(game_id)
+    return set(game.players) if game else set()
 
 
-async def get_character_name_for_voice_channel(
-    session: AsyncSession, guild_id: int, channel_id: int, user_id: int
-) -> str | None:
+async def get_character_name_for_voice_channel(guild_id: int, channel_id: int, user_id: int) -> str | None:
     """Return the game character name for this user in this voice channel, or None."""
-    result = await session.execute(
-        select(Game).where(
-            Game.guild_id == guild_id,
-            (Game.voice_game_id == channel_id) | (Game.voice_private_id == channel_id),
-        )
-    )
-    game = result.scalars().one_or_none()
-    if not game:
-        return None
-    if game.dm_user_id == user_id:
-        return getattr(game, "dm_character_name", None) or None
-    player_result = await session.execute(
-        select(Player).where(Player.game_id == game.id, Player.user_id == user_id)
-    )
-    player = player_result.scalars().one_or_none()
-    if not player:
-        return None
-    return getattr(player, "character_name", None) or None
+    game = await registry.by_channel(guild_id, channel_id, VOICE_CHANNELS)
+    return game.character_name(user_id) if game else None
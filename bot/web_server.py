@@ -1,9 +1,10 @@
 """Web server: audio proxy and API routes for the music UI."""
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
 import os
-import time
 import uuid
 from typing import TYPE_CHECKING
 
@@ -12,9 +13,23 @@ import discord
 from aiohttp import web
 from sqlalchemy import func, select
 
-from bot import auth
-from bot.db import Hotkey, Playlist, PlaylistTrack, Track, async_session_factory
-from bot.ytdlp import get_audio_source, import_url
+from bot import auth, maintenance
+from bot.audio_cache import cache as audio_cache, content_type_for
+from bot.db import (
+    Hotkey, Playlist, PlaylistTag, PlaylistTrack, Tag, Track, async_session_factory,
+    read_session_factory,
+)
+from bot.import_jobs import ImportJob, jobs as import_jobs
+from bot.library import (
+    DEFAULT_TRACK_FIELDS, append_to_playlists, list_tracks, move_track, renumber_playlist,
+    set_playlist_tags, tag_counts,
+)
+from bot.game_registry import registry as game_registry
+from bot.migrations import schema_version
+from bot.playlist_index import index as playlist_index
+from bot.search import search_playlists, search_tracks
+from bot.ydl_pool import pool as ydl_pool
+from bot.ytdlp import get_audio_source, invalidate_audio_stream
 
 if TYPE_CHECKING:
     from discord.ext import commands
@@ -29,10 +44,6 @@ ASSETS_DIR = os.path.join(WEB_ROOT, "assets")
 _COVER_TYPES = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp", "image/gif": "gif"}
 _MAX_COVER_BYTES = 8 * 1024 * 1024
 
-# youtube_id -> (direct_url, headers, fetched_at); URLs are valid ~6h, refresh after 2h
-_audio_cache: dict[str, tuple[str, dict, float]] = {}
-_CACHE_TTL = 7200
-
 
 def _track_dict(t: Track) -> dict:
     return {
@@ -65,19 +76,14 @@ async def _json_body(request: web.Request) -> dict:
     return body
 
 
-# --- Audio proxy ----------------------------------------------------------
+async def _optional_json_body(request: web.Request) -> dict:
+    """Like _json_body, but an empty body is an empty dict rather than an error."""
+    if not request.can_read_body:
+        return {}
+    return await _json_body(request)
 
-async def _resolve_audio(youtube_id: str, force: bool = False) -> tuple[str, dict]:
-    """Resolve a stream URL and the headers YouTube requires to serve it."""
-    now = time.monotonic()
-    if not force:
-        entry = _audio_cache.get(youtube_id)
-        if entry and now - entry[2] < _CACHE_TTL:
-            return entry[0], entry[1]
-    url, headers = await get_audio_source(youtube_id)
-    _audio_cache[youtube_id] = (url, headers, now)
-    return url, headers
 
+# --- Audio proxy ----------------------------------------------------------
 
 async def api_audio_stream(request: web.Request) -> web.StreamResponse:
     try:
@@ -85,16 +91,21 @@ async def api_audio_stream(request: web.Request) -> web.StreamResponse:
     except ValueError:
         return web.Response(status=400, text="Invalid track id")
 
-    async with async_session_factory() as session:
+    async with read_session_factory() as session:
         track = await session.get(Track, track_id)
     if not track:
         return web.Response(status=404, text="Track not found")
 
+    # Played before: serve it off disk. FileResponse handles Range itself.
+    cached = await audio_cache.lookup(track.youtube_id)
+    if cached:
+        return web.FileResponse(cached, headers={"Content-Type": content_type_for(cached)})
+
     client: aiohttp.ClientSession = request.app["http_client"]
 
     for attempt in range(2):
         try:
-            audio_url, stream_headers = await _resolve_audio(track.youtube_id, force=attempt > 0)
+            audio_url, stream_headers = await get_audio_source(track.youtube_id, force=attempt > 0)
         except Exception as exc:
             log.error("Audio resolve failed for %s: %s", track.youtube_id, exc)
             return web.Response(status=502, text="Could not resolve audio for this track")
@@ -107,9 +118,12 @@ async def api_audio_stream(request: web.Request) -> web.StreamResponse:
 
         try:
             async with client.get(audio_url, headers=upstream_headers) as upstream:
-                if upstream.status in (401, 403, 410) and attempt == 0:
-                    _audio_cache.pop(track.youtube_id, None)
-                    continue
+                if upstream.status in (401, 403, 410):
+                    invalidate_audio_stream(track.youtube_id)
+                    if attempt == 0:
+                        continue
+                if upstream.status in (200, 206):
+                    audio_cache.fill(track.youtube_id, audio_url, stream_headers)
 
                 resp_headers: dict[str, str] = {
                     "Content-Type": upstream.headers.get("Content-Type", "audio/webm"),
@@ -129,7 +143,7 @@ async def api_audio_stream(request: web.Request) -> web.StreamResponse:
         except (aiohttp.ClientError, ConnectionResetError) as exc:
             log.warning("Audio proxy error (attempt %d) for track %d: %s", attempt + 1, track_id, exc)
             if attempt == 0:
-                _audio_cache.pop(track.youtube_id, None)
+                invalidate_audio_stream(track.youtube_id)
                 continue
             return web.Response(status=502, text="Failed to stream audio")
 
@@ -143,26 +157,183 @@ def _cog(request: web.Request):
     return bot.get_cog("MusicCog") if bot else None
 
 
+def _optional_int(value) -> int | None:
+    """Parse an id that may arrive as a JSON number or a string (snowflakes)."""
+    if value is None or value == "":
+        return None
+    return int(value)
+
+
+def _player(request: web.Request, body: dict | None = None):
+    """The player session a request addresses, or None.
+
+    `guild_id` (body or query string) names the session; `channel_id` names
+    it through the voice channel's guild. Requests naming neither get the
+    cog's default session, so the desktop app and older UIs keep working.
+    Raises ValueError on an id that is not a number.
+    """
+    cog = _cog(request)
+    if not cog:
+        return None
+    body = body or {}
+    guild_id = _optional_int(body.get("guild_id", request.query.get("guild_id")))
+    channel_id = _optional_int(body.get("channel_id", request.query.get("channel_id")))
+    return cog.resolve_session(guild_id=guild_id, channel_id=channel_id)
+
+
+# Idle event streams send a comment this often, so proxies keep them open.
+_KEEPALIVE_SEC = 15
+
+
+def _event_stream() -> web.StreamResponse:
+    return web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-store",
+        # Stop nginx-style proxies from holding events back in a buffer.
+        "X-Accel-Buffering": "no",
+    })
+
+
+async def _send_event(resp: web.StreamResponse, name: str, data: dict) -> None:
+    await resp.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode())
+
+
+_IDLE_ETAG = 'W/"idle"'
+_MAX_QUEUE_PAGE = 200
+
 _IDLE_STATE = {
-    "playing": False, "paused": False, "shuffled": False, "volume": 0.5,
+    "guild_id": None, "playing": False, "paused": False, "shuffled": False, "volume": 0.5,
     "playlist_id": None, "position_sec": 0, "device": "browser",
     "connected": False, "voice_channel_id": None, "current": None, "queue": [],
+    "version": 0, "queue_offset": 0, "queue_index": 0, "queue_length": 0,
 }
 
 
 async def api_now_playing(request: web.Request) -> web.Response:
+    """The player's state. `?window=N` sends only the current track ± N of the queue.
+
+    Answers 304 when the client's If-None-Match still matches: nothing changed
+    but the position, which clients interpolate themselves.
+    """
+    try:
+        player = _player(request)
+        window = _optional_int(request.query.get("window"))
+    except ValueError:
+        return _err("guild_id and window must be numbers")
+    if window is not None:
+        window = max(0, min(window, _MAX_QUEUE_PAGE))
+    etag = player.etag(window) if player else _IDLE_ETAG
+    # The browser must not answer from its own cache: a stale 200 would
+    # rewind the position the client is interpolating.
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in _if_none_match(request):
+        return web.Response(status=304, headers=headers)
+    state = player.state_dict(window) if player else _IDLE_STATE
+    return web.json_response(state, headers=headers)
+
+
+async def api_now_playing_queue(request: web.Request) -> web.Response:
+    """A page of the play order: `?offset=&limit=` (limit at most 200)."""
+    try:
+        player = _player(request)
+        offset = _optional_int(request.query.get("offset")) or 0
+        limit = _optional_int(request.query.get("limit")) or 50
+    except ValueError:
+        return _err("guild_id, offset and limit must be numbers")
+    limit = max(1, min(limit, _MAX_QUEUE_PAGE))
+    if not player:
+        return web.json_response({"guild_id": None, "version": 0, "offset": 0, "total": 0, "tracks": []})
+    return web.json_response(player.queue_page(offset, limit))
+
+
+def _if_none_match(request: web.Request) -> set[str]:
+    raw = request.headers.get("If-None-Match", "")
+    return {tag.strip() for tag in raw.split(",") if tag.strip()}
+
+
+async def api_now_playing_events(request: web.Request) -> web.StreamResponse:
+    """Server-sent events: a `state` snapshot, then small change events as they happen.
+
+    Events follow the session /api/now-playing would answer for with the
+    same query string, so without a guild_id the stream follows whichever
+    server is the default at the time. Event names are `state`, `track`,
+    `paused`, `volume` and `queue`; see PlayerSession._emit.
+    """
+    try:
+        guild_id = _optional_int(request.query.get("guild_id"))
+        channel_id = _optional_int(request.query.get("channel_id"))
+    except ValueError:
+        return _err("guild_id must be a number")
     cog = _cog(request)
-    return web.json_response(cog.state_dict() if cog else _IDLE_STATE)
+    # The guild this stream shows. Resolving the default session scans every
+    # voice channel, so it is done again only on `state` events, which is
+    # what a session starting, stopping or changing voice publishes.
+    followed: str | None = None
+
+    def _follow():
+        nonlocal followed
+        player = cog.resolve_session(guild_id=guild_id, channel_id=channel_id) if cog else None
+        followed = str(player.guild_id) if player else None
+        return player
+
+    def _snapshot() -> dict:
+        player = _follow()
+        return player.state_dict() if player else _IDLE_STATE
+
+    resp = _event_stream()
+    await resp.prepare(request)
+    listener = cog.events.subscribe() if cog else None
+    try:
+        await _send_event(resp, "state", _snapshot())
+        if listener is None:
+            while True:   # no music cog: nothing will change, keep-alives only
+                await asyncio.sleep(_KEEPALIVE_SEC)
+                await resp.write(b": keep-alive\n\n")
+        while True:
+            try:
+                event = await asyncio.wait_for(listener.get(), _KEEPALIVE_SEC)
+            except asyncio.TimeoutError:
+                await resp.write(b": keep-alive\n\n")
+                continue
+            if event is None:   # fell behind and lost events
+                await _send_event(resp, "state", _snapshot())
+                continue
+            if event["type"] == "state":
+                before = followed
+                player = _follow()
+                if followed != event["guild_id"]:
+                    if followed != before:
+                        # The default moved to another session, or there is none now.
+                        await _send_event(resp, "state", player.state_dict() if player else _IDLE_STATE)
+                    continue
+            elif event["guild_id"] != followed:
+                continue
+            await _send_event(resp, event["type"], event)
+    except ConnectionResetError:
+        pass   # the client went away
+    finally:
+        if listener is not None:
+            cog.events.unsubscribe(listener)
+    return resp
 
 
-async def api_play(request: web.Request) -> web.Response:
+async def api_sessions(request: web.Request) -> web.Response:
+    """Every guild with a player session, for picking which one to drive."""
     cog = _cog(request)
-    if not cog:
+    sessions = cog.sessions() if cog else []
+    return web.json_response({"sessions": [s.summary_dict() for s in sessions]})
+
+
+async def api_play(request: web.Request) -> web.Response:
+    if not _cog(request):
         return _err("Music cog not available", 503)
     try:
         body = await _json_body(request)
+        player = _player(request, body)
     except ValueError as exc:
         return _err(str(exc))
+    if not player:
+        return _err("No voice channel available — join one first", 409)
 
     playlist_id = body.get("playlist_id")
     if playlist_id is None:
@@ -171,7 +342,7 @@ async def api_play(request: web.Request) -> web.Response:
     shuffled = body.get("shuffled")
 
     try:
-        count = await cog.play_playlist(
+        count = await player.play_playlist(
             int(playlist_id),
             int(track_id) if track_id is not None else None,
             shuffled=bool(shuffled) if shuffled is not None else None,
@@ -186,9 +357,12 @@ async def api_play(request: web.Request) -> web.Response:
 
 
 async def _simple_control(request: web.Request, method: str) -> web.Response:
-    cog = _cog(request)
-    if cog:
-        await getattr(cog, method)()
+    try:
+        player = _player(request, await _optional_json_body(request))
+    except ValueError as exc:
+        return _err(str(exc))
+    if player:
+        await getattr(player, method)()
     return web.json_response({"ok": True})
 
 
@@ -213,65 +387,66 @@ async def api_previous(request: web.Request) -> web.Response:
 
 
 async def api_shuffle(request: web.Request) -> web.Response:
-    cog = _cog(request)
     try:
         body = await _json_body(request)
+        player = _player(request, body)
     except ValueError as exc:
         return _err(str(exc))
     shuffled = bool(body.get("shuffled", False))
-    if cog:
-        await cog.set_shuffled(shuffled)
+    if player:
+        await player.set_shuffled(shuffled)
     return web.json_response({"ok": True, "shuffled": shuffled})
 
 
 async def api_volume(request: web.Request) -> web.Response:
-    cog = _cog(request)
     try:
         body = await _json_body(request)
         volume = float(body.get("volume", 0.5))
     except (ValueError, TypeError):
         return _err("volume must be a number between 0 and 1")
-    if cog:
-        await cog.set_volume(volume)
+    try:
+        player = _player(request, body)
+    except ValueError as exc:
+        return _err(str(exc))
+    if player:
+        await player.set_volume(volume)
     return web.json_response({"ok": True, "volume": volume})
 
 
 async def api_device(request: web.Request) -> web.Response:
     """Switch playback device. Body: {"device": "voice"|"browser", "channel_id": int?}"""
-    cog = _cog(request)
-    if not cog:
+    if not _cog(request):
         return _err("Music cog not available", 503)
     try:
         body = await _json_body(request)
+        player = _player(request, body)
+        channel_id = _optional_int(body.get("channel_id"))
     except ValueError as exc:
         return _err(str(exc))
 
     device = body.get("device", "browser")
-    channel_id = body.get("channel_id")
 
     if device == "voice":
-        ok = await cog.join_voice(int(channel_id) if channel_id else None)
+        ok = bool(player) and await player.join_voice(channel_id)
         return web.json_response({
             "ok": ok,
             "message": "Joined" if ok else "No voice channel available — join one first",
+            "guild_id": str(player.guild_id) if player else None,
         })
-    await cog.leave_voice()
+    if player:
+        await player.leave_voice()
     return web.json_response({"ok": True})
 
 
 async def api_devices(request: web.Request) -> web.Response:
     """List playback devices: this browser plus every reachable voice channel."""
-    from bot.db import Game
-
     bot = request.app.get("bot")
     devices = [{"type": "browser", "label": "Browser", "channel_id": None, "members": 0}]
     if not bot:
         return web.json_response({"devices": devices})
 
     # Label a channel with its game name when it belongs to one.
-    async with async_session_factory() as session:
-        rows = await session.execute(select(Game))
-        game_names = {g.voice_game_id: g.name for g in rows.scalars().all()}
+    game_names = {g.voice_game_id: g.name for g in await game_registry.all()}
 
     voice: list[dict] = []
     for guild in bot.guilds:
@@ -295,50 +470,143 @@ async def api_devices(request: web.Request) -> web.Response:
 
 # --- Library --------------------------------------------------------------
 
-async def api_library_tracks(_request: web.Request) -> web.Response:
-    async with async_session_factory() as session:
-        rows = await session.execute(select(Track).order_by(Track.added_at.desc(), Track.id.desc()))
-        tracks = rows.scalars().all()
-    return web.json_response([_track_dict(t) for t in tracks])
+_LIBRARY_PAGE_PARAMS = ("limit", "cursor", "q", "sort", "fields")
+_MAX_LIBRARY_PAGE = 500
 
 
-async def api_library_import(request: web.Request) -> web.Response:
+async def api_library_tracks(request: web.Request) -> web.Response:
+    """
+    The library, newest first.
+
+    With any of limit/cursor/q/sort/fields in the query string this is one
+    keyset-paginated page: {"tracks", "next_cursor", "total"}; pass
+    next_cursor back as `cursor` for the next page. Without them it is the
+    whole library as a bare array, as older clients expect.
+    """
+    query = request.query
+    if not any(p in query for p in _LIBRARY_PAGE_PARAMS):
+        async with read_session_factory() as session:
+            rows = await session.execute(select(Track).order_by(Track.added_at.desc(), Track.id.desc()))
+            tracks = rows.scalars().all()
+        return web.json_response([_track_dict(t) for t in tracks])
+
     try:
-        body = await _json_body(request)
+        limit = _optional_int(query.get("limit")) or 100
+        fields = tuple(f.strip() for f in query["fields"].split(",") if f.strip()) \
+            if query.get("fields") else DEFAULT_TRACK_FIELDS
+        tracks, next_cursor, total = await list_tracks(
+            limit=max(1, min(limit, _MAX_LIBRARY_PAGE)),
+            cursor=query.get("cursor") or None,
+            q=query.get("q", "").strip() or None,
+            sort=query.get("sort") or "newest",
+            fields=fields or DEFAULT_TRACK_FIELDS,
+        )
     except ValueError as exc:
-        return _err(str(exc))
+        return _err(str(exc) or "Invalid query")
+    return web.json_response({"tracks": tracks, "next_cursor": next_cursor, "total": total})
+
 
+_MAX_SEARCH_RESULTS = 50
+
+
+async def api_search(request: web.Request) -> web.Response:
+    """Ranked prefix search: ?q=…&limit=…&kinds=tracks,playlists (both by default)."""
+    q = request.query.get("q", "").strip()
+    try:
+        limit = max(1, min(_optional_int(request.query.get("limit")) or 20, _MAX_SEARCH_RESULTS))
+    except ValueError:
+        return _err("limit must be a number")
+    kinds = set((request.query.get("kinds") or "tracks,playlists").split(","))
+    out: dict = {"q": q}
+    if "tracks" in kinds:
+        out["tracks"] = [_track_dict(t) for t in await search_tracks(q, limit)]
+    if "playlists" in kinds:
+        out["playlists"] = [_playlist_dict(p) for p in await search_playlists(q, limit)]
+    return web.json_response(out)
+
+
+async def _import_request(request: web.Request) -> tuple[str, int | None]:
+    """(url, playlist_id) from an import request body; raises ValueError."""
+    body = await _json_body(request)
     url = str(body.get("url", "")).strip()
     if not url:
-        return _err("url is required")
+        raise ValueError("url is required")
+    playlist_id = body.get("playlist_id")
+    try:
+        playlist_id = int(playlist_id) if playlist_id is not None else None
+    except (TypeError, ValueError):
+        raise ValueError("playlist_id must be an integer")
+    return url, playlist_id
+
 
+def _job_dict(job: ImportJob) -> dict:
+    out = job.as_dict()
+    out["track"] = _track_dict(job.tracks[0]) if job.tracks else None
+    return out
+
+
+async def api_library_import(request: web.Request) -> web.Response:
+    """Import and wait for the result. Kept for clients that predate import jobs."""
     try:
-        tracks, skipped = await import_url(url)
+        url, playlist_id = await _import_request(request)
     except ValueError as exc:
         return _err(str(exc))
-    except Exception as exc:
-        log.error("library import error for %s: %s", url, exc)
-        return _err("Failed to fetch that from YouTube", 500)
-
-    if not tracks:
-        return _err("Nothing importable was found at that URL")
-
-    # Optionally drop the imported tracks straight into a playlist.
-    playlist_id = body.get("playlist_id")
-    added_to_playlist = 0
-    if playlist_id is not None:
-        added_to_playlist = await _append_tracks(int(playlist_id), [t.id for t in tracks])
 
+    job, _ = import_jobs.start(url, playlist_id)
+    await job.wait()
+    if job.status == "failed":
+        return _err(job.error or "Import failed")
     return web.json_response({
         "ok": True,
-        "track": _track_dict(tracks[0]),
-        "tracks": [_track_dict(t) for t in tracks],
-        "imported": len(tracks),
-        "skipped": skipped,
-        "added_to_playlist": added_to_playlist,
+        "track": _track_dict(job.tracks[0]),
+        "tracks": [_track_dict(t) for t in job.tracks],
+        "imported": job.imported,
+        "skipped": job.skipped,
+        "added_to_playlist": job.added_to_playlist,
     })
 
 
+async def api_import_start(request: web.Request) -> web.Response:
+    """Start an import job and answer at once; a URL already importing joins that job."""
+    try:
+        url, playlist_id = await _import_request(request)
+    except ValueError as exc:
+        return _err(str(exc))
+    job, started = import_jobs.start(url, playlist_id)
+    return web.json_response({"ok": True, "job": _job_dict(job), "merged": not started}, status=202)
+
+
+async def api_import_jobs(_request: web.Request) -> web.Response:
+    return web.json_response({"jobs": [_job_dict(j) for j in import_jobs.jobs()]})
+
+
+async def api_import_job(request: web.Request) -> web.Response:
+    job = import_jobs.get(request.match_info["job_id"])
+    if job is None:
+        return _err("Not found", 404)
+    return web.json_response(_job_dict(job))
+
+
+async def api_import_events(request: web.Request) -> web.StreamResponse:
+    """Server-sent events: the job's state now, then again on every change until it ends."""
+    job = import_jobs.get(request.match_info["job_id"])
+    if job is None:
+        return _err("Not found", 404)
+    resp = _event_stream()
+    await resp.prepare(request)
+    while True:
+        version, finished = job.version, job.finished
+        try:
+            await _send_event(resp, "progress", _job_dict(job))
+        except ConnectionResetError:
+            break   # the client went away; the job carries on regardless
+        if finished:
+            break
+        # The timeout doubles as a keep-alive for idle proxies.
+        await job.wait_changed(since=version, timeout=_KEEPALIVE_SEC)
+    return resp
+
+
 async def api_library_delete(request: web.Request) -> web.Response:
     try:
         track_id = int(request.match_info["track_id"])
@@ -351,13 +619,16 @@ async def api_library_delete(request: web.Request) -> web.Response:
         # Playlist entries cascade via the relationship.
         await session.delete(track)
         await session.commit()
+    await audio_cache.discard(track.youtube_id)
     return web.json_response({"ok": True})
 
 
 # --- Playlists ------------------------------------------------------------
 
-async def api_playlists(_request: web.Request) -> web.Response:
-    async with async_session_factory() as session:
+async def api_playlists(request: web.Request) -> web.Response:
+    """Every playlist with its track count; ?tag= narrows it to one tag."""
+    tag = request.query.get("tag", "").strip().lower()
+    async with read_session_factory() as session:
         # Join to tracks: an entry whose track has been deleted is not a track.
         cnt_sq = (
             select(PlaylistTrack.playlist_id, func.count().label("cnt"))
@@ -370,11 +641,22 @@ async def api_playlists(_request: web.Request) -> web.Response:
             .outerjoin(cnt_sq, Playlist.id == cnt_sq.c.playlist_id)
             .order_by(Playlist.name)
         )
+        if tag:
+            stmt = (
+                stmt.join(PlaylistTag, PlaylistTag.playlist_id == Playlist.id)
+                .join(Tag, Tag.id == PlaylistTag.tag_id)
+                .where(Tag.name == tag)
+            )
         rows = await session.execute(stmt)
         result = [_playlist_dict(p, cnt or 0) for p, cnt in rows]
     return web.json_response({"playlists": result})
 
 
+async def api_tags(_request: web.Request) -> web.Response:
+    """Tag cloud: every tag in use and how many playlists carry it."""
+    return web.json_response({"tags": [{"name": n, "count": c} for n, c in await tag_counts()]})
+
+
 async def api_create_playlist(request: web.Request) -> web.Response:
     try:
         body = await _json_body(request)
@@ -389,8 +671,11 @@ async def api_create_playlist(request: web.Request) -> web.Response:
     async with async_session_factory() as session:
         p = Playlist(name=name, tags=tags)
         session.add(p)
+        await session.flush()
+        await set_playlist_tags(session, p.id, tags)
         await session.commit()
         await session.refresh(p)
+    playlist_index.invalidate()
     return web.json_response({"ok": True, "playlist": _playlist_dict(p, 0)})
 
 
@@ -400,7 +685,7 @@ async def api_get_playlist(request: web.Request) -> web.Response:
     except ValueError:
         return _err("Invalid id")
 
-    async with async_session_factory() as session:
+    async with read_session_factory() as session:
         p = await session.get(Playlist, pl_id)
         if not p:
             return _err("Not found", 404)
@@ -430,8 +715,10 @@ async def api_update_playlist(request: web.Request) -> web.Response:
             p.name = str(body["name"]).strip()
         if "tags" in body:
             p.tags = str(body["tags"]).strip() or None
+            await set_playlist_tags(session, p.id, p.tags)
         await session.commit()
         await session.refresh(p)
+    playlist_index.invalidate()
     return web.json_response({"ok": True, "playlist": _playlist_dict(p)})
 
 
@@ -446,8 +733,8 @@ async def api_delete_playlist(request: web.Request) -> web.Response:
         if not p:
             return _err("Not found", 404)
         cover = p.cover_path
-        # SQLite foreign keys are not enforced here (no PRAGMA foreign_keys=ON),
-        # so ON DELETE CASCADE does not fire and the hotkey has to go by hand.
+        # The hotkey goes by hand, not only through ON DELETE CASCADE: that
+        # needs foreign keys on, and databases ran for a long time without.
         # Leaving it is not merely untidy: playlist ids are plain rowids and
         # SQLite reuses them, so the next playlist created could inherit this
         # one's shortcut.
@@ -456,41 +743,17 @@ async def api_delete_playlist(request: web.Request) -> web.Response:
         )).scalars().one_or_none()
         if hotkey:
             await session.delete(hotkey)
+        # Same for its tag links (and any tag left unused).
+        await set_playlist_tags(session, pl_id, None)
         await session.delete(p)
         await session.commit()
+    playlist_index.invalidate()
 
     if cover:
         _unlink_cover(cover)
     return web.json_response({"ok": True})
 
 
-async def _append_tracks(pl_id: int, track_ids: list[int]) -> int:
-    """Append tracks to a playlist, skipping ones already on it. Returns count added."""
-    added = 0
-    async with async_session_factory() as session:
-        if not await session.get(Playlist, pl_id):
-            return 0
-        existing = set((await session.execute(
-            select(PlaylistTrack.track_id).where(PlaylistTrack.playlist_id == pl_id)
-        )).scalars().all())
-        # Explicit None check: position 0 is falsy, and `or -1` here would
-        # restart numbering at 0 and collide with the existing first track.
-        max_pos = (await session.execute(
-            select(func.max(PlaylistTrack.position)).where(PlaylistTrack.playlist_id == pl_id)
-        )).scalar()
-        next_pos = 0 if max_pos is None else max_pos + 1
-
-        for track_id in track_ids:
-            if track_id in existing or not await session.get(Track, track_id):
-                continue
-            session.add(PlaylistTrack(playlist_id=pl_id, track_id=track_id, position=next_pos))
-            existing.add(track_id)
-            next_pos += 1
-            added += 1
-        await session.commit()
-    return added
-
-
 async def api_playlist_add_track(request: web.Request) -> web.Response:
     try:
         pl_id = int(request.match_info["id"])
@@ -509,14 +772,39 @@ async def api_playlist_add_track(request: web.Request) -> web.Response:
     except (TypeError, ValueError):
         return _err("track ids must be integers")
 
-    async with async_session_factory() as session:
-        if not await session.get(Playlist, pl_id):
-            return _err("Not found", 404)
-
-    added = await _append_tracks(pl_id, track_ids)
-    if not added:
+    added = await append_to_playlists([pl_id], track_ids)
+    if pl_id not in added:
+        return _err("Not found", 404)
+    if not added[pl_id]:
         return _err("Already in playlist", 409)
-    return web.json_response({"ok": True, "added": added})
+    return web.json_response({"ok": True, "added": added[pl_id]})
+
+
+async def api_playlists_add_tracks(request: web.Request) -> web.Response:
+    """Body: {"playlist_ids": [...], "track_ids": [...]} — every track onto every playlist.
+
+    One transaction: if any playlist is missing nothing is added. Answers
+    {"added": {playlist_id: count}}; tracks already on a playlist are skipped.
+    """
+    try:
+        body = await _json_body(request)
+    except ValueError as exc:
+        return _err(str(exc))
+    try:
+        pl_ids = [int(p) for p in body.get("playlist_ids") or []]
+        track_ids = [int(t) for t in body.get("track_ids") or []]
+    except (TypeError, ValueError):
+        return _err("playlist and track ids must be integers")
+    if not pl_ids or not track_ids:
+        return _err("playlist_ids and track_ids are required")
+
+    async with async_session_factory() as session:
+        added = await append_to_playlists(pl_ids, track_ids, session)
+        missing = [p for p in pl_ids if p not in added]
+        if missing:
+            return _err(f"Playlist {missing[0]} not found", 404)
+        await session.commit()
+    return web.json_response({"ok": True, "added": {str(p): n for p, n in added.items()}})
 
 
 async def api_playlist_remove_track(request: web.Request) -> web.Response:
@@ -540,7 +828,10 @@ async def api_playlist_remove_track(request: web.Request) -> web.Response:
 
 
 async def api_playlist_reorder(request: web.Request) -> web.Response:
-    """Body: {"track_ids": [...]} — rewrites positions to match the given order."""
+    """Body: {"track_ids": [...]} — rewrites positions to match the given order.
+
+    Rewrites every row; moving one track is POST .../tracks/{track_id}/move.
+    """
     try:
         pl_id = int(request.match_info["id"])
         body = await _json_body(request)
@@ -551,23 +842,44 @@ async def api_playlist_reorder(request: web.Request) -> web.Response:
         return _err("track_ids required")
 
     async with async_session_factory() as session:
-        rows = (await session.execute(
-            select(PlaylistTrack).where(PlaylistTrack.playlist_id == pl_id)
+        current = (await session.execute(
+            select(PlaylistTrack.track_id).where(PlaylistTrack.playlist_id == pl_id)
         )).scalars().all()
-        by_track = {r.track_id: r for r in rows}
-        if set(track_ids) != set(by_track):
+        if len(track_ids) != len(current) or set(track_ids) != set(current):
             return _err("track_ids must list exactly the playlist's tracks")
-        # Two passes: park positions out of the way first so the unique
-        # (playlist_id, position) constraint cannot trip mid-reorder.
-        for offset, r in enumerate(rows):
-            r.position = -1 - offset
-        await session.flush()
-        for pos, track_id in enumerate(track_ids):
-            by_track[track_id].position = pos
+        await renumber_playlist(session, pl_id, track_ids)
         await session.commit()
     return web.json_response({"ok": True})
 
 
+async def api_playlist_move_track(request: web.Request) -> web.Response:
+    """Body: {"before": track_id} or {"after": track_id} — moves one track, touching one row."""
+    try:
+        pl_id = int(request.match_info["id"])
+        track_id = int(request.match_info["track_id"])
+    except ValueError:
+        return _err("Invalid id")
+    try:
+        body = await _json_body(request)
+    except ValueError as exc:
+        return _err(str(exc))
+    try:
+        before = _optional_int(body.get("before"))
+        after = _optional_int(body.get("after"))
+    except (TypeError, ValueError):
+        return _err("before and after must be track ids")
+
+    async with async_session_factory() as session:
+        try:
+            position = await move_track(session, pl_id, track_id, before=before, after=after)
+        except LookupError:
+            return _err("Not found", 404)
+        except ValueError as exc:
+            return _err(str(exc))
+        await session.commit()
+    return web.json_response({"ok": True, "position": position})
+
+
 # --- Hotkeys ---------------------------------------------------------------
 #
 # The desktop app registers these with the OS, but they are stored here so a
@@ -621,7 +933,7 @@ def _clean_accelerator(raw: object) -> str:
 
 
 async def api_hotkeys(_request: web.Request) -> web.Response:
-    async with async_session_factory() as session:
+    async with read_session_factory() as session:
         rows = await session.execute(
             select(Hotkey, Playlist.name)
             .join(Playlist, Playlist.id == Hotkey.playlist_id)
@@ -691,27 +1003,32 @@ async def api_hotkey_trigger(request: web.Request) -> web.Response:
     must not have to read the state, decide, and write back — two hotkey
     presses in quick succession would race and both decide "play".
     """
-    cog = _cog(request)
-    if not cog:
+    if not _cog(request):
         return _err("Music cog not available", 503)
     try:
         body = await _json_body(request)
         playlist_id = int(body["playlist_id"])
     except (ValueError, KeyError, TypeError):
         return _err("playlist_id required")
+    try:
+        player = _player(request, body)
+    except ValueError as exc:
+        return _err(str(exc))
+    if not player:
+        return _err("No voice channel available — join one first", 409)
 
-    state = cog.state_dict()
+    state = player.state_dict()
     same_playlist = state["playlist_id"] == playlist_id
 
     if same_playlist and state["playing"] and not state["paused"]:
-        await cog.pause()
+        await player.pause()
         return web.json_response({"ok": True, "action": "paused"})
     if same_playlist and state["paused"]:
-        await cog.resume()
+        await player.resume()
         return web.json_response({"ok": True, "action": "resumed"})
 
     try:
-        count = await cog.play_playlist(playlist_id)
+        count = await player.play_playlist(playlist_id)
     except Exception as exc:
         log.error("hotkey trigger error for playlist %s: %s", playlist_id, exc)
         return _err(str(exc), 500)
@@ -736,37 +1053,43 @@ async def api_playlist_cover(request: web.Request) -> web.Response:
         return _err("Invalid id")
 
     os.makedirs(COVERS_DIR, exist_ok=True)
-    async with async_session_factory() as session:
-        p = await session.get(Playlist, pl_id)
-        if not p:
+    # Checked up front but written after the upload: the writer connection
+    # is not held while a slow client sends the file.
+    async with read_session_factory() as session:
+        if not await session.get(Playlist, pl_id):
             return _err("Not found", 404)
 
-        reader = await request.multipart()
-        field = await reader.next()
-        if not field or field.name != "cover":
-            return _err("cover field required")
+    reader = await request.multipart()
+    field = await reader.next()
+    if not field or field.name != "cover":
+        return _err("cover field required")
 
-        content_type = (field.headers.get("Content-Type") or "").split(";")[0].strip()
-        if content_type not in _COVER_TYPES:
-            return _err("Cover must be a JPEG, PNG, WebP, or GIF image")
+    content_type = (field.headers.get("Content-Type") or "").split(";")[0].strip()
+    if content_type not in _COVER_TYPES:
+        return _err("Cover must be a JPEG, PNG, WebP, or GIF image")
 
-        filename = f"{uuid.uuid4().hex}.{_COVER_TYPES[content_type]}"
-        filepath = os.path.join(COVERS_DIR, filename)
-        written = 0
-        try:
-            with open(filepath, "wb") as f:
-                while True:
-                    chunk = await field.read_chunk()
-                    if not chunk:
-                        break
-                    written += len(chunk)
-                    if written > _MAX_COVER_BYTES:
-                        raise ValueError("Cover image is too large (max 8 MB)")
-                    f.write(chunk)
-        except ValueError as exc:
-            _unlink_cover(filename)
-            return _err(str(exc))
+    filename = f"{uuid.uuid4().hex}.{_COVER_TYPES[content_type]}"
+    filepath = os.path.join(COVERS_DIR, filename)
+    written = 0
+    try:
+        with open(filepath, "wb") as f:
+            while True:
+                chunk = await field.read_chunk()
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > _MAX_COVER_BYTES:
+                    raise ValueError("Cover image is too large (max 8 MB)")
+                f.write(chunk)
+    except ValueError as exc:
+        _unlink_cover(filename)
+        return _err(str(exc))
 
+    async with async_session_factory() as session:
+        p = await session.get(Playlist, pl_id)
+        if not p:   # deleted while the file was uploading
+            _unlink_cover(filename)
+            return _err("Not found", 404)
         old_cover = p.cover_path
         p.cover_path = filename
         await session.commit()
@@ -786,7 +1109,7 @@ async def api_debug_state(request: web.Request) -> web.Response:
 
     out: dict = {"database": {}, "guilds": []}
 
-    async with async_session_factory() as session:
+    async with read_session_factory() as session:
         games = (await session.execute(select(Game))).scalars().all()
         players = (await session.execute(select(Player))).scalars().all()
         polls = (await session.execute(select(SchedulePoll))).scalars().all()
@@ -817,6 +1140,9 @@ async def api_debug_state(request: web.Request) -> web.Response:
             {"id": p.id, "name": p.name, "tags": p.tags} for p in playlists
         ],
     }
+    out["extractor"] = ydl_pool.stats()
+    out["schema_version"] = await schema_version()
+    out["maintenance"] = await maintenance.status()
 
     bot = request.app.get("bot")
     if not bot:
@@ -911,6 +1237,9 @@ def create_app(bot=None) -> web.Application:
 
     app.router.add_get("/api/audio/{track_id}", api_audio_stream)
     app.router.add_get("/api/now-playing", api_now_playing)
+    app.router.add_get("/api/now-playing/events", api_now_playing_events)
+    app.router.add_get("/api/now-playing/queue", api_now_playing_queue)
+    app.router.add_get("/api/sessions", api_sessions)
     app.router.add_post("/api/play", api_play)
     app.router.add_post("/api/pause", api_pause)
     app.router.add_post("/api/resume", api_resume)
@@ -924,13 +1253,16 @@ def create_app(bot=None) -> web.Application:
 
     app.router.add_get("/api/playlists", api_playlists)
     app.router.add_post("/api/playlists", api_create_playlist)
+    app.router.add_post("/api/playlists/tracks", api_playlists_add_tracks)
     app.router.add_get("/api/playlists/{id}", api_get_playlist)
     app.router.add_put("/api/playlists/{id}", api_update_playlist)
     app.router.add_delete("/api/playlists/{id}", api_delete_playlist)
     app.router.add_post("/api/playlists/{id}/tracks", api_playlist_add_track)
     app.router.add_put("/api/playlists/{id}/tracks", api_playlist_reorder)
     app.router.add_delete("/api/playlists/{id}/tracks/{track_id}", api_playlist_remove_track)
+    app.router.add_post("/api/playlists/{id}/tracks/{track_id}/move", api_playlist_move_track)
     app.router.add_post("/api/playlists/{id}/cover", api_playlist_cover)
+    app.router.add_get("/api/tags", api_tags)
 
     app.router.add_get("/api/hotkeys", api_hotkeys)
     app.router.add_post("/api/hotkeys/trigger", api_hotkey_trigger)
@@ -939,7 +1271,12 @@ def create_app(bot=None) -> web.Application:
 
     app.router.add_get("/api/debug/state", api_debug_state)
     app.router.add_get("/api/library/tracks", api_library_tracks)
+    app.router.add_get("/api/search", api_search)
     app.router.add_post("/api/library/import", api_library_import)
+    app.router.add_get("/api/library/imports", api_import_jobs)
+    app.router.add_post("/api/library/imports", api_import_start)
+    app.router.add_get("/api/library/imports/{job_id}", api_import_job)
+    app.router.add_get("/api/library/imports/{job_id}/events", api_import_events)
     app.router.add_delete("/api/library/tracks/{track_id}", api_library_delete)
 
     if os.path.isdir(WEB_ROOT):
@@ -0,0 +1,224 @@
+"""Dedicated, prioritized worker pool for yt-dlp extractions.
+
+yt-dlp is synchronous and slow (one to several seconds a call), so it has to
+run off the event loop. Running it in the loop's default executor put every
+extraction in one FIFO shared with everything else: a 500-entry playlist
+import could sit in front of the resolve the current voice track is waiting
+on. Jobs here wait in a priority queue instead, and only as many run at once
+as the pool has workers, so a playback resolve always takes the next free
+worker.
+
+Workers are threads by default. YTDLP_POOL=process runs them in separate
+processes, so extraction stops competing for the GIL with the voice threads
+that feed Discord every 20 ms. Either way each worker keeps one YoutubeDL
+per option set instead of building a new one per call.
+"""
+from __future__ import annotations
+
+import asyncio
+import enum
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any
+
+import yt_dlp
+
+log = logging.getLogger(__name__)
+
+
+class Priority(enum.IntEnum):
+    """Lower runs first."""
+    PLAYBACK = 0   # the track a voice session is about to play
+    STREAM = 1     # the browser audio proxy, and voice read-ahead
+    IMPORT = 2     # library imports
+    REFRESH = 3    # background upkeep nobody is waiting on
+
+
+# Per worker (thread or process): option-set name -> YoutubeDL.
+_local = threading.local()
+
+
+def _extract(opts_name: str, opts: dict, url: str) -> dict[str, Any]:
+    """Worker side: run one extraction on this worker's YoutubeDL for opts_name."""
+    ydls = getattr(_local, "ydls", None)
+    if ydls is None:
+        ydls = _local.ydls = {}
+    ydl = ydls.get(opts_name)
+    if ydl is None:
+        ydl = ydls[opts_name] = yt_dlp.YoutubeDL(opts)
+    info = ydl.extract_info(url, download=False)
+    # Plain data only: the result may have to cross a process boundary.
+    return ydl.sanitize_info(info)
+
+
+class _Job:
+    __slots__ = ("opts_name", "opts", "url", "priority", "future", "queued_at", "started")
+
+    def __init__(self, opts_name: str, opts: dict, url: str, priority: Priority, future: asyncio.Future):
+        self.opts_name = opts_name
+        self.opts = opts
+        self.url = url
+        self.priority = priority
+        self.future = future
+        self.queued_at = time.monotonic()
+        self.started = False
+
+
+class _ClassStats:
+    __slots__ = ("completed", "failed", "wait_total", "run_total", "wait_max", "run_max")
+
+    def __init__(self) -> None:
+        self.completed = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.run_total = 0.0
+        self.wait_max = 0.0
+        self.run_max = 0.0
+
+    def record(self, waited: float, ran: float, ok: bool) -> None:
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+        self.wait_total += waited
+        self.run_total += ran
+        self.wait_max = max(self.wait_max, waited)
+        self.run_max = max(self.run_max, ran)
+
+    def as_dict(self) -> dict:
+        n = self.completed + self.failed
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_sec": round(self.wait_total / n, 3) if n else 0.0,
+            "avg_run_sec": round(self.run_total / n, 3) if n else 0.0,
+            "max_wait_sec": round(self.wait_max, 3),
+            "max_run_sec": round(self.run_max, 3),
+        }
+
+
+class ExtractorPool:
+    def __init__(self, workers: int, use_processes: bool = False) -> None:
+        self.workers = max(1, workers)
+        self.use_processes = use_processes
+        self._executor: Executor | None = None
+        self._queue: asyncio.PriorityQueue | None = None
+        self._dispatchers: list[asyncio.Task] = []
+        self._seq = itertools.count()
+        # (opts_name, url) -> job not yet finished, so duplicates share it.
+        self._pending: dict[tuple[str, str], _Job] = {}
+        self._running = 0
+        self._stats = {p: _ClassStats() for p in Priority}
+
+    def _start(self) -> None:
+        if self._queue is not None:
+            return
+        if self.use_processes:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ydl")
+        self._queue = asyncio.PriorityQueue()
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        log.info(
+            "yt-dlp pool: %d %s worker(s)", self.workers, "process" if self.use_processes else "thread"
+        )
+
+    async def run(self, opts_name: str, opts: dict, url: str, priority: Priority) -> dict[str, Any]:
+        """Extract url with opts, queued behind anything more urgent.
+
+        Asking for an extraction that is already queued shares its result,
+        and raises it to the more urgent of the two priorities.
+        """
+        self._start()
+        key = (opts_name, url)
+        job = self._pending.get(key)
+        if job is None:
+            job = _Job(opts_name, opts, url, priority, asyncio.get_running_loop().create_future())
+            self._pending[key] = job
+            self._queue.put_nowait((priority, next(self._seq), job))
+        else:
+            self.prioritize(opts_name, url, priority)
+        return await asyncio.shield(job.future)
+
+    def prioritize(self, opts_name: str, url: str, priority: Priority) -> None:
+        """Raise a queued extraction to priority, if that is more urgent."""
+        job = self._pending.get((opts_name, url))
+        if job is None or job.started or priority >= job.priority:
+            return
+        # The old entry stays queued; whichever copy is popped first runs the
+        # job and the other is skipped.
+        job.priority = priority
+        self._queue.put_nowait((priority, next(self._seq), job))
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, job = await self._queue.get()
+            if job.started:
+                continue   # a re-prioritized duplicate of a job already run
+            job.started = True
+            started = time.monotonic()
+            self._running += 1
+            ok = False
+            try:
+                result = await loop.run_in_executor(
+                    self._executor, _extract, job.opts_name, job.opts, job.url
+                )
+                ok = True
+                job.future.set_result(result)
+            except Exception as exc:
+                job.future.set_exception(exc)
+            finally:
+                self._running -= 1
+                self._pending.pop((job.opts_name, job.url), None)
+                self._stats[job.priority].record(
+                    started - job.queued_at, time.monotonic() - started, ok
+                )
+                if not ok and not job.future.done():
+                    job.future.cancel()
+
+    def stats(self) -> dict:
+        queued: dict[str, int] = {p.name.lower(): 0 for p in Priority}
+        for job in self._pending.values():
+            if not job.started:
+                queued[job.priority.name.lower()] += 1
+        return {
+            "workers": self.workers,
+            "kind": "process" if self.use_processes else "thread",
+            "running": self._running,
+            "queued": queued,
+            "by_priority": {p.name.lower(): s.as_dict() for p, s in self._stats.items()},
+        }
+
+    async def close(self) -> None:
+        """Stop the dispatchers and the workers; the next run() starts them again."""
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        for job in self._pending.values():
+            if not job.future.done():
+                job.future.cancel()
+        self._pending.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self._queue = None
+        self._dispatchers = []
+
+
+def _workers_from_env() -> int:
+    try:
+        return int(os.environ.get("YTDLP_WORKERS", "4"))
+    except ValueError:
+        log.warning("YTDLP_WORKERS is not a number; using 4")
+        return 4
+
+
+pool = ExtractorPool(
+    _workers_from_env(),
+    use_processes=os.environ.get("YTDLP_POOL", "thread").strip().lower() == "process",
+)
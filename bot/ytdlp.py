@@ -4,13 +4,17 @@ from __future__ import annotations
 import asyncio
 import logging
 import re
-from functools import partial
-from typing import Any
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple
+from urllib.parse import parse_qs, urlparse
 
-import yt_dlp
 from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from bot.db import Track, async_session_factory
+from bot.db import Track, in_chunks, read_session_factory, session_scope
+from bot.ydl_pool import Priority, pool
 
 log = logging.getLogger(__name__)
 
@@ -67,14 +71,17 @@ def extract_playlist_id(url: str) -> str | None:
     return None if list_id.startswith(("RD", "UL")) else list_id
 
 
-def _run_ydl(opts: dict, url: str) -> dict[str, Any]:
-    with yt_dlp.YoutubeDL(opts) as ydl:
-        return ydl.extract_info(url, download=False)
+# Option sets by name: workers keep one YoutubeDL per name, and the name is
+# what crosses to a process worker alongside the options themselves.
+_OPTS = {
+    'meta': _META_OPTS,
+    'playlist': _PLAYLIST_OPTS,
+    'audio': _AUDIO_OPTS,
+}
 
 
-async def _ydl_async(opts: dict, url: str) -> dict[str, Any]:
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, partial(_run_ydl, opts, url))
+async def _ydl_async(opts_name: str, url: str, priority: Priority) -> dict[str, Any]:
+    return await pool.run(opts_name, _OPTS[opts_name], url, priority)
 
 
 def _thumbnail_of(info: dict[str, Any]) -> str | None:
@@ -85,99 +92,165 @@ def _thumbnail_of(info: dict[str, Any]) -> str | None:
     return thumbs[-1].get('url') if thumbs else None
 
 
-async def _upsert_track(
-    youtube_id: str, title: str, duration_sec: int | None, thumbnail_url: str | None
-) -> Track:
-    async with async_session_factory() as session:
-        result = await session.execute(select(Track).where(Track.youtube_id == youtube_id))
-        track = result.scalars().one_or_none()
-        if not track:
-            track = Track(
-                youtube_id=youtube_id,
-                title=title,
-                duration_sec=duration_sec,
-                thumbnail_url=thumbnail_url,
-            )
-            session.add(track)
-            await session.commit()
-            await session.refresh(track)
-    return track
-
-
-async def _find_track(youtube_id: str) -> Track | None:
-    async with async_session_factory() as session:
-        result = await session.execute(select(Track).where(Track.youtube_id == youtube_id))
-        return result.scalars().one_or_none()
-
-
-async def import_track(url: str) -> Track:
+async def _tracks_by_youtube_id(session: AsyncSession, youtube_ids: list[str]) -> dict[str, Track]:
+    found: dict[str, Track] = {}
+    for chunk in in_chunks(youtube_ids):
+        rows = await session.execute(select(Track).where(Track.youtube_id.in_(chunk)))
+        found.update((t.youtube_id, t) for t in rows.scalars())
+    return found
+
+
+async def upsert_tracks(session: AsyncSession, rows: list[dict[str, Any]]) -> list[Track]:
+    """
+    Make sure every row is in the library and return the Tracks in row order.
+
+    rows are Track column dicts (youtube_id, title, duration_sec, thumbnail_url).
+    Existing tracks are found with one query and only the missing ones are
+    inserted, in one statement; ON CONFLICT covers a concurrent import adding
+    the same video in between. Runs in the caller's session and does not
+    commit, so the caller can build on the rows in the same transaction.
+    """
+    ids = list(dict.fromkeys(r['youtube_id'] for r in rows))
+    found = await _tracks_by_youtube_id(session, ids)
+    missing = {r['youtube_id']: r for r in rows if r['youtube_id'] not in found}
+    if missing:
+        await session.execute(
+            sqlite_insert(Track).on_conflict_do_nothing(index_elements=['youtube_id']),
+            list(missing.values()),
+        )
+        found.update(await _tracks_by_youtube_id(session, list(missing)))
+    return [found[r['youtube_id']] for r in rows]
+
+
+async def _find_track(youtube_id: str, session: AsyncSession | None = None) -> Track | None:
+    """The library's track for youtube_id: in session when given, else on a read connection."""
+    query = select(Track).where(Track.youtube_id == youtube_id)
+    if session is not None:
+        return (await session.execute(query)).scalars().one_or_none()
+    async with read_session_factory() as read:
+        return (await read.execute(query)).scalars().one_or_none()
+
+
+async def import_track(url: str, session: AsyncSession | None = None) -> Track:
     """
     Fetch YouTube metadata for url and upsert a Track row.
     Returns the Track (existing or newly created).
     Raises ValueError if the URL is not a valid YouTube video.
+    With session, the row is written in it and the caller commits.
     """
     youtube_id = extract_youtube_id(url)
 
     # Fast path: already in DB
     if youtube_id:
-        existing = await _find_track(youtube_id)
+        existing = await _find_track(youtube_id, session)
         if existing:
             return existing
 
-    info = await _ydl_async(_META_OPTS, url)
+    info = await _ydl_async('meta', url, Priority.IMPORT)
     youtube_id = youtube_id or info.get('id')
     if not youtube_id:
         raise ValueError(f"Could not resolve a YouTube video ID from: {url}")
 
-    return await _upsert_track(
-        youtube_id,
-        info.get('title', 'Unknown'),
-        info.get('duration'),
-        _thumbnail_of(info),
-    )
+    row = {
+        'youtube_id': youtube_id,
+        'title': info.get('title', 'Unknown'),
+        'duration_sec': info.get('duration'),
+        'thumbnail_url': _thumbnail_of(info),
+    }
+    async with session_scope(session) as s:
+        return (await upsert_tracks(s, [row]))[0]
 
 
-async def import_playlist(url: str) -> tuple[list[Track], int]:
+async def fetch_playlist_rows(url: str) -> tuple[list[dict[str, Any]], int]:
     """
-    Import every video in a YouTube playlist URL.
-    Returns (tracks, skipped) where skipped counts entries with no usable id
-    (deleted/private videos yt-dlp could not resolve).
+    Read a playlist's entries as Track rows for upsert_tracks, writing nothing.
+    Returns (rows, skipped); see import_playlist.
     """
-    info = await _ydl_async(_PLAYLIST_OPTS, url)
+    info = await _ydl_async('playlist', url, Priority.IMPORT)
     entries = [e for e in (info.get('entries') or []) if e]
     if not entries:
         raise ValueError("That playlist is empty or could not be read.")
 
-    tracks: list[Track] = []
+    rows: list[dict[str, Any]] = []
     skipped = 0
     for entry in entries:
         youtube_id = entry.get('id')
         if not youtube_id or len(youtube_id) != 11:
             skipped += 1
             continue
-        duration = entry.get('duration')
+        # A malformed duration must not sink the whole import; store it as unknown.
         try:
-            tracks.append(await _upsert_track(
-                youtube_id,
-                entry.get('title') or 'Unknown',
-                int(duration) if duration else None,
-                _thumbnail_of(entry) or f"https://i.ytimg.com/vi/{youtube_id}/mqdefault.jpg",
-            ))
-        except Exception as exc:  # one bad row must not sink the whole import
-            log.warning("import_playlist: skipping %s: %s", youtube_id, exc)
-            skipped += 1
-
+            duration = int(entry.get('duration') or 0) or None
+        except (TypeError, ValueError):
+            duration = None
+        rows.append({
+            'youtube_id': youtube_id,
+            'title': entry.get('title') or 'Unknown',
+            'duration_sec': duration,
+            'thumbnail_url': _thumbnail_of(entry) or f"https://i.ytimg.com/vi/{youtube_id}/mqdefault.jpg",
+        })
+
+    return rows, skipped
+
+
+async def import_playlist(
+    url: str, session: AsyncSession | None = None
+) -> tuple[list[Track], int]:
+    """
+    Import every video in a YouTube playlist URL.
+    Returns (tracks, skipped) where tracks are in playlist order and skipped
+    counts entries with no usable id (deleted/private videos yt-dlp could not
+    resolve). With session, the rows are written in it and the caller commits.
+    """
+    rows, skipped = await fetch_playlist_rows(url)
+    async with session_scope(session) as s:
+        tracks = await upsert_tracks(s, rows)
     return tracks, skipped
 
 
-async def import_url(url: str) -> tuple[list[Track], int]:
+async def import_url(
+    url: str, session: AsyncSession | None = None
+) -> tuple[list[Track], int]:
     """Import a single video or a whole playlist, whichever the URL points at."""
     if extract_playlist_id(url):
-        return await import_playlist(url)
-    return [await import_track(url)], 0
+        return await import_playlist(url, session)
+    return [await import_track(url, session)], 0
+
+
+def stream_expiry(url: str) -> float | None:
+    """Unix time a signed stream URL stops working, from its `expire=` param.
+
+    Googlevideo URLs carry it either as a query parameter or as a
+    `/expire/<ts>/` path segment; anything else returns None (unknown).
+    """
+    parsed = urlparse(url)
+    values = parse_qs(parsed.query).get('expire')
+    if values:
+        raw = values[0]
+    else:
+        parts = parsed.path.split('/')
+        if 'expire' not in parts:
+            return None
+        idx = parts.index('expire') + 1
+        raw = parts[idx] if idx < len(parts) else ''
+    try:
+        return float(raw)
+    except ValueError:
+        return None
 
 
-async def get_audio_source(youtube_id: str) -> tuple[str, dict[str, str]]:
+class AudioStream(NamedTuple):
+    """A resolved stream: where it is, what it takes to fetch it, what it holds."""
+    url: str
+    headers: dict[str, str]
+    codec: str | None   # e.g. 'opus', 'mp4a.40.2'; None when yt-dlp did not say
+
+
+def _watch_url(youtube_id: str) -> str:
+    return f'https://www.youtube.com/watch?v={youtube_id}'
+
+
+async def _extract_audio_stream(youtube_id: str, priority: Priority) -> AudioStream:
     """
     Resolve a direct audio stream URL plus the HTTP headers required to fetch it.
 
@@ -187,17 +260,18 @@ async def get_audio_source(youtube_id: str) -> tuple[str, dict[str, str]]:
     the browser proxy — or playback dies on a URL that looks perfectly valid.
     The URL is time-limited (a few hours); resolve close to playback.
     """
-    url = f'https://www.youtube.com/watch?v={youtube_id}'
-    info = await _ydl_async(_AUDIO_OPTS, url)
+    info = await _ydl_async('audio', _watch_url(youtube_id), priority)
 
     direct_url = info.get('url')
     headers = dict(info.get('http_headers') or {})
+    codec = info.get('acodec')
     if not direct_url:
         # Some extractors only populate per-format URLs.
         for fmt in reversed(info.get('formats') or []):
             if fmt.get('acodec') not in (None, 'none') and fmt.get('url'):
                 direct_url = fmt['url']
                 headers = dict(fmt.get('http_headers') or headers)
+                codec = fmt.get('acodec')
                 break
     if not direct_url:
         raise RuntimeError(f"yt-dlp returned no audio URL for {youtube_id}")
@@ -205,7 +279,114 @@ async def get_audio_source(youtube_id: str) -> tuple[str, dict[str, str]]:
     # Only the headers that actually gate access; the rest confuse ffmpeg.
     allowed = ('User-Agent', 'Accept', 'Accept-Language', 'Cookie', 'Referer', 'Origin')
     headers = {k: v for k, v in headers.items() if k in allowed}
-    return direct_url, headers
+    if codec in (None, 'none'):
+        codec = None
+    return AudioStream(direct_url, headers, codec)
+
+
+# Stream URLs that carry no `expire=` are trusted for this long.
+_FALLBACK_TTL = 7200
+# Never hand out a URL with less than this left on it.
+_MIN_REMAINING = 60
+
+
+class StreamResolver:
+    """Bounded LRU of resolved stream URLs, shared by voice and the web proxy.
+
+    One yt-dlp extraction per video, however many callers want it: entries
+    live until the signed URL's own `expire=` time, concurrent lookups for an
+    id that is already being resolved wait on that one extraction instead of
+    starting their own, and the least recently used entry goes once the cache
+    is full. A caller that gets 403 from a URL evicts it with invalidate().
+    """
+
+    def __init__(self, max_entries: int = 512) -> None:
+        self.max_entries = max_entries
+        # youtube_id -> (stream, unix time it stops working)
+        self._entries: OrderedDict[str, tuple[AudioStream, float]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def resolve(
+        self,
+        youtube_id: str,
+        *,
+        min_valid: float = 0.0,
+        force: bool = False,
+        priority: Priority = Priority.STREAM,
+    ) -> AudioStream:
+        """A stream for youtube_id that stays valid for at least min_valid seconds.
+
+        force skips the cached entry (but still joins an extraction already in
+        flight, which is as fresh as a new one would be). Joining one raises
+        it to this caller's priority if that is more urgent.
+        """
+        if force:
+            self._entries.pop(youtube_id, None)
+        else:
+            entry = self._entries.get(youtube_id)
+            if entry is not None:
+                stream, expires = entry
+                if expires - time.time() > min_valid + _MIN_REMAINING:
+                    self._entries.move_to_end(youtube_id)
+                    return stream
+                del self._entries[youtube_id]
+
+        fut = self._inflight.get(youtube_id)
+        if fut is None:
+            fut = asyncio.ensure_future(self._extract(youtube_id, priority))
+            self._inflight[youtube_id] = fut
+            fut.add_done_callback(lambda _f: self._inflight.pop(youtube_id, None))
+        else:
+            self.prioritize(youtube_id, priority)
+        # Shielded: one caller giving up must not cancel everyone else's wait.
+        return await asyncio.shield(fut)
+
+    async def _extract(self, youtube_id: str, priority: Priority) -> AudioStream:
+        stream = await _extract_audio_stream(youtube_id, priority)
+        expires = stream_expiry(stream.url) or time.time() + _FALLBACK_TTL
+        self._entries[youtube_id] = (stream, expires)
+        self._entries.move_to_end(youtube_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return stream
+
+    def prioritize(self, youtube_id: str, priority: Priority) -> None:
+        """Raise a queued extraction for youtube_id to priority (no-op otherwise)."""
+        pool.prioritize('audio', _watch_url(youtube_id), priority)
+
+    def invalidate(self, youtube_id: str) -> None:
+        """Forget a URL that stopped working (403/410), so the next lookup re-resolves."""
+        self._entries.pop(youtube_id, None)
+
+
+resolver = StreamResolver()
+
+
+async def resolve_audio_stream(
+    youtube_id: str,
+    *,
+    min_valid: float = 0.0,
+    force: bool = False,
+    priority: Priority = Priority.STREAM,
+) -> AudioStream:
+    """Resolve a stream through the shared cache; see StreamResolver."""
+    return await resolver.resolve(
+        youtube_id, min_valid=min_valid, force=force, priority=priority
+    )
+
+
+def invalidate_audio_stream(youtube_id: str) -> None:
+    resolver.invalidate(youtube_id)
+
+
+def prioritize_audio_stream(youtube_id: str, priority: Priority) -> None:
+    resolver.prioritize(youtube_id, priority)
+
+
+async def get_audio_source(youtube_id: str, force: bool = False) -> tuple[str, dict[str, str]]:
+    """Resolve a stream URL and its headers; see resolve_audio_stream."""
+    stream = await resolve_audio_stream(youtube_id, force=force)
+    return stream.url, stream.headers
 
 
 async def get_audio_url(youtube_id: str) -> str:
@@ -0,0 +1,139 @@
+"""Read latency while a bulk import writes: the SQLite profile against the old setup.
+
+Seeds a throwaway database, then runs library imports back to back (each one
+transaction, written in chunks as import jobs do) while reader tasks page
+through the library and search it, the way open web UIs do. Reports read
+latency and failures per profile:
+
+    python scripts/bench_db.py [--tracks 20000] [--imports 10] [--import-size 2000]
+                               [--readers 8] [--dir PATH]
+
+"tuned" is the default configuration (WAL, synchronous=NORMAL, one writer
+connection plus a read-only pool); "legacy" is what the bot ran with before
+(rollback journal, no pragmas, one shared pool). Each profile runs in its
+own process, since bot.db reads its settings at import time.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILES = {
+    "tuned": {},
+    "legacy": {"SQLITE_PROFILE": "off"},
+}
+
+
+def _rows(start: int, count: int) -> list[dict]:
+    return [
+        {"youtube_id": f"bench{i:07d}", "title": f"Bench track {i} {'lofi' if i % 7 else 'battle'}",
+         "duration_sec": 180 + i % 120, "thumbnail_url": None}
+        for i in range(start, start + count)
+    ]
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    # Imported here: bot.db configures itself from the environment set by main().
+    from bot.db import async_session_factory
+    from bot.library import list_tracks
+    from bot.migrations import init_db
+    from bot.search import search_tracks
+    from bot.ytdlp import upsert_tracks
+
+    await init_db()
+    async with async_session_factory() as session:
+        for i in range(0, args.tracks, 1000):
+            await upsert_tracks(session, _rows(i, min(1000, args.tracks - i)))
+        await session.commit()
+
+    latencies: list[float] = []
+    errors: list[str] = []
+    done = asyncio.Event()
+
+    async def reader(n: int) -> None:
+        while not done.is_set():
+            started = time.perf_counter()
+            try:
+                if n % 2:
+                    await list_tracks(limit=100)
+                else:
+                    await search_tracks("battle", limit=25)
+            except Exception as exc:
+                errors.append(type(exc).__name__ + ": " + str(exc).splitlines()[0])
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0)
+
+    async def importer() -> float:
+        started = time.perf_counter()
+        next_id = args.tracks
+        for _ in range(args.imports):
+            async with async_session_factory() as session:
+                for i in range(0, args.import_size, 200):
+                    await upsert_tracks(session, _rows(next_id + i, min(200, args.import_size - i)))
+                await session.commit()
+            next_id += args.import_size
+        return time.perf_counter() - started
+
+    readers = [asyncio.create_task(reader(n)) for n in range(args.readers)]
+    write_sec = await importer()
+    done.set()
+    await asyncio.gather(*readers)
+
+    ms = sorted(x * 1000 for x in latencies)
+    pick = lambda q: ms[min(len(ms) - 1, int(q * len(ms)))] if ms else 0.0
+    return {
+        "reads": len(ms),
+        "p50_ms": round(statistics.median(ms), 2) if ms else 0.0,
+        "p95_ms": round(pick(0.95), 2),
+        "p99_ms": round(pick(0.99), 2),
+        "max_ms": round(ms[-1], 2) if ms else 0.0,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "import_sec": round(write_sec, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=20000, help="library size before the imports")
+    parser.add_argument("--imports", type=int, default=10, help="imports run back to back")
+    parser.add_argument("--import-size", type=int, default=2000, help="tracks per import")
+    parser.add_argument("--readers", type=int, default=8, help="concurrent reader tasks")
+    parser.add_argument("--dir", help="where to put the databases (default: the temp dir; "
+                        "point it at the disk the bot uses, fsync cost is most of the story)")
+    parser.add_argument("--profile", choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:   # child process: one profile, JSON out
+        sys.path.insert(0, ROOT)
+        print(json.dumps(asyncio.run(_run(args))))
+        return
+
+    for name, env in PROFILES.items():
+        with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+            child_env = {**os.environ, **env, "DATABASE_PATH": os.path.join(tmp, "bench.db")}
+            child_env.pop("DATABASE_URL", None)
+            out = subprocess.run(
+                [sys.executable, __file__, "--profile", name, *sys.argv[1:]],
+                env=child_env, capture_output=True, text=True, check=True,
+            )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{name:7} {result['reads']:6d} reads  p50 {result['p50_ms']:8.2f} ms  "
+              f"p95 {result['p95_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+              f"max {result['max_ms']:8.2f} ms  errors {result['errors']}  "
+              f"imports {result['import_sec']:.2f} s")
+        if result["first_error"]:
+            print(f"        first error: {result['first_error']}")
+
+
+if __name__ == "__main__":
+    main()
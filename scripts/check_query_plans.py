@@ -0,0 +1,233 @@
+"""Fail when a hot query stops using an index.
+
+Seeds a throwaway database, runs the bot's real lookups against it (the
+game registry, the library, search and playlist code, and the web
+API handlers), records every SELECT/UPDATE/DELETE they send, and prints
+EXPLAIN QUERY PLAN for each. A plan step that reads a whole table ("SCAN
+<table>" with no index) fails the run, unless the case lists that table as
+one it means to read in full (the playlist listing does, for one).
+
+Queries still written inline in the cogs are covered by the CASES below
+that mirror them; keep those in step when the cog code changes.
+
+    python scripts/check_query_plans.py [-v]
+
+Exit status 1 on any unexpected full scan.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# "SCAN games" or "SCAN t AS alias"; not "SCAN t USING INDEX ..." (an ordered
+# walk of an index, stopped by LIMIT) and not FTS virtual-table plans.
+_FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+class FakeRequest:
+    """Just enough of aiohttp's Request for the handlers exercised here."""
+
+    def __init__(self, match_info: dict | None = None, query: dict | None = None, body=None):
+        from multidict import MultiDict
+        self.match_info = {k: str(v) for k, v in (match_info or {}).items()}
+        self.query = MultiDict(query or {})
+        self._body = body
+        self.app: dict = {}
+
+    async def json(self):
+        return self._body
+
+
+async def _seed() -> None:
+    from bot.db import (
+        Game, Hotkey, Player, Playlist, PlaylistTrack, POSITION_GAP, SchedulePoll, Track,
+        async_session_factory,
+    )
+    from bot.library import set_playlist_tags
+
+    now = datetime(2026, 1, 1)
+    async with async_session_factory() as session:
+        for g in range(1, 4):
+            base = g * 1000
+            session.add(Game(
+                id=g, guild_id=1, name=f"Game {g}", dm_user_id=base, category_id=base + 1,
+                game_role_id=base + 2, text_important_id=base + 3, text_scheduling_id=base + 4,
+                text_general_id=base + 5, voice_game_id=base + 6, voice_private_id=base + 7,
+            ))
+            for p in range(5):
+                session.add(Player(game_id=g, user_id=base + 100 + p, character_name=f"PC {p}"))
+            session.add(SchedulePoll(
+                game_id=g, channel_id=base + 4, message_id=base + 50,
+                expiry=now + timedelta(days=2), reminder_at=now + timedelta(days=1),
+            ))
+        session.add_all(
+            Track(id=i, youtube_id=f"seed{i:05d}", title=f"Seed track {i}",
+                  added_at=now + timedelta(minutes=i))
+            for i in range(1, 301)
+        )
+        for p in range(1, 6):
+            session.add(Playlist(id=p, name=f"Playlist {p}", tags="battle tavern" if p % 2 else "calm"))
+        await session.flush()
+        for p in range(1, 6):
+            await set_playlist_tags(session, p, "battle tavern" if p % 2 else "calm")
+            session.add_all(
+                PlaylistTrack(playlist_id=p, track_id=t, position=i * POSITION_GAP)
+                for i, t in enumerate(range(p, 301, 7), 1)
+            )
+        session.add(Hotkey(playlist_id=1, accelerator="Control+Alt+1"))
+        await session.commit()
+
+
+def _cases() -> list[tuple[str, object, set[str]]]:
+    """(name, coroutine function, tables it may scan in full)."""
+    from sqlalchemy import func, select, update
+
+    from bot import web_server
+    from bot.cogs import music
+    from bot.db import Player, SchedulePoll, async_session_factory
+    from bot.game_registry import GameRegistry
+    from bot.library import append_to_playlists, list_tracks, move_track, tag_counts
+    from bot.maintenance import TASKS
+    from bot.poll_tally import PollTallies
+    from bot.playlist_index import PlaylistIndex
+    from bot.search import search_playlists, search_tracks
+
+    async def with_session(fn, *args):
+        async with async_session_factory() as session:
+            await fn(session, *args)
+            await session.commit()
+
+    async def run_stmt(stmt):
+        async with async_session_factory() as session:
+            await session.execute(stmt)
+
+    async def library_pages():
+        for sort in ("newest", "oldest", "title", "title_desc"):
+            _rows, cursor, _total = await list_tracks(limit=50, sort=sort)
+            await list_tracks(limit=50, sort=sort, cursor=cursor)
+
+    async def handler(fn, **kwargs):
+        resp = await fn(FakeRequest(**kwargs))
+        if resp.status >= 400:
+            raise RuntimeError(f"{fn.__name__} answered {resp.status}: {resp.body!r}")
+
+    return [
+        # bot/utils.py answers from the game registry; it loads both tables whole.
+        ("game registry load", lambda: GameRegistry().all(), {"games", "players"}),
+        # bot/cogs: inline queries, mirrored
+        ("games: player lookup (add/remove/set-nickname/transfer)",
+         lambda: run_stmt(select(Player).where(Player.game_id == 2, Player.user_id == 2101)), set()),
+        ("scheduling: reminder scheduler startup",
+         lambda: run_stmt(select(
+             SchedulePoll.id, SchedulePoll.game_id, SchedulePoll.channel_id,
+             SchedulePoll.message_id, SchedulePoll.reminder_at,
+         ).where(
+             SchedulePoll.reminder_sent == False,  # noqa: E712 - SQL comparison
+             SchedulePoll.expiry > datetime(2026, 1, 1),
+         )), set()),
+        ("scheduling: poll tallies startup", lambda: PollTallies().load(), set()),
+        ("scheduling: newest poll per channel (startup catch-up)",
+         lambda: run_stmt(select(SchedulePoll.channel_id, func.max(SchedulePoll.message_id))
+                          .group_by(SchedulePoll.channel_id)), set()),
+        ("scheduling: poll message deleted or ended", lambda: run_stmt(
+            update(SchedulePoll).where(SchedulePoll.message_id.in_([2050, 9999]))
+            .values(expiry=datetime(2026, 1, 1))), set()),
+        ("music: playlist tracks for playback", lambda: music.load_playlist_tracks(3), set()),
+        # library, search, playlist index, maintenance
+        ("library.list_tracks (every sort, two pages)", library_pages, set()),
+        ("library.append_to_playlists",
+         lambda: with_session(lambda s: append_to_playlists([1, 2], [5, 6, 7], s)), set()),
+        ("library.move_track", lambda: with_session(
+            lambda s: move_track(s, 1, 8, before=1)), set()),
+        ("library.tag_counts", tag_counts, {"tags"}),
+        ("search", lambda: asyncio.gather(search_tracks("seed"), search_playlists("battle")), set()),
+        ("playlist index load", lambda: PlaylistIndex().all(), {"playlists"}),
+        ("maintenance: playlist-orphans batch", lambda: TASKS["playlist-orphans"](None), set()),
+        # bot/web_server.py
+        ("GET /api/playlists", lambda: handler(web_server.api_playlists), {"playlists", "playlist_tracks"}),
+        ("GET /api/playlists?tag=", lambda: handler(web_server.api_playlists, query={"tag": "battle"}),
+         {"playlist_tracks"}),
+        ("GET /api/playlists/{id}", lambda: handler(web_server.api_get_playlist, match_info={"id": 2}), set()),
+        ("GET /api/tags", lambda: handler(web_server.api_tags), {"tags"}),
+        ("GET /api/hotkeys", lambda: handler(web_server.api_hotkeys), {"hotkeys"}),
+        ("GET /api/library/tracks?limit=", lambda: handler(
+            web_server.api_library_tracks, query={"limit": "50", "sort": "title"}), set()),
+        ("DELETE /api/playlists/{id}/tracks/{track_id}", lambda: handler(
+            web_server.api_playlist_remove_track, match_info={"id": 3, "track_id": 3}), set()),
+        ("DELETE /api/library/tracks/{track_id}", lambda: handler(
+            web_server.api_library_delete, match_info={"track_id": 299}), set()),
+        ("DELETE /api/playlists/{id}", lambda: handler(
+            web_server.api_delete_playlist, match_info={"id": 5}), set()),
+    ]
+
+
+async def _check(db_path: str, verbose: bool) -> int:
+    from sqlalchemy import event
+
+    from bot.db import engine, read_engine
+    from bot.migrations import init_db
+
+    await init_db()
+    await _seed()
+
+    captured: list[tuple[str, object]] = []
+
+    def record(_conn, _cursor, statement, parameters, _context, executemany):
+        if statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE", "WITH"):
+            captured.append((statement, parameters[0] if executemany else parameters))
+
+    for eng in {engine, read_engine}:
+        event.listen(eng.sync_engine, "before_cursor_execute", record)
+
+    explain = sqlite3.connect(db_path)
+    failures = 0
+    for name, run, may_scan in _cases():
+        captured.clear()
+        await run()
+        bad = []
+        lines = []
+        for statement, params in captured:
+            plan = explain.execute("EXPLAIN QUERY PLAN " + statement, params or ()).fetchall()
+            for _id, _parent, _unused, detail in plan:
+                lines.append(f"      {detail}")
+                m = _FULL_SCAN.match(detail)
+                if m and m.group(1) not in may_scan:
+                    bad.append((statement, detail))
+        status = "FAIL" if bad else "ok"
+        print(f"{status:4}  {name}  ({len(captured)} queries)")
+        if verbose or bad:
+            for line in lines:
+                print(line)
+        for statement, detail in bad:
+            print(f"      full scan: {detail}\n      in: {' '.join(statement.split())}")
+        failures += bool(bad)
+    explain.close()
+    print(f"\n{failures} of {len(_cases())} cases fall back to a full table scan" if failures
+          else "\nEvery case uses an index.")
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "plans.db")
+        # bot.db reads these at import time.
+        os.environ["DATABASE_PATH"] = db_path
+        os.environ.pop("DATABASE_URL", None)
+        sys.path.insert(0, ROOT)
+        code = asyncio.run(_check(db_path, args.verbose))
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
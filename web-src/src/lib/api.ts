@@ -51,6 +51,12 @@ export interface ServerState {
   voice_channel_id: number | null;
   current: Track | null;
   queue: Track[];
+  /** Bumped on every change; events carry it too. */
+  version?: number;
+  /** Where `queue` starts in the play order, when only a window was asked for. */
+  queue_offset?: number;
+  queue_index?: number;
+  queue_length?: number;
 }
 
 export interface Hotkey {
@@ -60,6 +66,36 @@ export interface Hotkey {
   playlist_name?: string;
 }
 
+export interface LibraryPage {
+  tracks: Track[];
+  /** Pass back as `cursor` for the next page; null on the last one. */
+  next_cursor: string | null;
+  /** Only on the first page. */
+  total: number | null;
+}
+
+export interface LibraryQuery {
+  limit?: number;
+  cursor?: string | null;
+  q?: string;
+  sort?: 'newest' | 'oldest' | 'title' | 'title_desc';
+}
+
+export interface ImportJob {
+  id: string;
+  url: string;
+  status: 'queued' | 'fetching' | 'saving' | 'done' | 'failed';
+  /** Playlist entries found, usable or not. */
+  seen: number;
+  imported: number;
+  /** Deleted/private entries that could not be imported. */
+  skipped: number;
+  added_to_playlist: number;
+  error: string | null;
+  /** The first imported track, once the job is done. */
+  track: Track | null;
+}
+
 export type ApiResult<T = Record<string, unknown>> =
   | ({ ok: true } & T)
   | { ok: false; message: string };
@@ -89,6 +125,25 @@ async function request<T>(method: string, path: string, body?: unknown): Promise
   }
 }
 
+let nowPlayingTag: string | null = null;
+
+/**
+ * The bot's state, or null when it is unchanged since the last call (the
+ * server answers 304 to our ETag) or the request failed. Bypasses the HTTP
+ * cache on purpose: a cached body would carry a stale position.
+ */
+async function fetchNowPlaying(): Promise<ServerState | null> {
+  try {
+    const headers: Record<string, string> = nowPlayingTag ? { 'If-None-Match': nowPlayingTag } : {};
+    const response = await rawFetch('/api/now-playing', { cache: 'no-store', headers });
+    if (!response.ok) return null;
+    nowPlayingTag = response.headers.get('ETag');
+    return (await response.json()) as ServerState;
+  } catch {
+    return null;
+  }
+}
+
 /** GET that returns the parsed body, or null when anything at all goes wrong. */
 async function getJson<T>(path: string): Promise<T | null> {
   try {
@@ -101,7 +156,7 @@ async function getJson<T>(path: string): Promise<T | null> {
 }
 
 export const api = {
-  nowPlaying: () => getJson<ServerState>('/api/now-playing'),
+  nowPlaying: fetchNowPlaying,
   devices: () => getJson<{ devices: Device[] }>('/api/devices'),
 
   play: (playlistId: number, trackId: number | null, shuffled: boolean) =>
@@ -120,13 +175,18 @@ export const api = {
   setDevice: (device: 'browser' | 'voice', channelId: number | null) =>
     request('POST', '/api/device', { device, channel_id: channelId }),
 
-  libraryTracks: () => getJson<Track[]>('/api/library/tracks'),
-  importUrl: (url: string) =>
-    request<{ track: Track; tracks: Track[]; imported: number; skipped: number }>(
-      'POST',
-      '/api/library/import',
-      { url },
-    ),
+  libraryPage: (query: LibraryQuery) => {
+    const params = new URLSearchParams();
+    for (const [key, value] of Object.entries(query)) {
+      if (value !== undefined && value !== null && value !== '') params.set(key, String(value));
+    }
+    if (!params.has('limit')) params.set('limit', '100');
+    return getJson<LibraryPage>(`/api/library/tracks?${params}`);
+  },
+  /** Starts an import job; the answer comes back before the import is done. */
+  startImport: (url: string) =>
+    request<{ job: ImportJob; merged: boolean }>('POST', '/api/library/imports', { url }),
+  importJob: (id: string) => getJson<ImportJob>(`/api/library/imports/${id}`),
   deleteTrack: (trackId: number) => request('DELETE', `/api/library/tracks/${trackId}`),
 
   playlists: () => getJson<{ playlists: Playlist[] }>('/api/playlists'),
@@ -3,8 +3,12 @@
  *
  * Two independent players exist: this browser tab, and the bot sitting in a
  * Discord voice channel. `device` says which one the user is driving, and each
- * owns its own queue — the poll below must never overwrite the browser's queue
+ * owns its own queue — server updates must never overwrite the browser's queue
  * with the bot's, or local playback stops dead after the first track.
+ *
+ * The bot's state arrives as server-sent events: a snapshot on connect, then
+ * small changes as they happen. Polling is only the fallback while the event
+ * stream is down.
  */
 import { computed, reactive, ref } from 'vue';
 import { api, audioUrl, type Device, type ServerState, type Track } from './api';
@@ -13,6 +17,7 @@ import { shuffleInPlace, store } from './format';
 
 const LS = { device: 'bard.device', shuffle: 'bard.shuffle', volume: 'bard.volume' };
 const POLL_MS = 3000;
+const EVENTS_URL = '/api/now-playing/events';
 const VOICE_TICK_MS = 250;
 
 const IDLE_SERVER: ServerState = {
@@ -196,11 +201,19 @@ function stopVoiceInterpolation() {
   }
 }
 
-// ── Polling ───────────────────────────────────────────────────────────────
+// ── Server state ──────────────────────────────────────────────────────────
 
 async function poll(): Promise<void> {
   const state = await api.nowPlaying();
-  if (!state) return;
+  if (state) applyState(state);
+}
+
+/** After a voice control: the event stream reports the change, so only poll without it. */
+async function sync(): Promise<void> {
+  if (!streamOpen) await poll();
+}
+
+function applyState(state: ServerState): void {
   server.value = state;
 
   // Someone started playback from Discord (/music play) while this tab was
@@ -237,7 +250,7 @@ async function next(): Promise<void> {
     loadBrowserTrack(localStep(1));
   } else {
     await api.skip();
-    await poll();
+    await sync();
   }
 }
 
@@ -250,7 +263,7 @@ async function previous(): Promise<void> {
     loadBrowserTrack(localStep(-1));
   } else {
     await api.previous();
-    await poll();
+    await sync();
   }
 }
 
@@ -262,7 +275,7 @@ async function togglePlay(): Promise<void> {
   } else {
     if (isPlaying.value) await api.pause();
     else await api.resume();
-    await poll();
+    await sync();
   }
 }
 
@@ -279,7 +292,7 @@ async function stop(): Promise<void> {
     browserDuration.value = 0;
   } else {
     await api.stop();
-    await poll();
+    await sync();
   }
 }
 
@@ -292,7 +305,7 @@ async function setShuffled(value: boolean): Promise<void> {
     localSetQueue(local.tracks, local.playlistId, track ? track.id : null);
   } else {
     await api.shuffle(value);
-    await poll();
+    await sync();
   }
   notify.info(value ? 'Shuffle on' : 'Shuffle off');
 }
@@ -360,7 +373,7 @@ async function selectDevice(type: 'browser' | 'voice'): Promise<boolean> {
   audio.load();
   setDevice('voice');
   await api.shuffle(shuffled.value);
-  await poll();
+  await sync();
   notify.success('Playing in Discord voice');
   return true;
 }
@@ -390,7 +403,7 @@ async function playPlaylist(
       notify.error('Could not start playback', result.message);
       return;
     }
-    await poll();
+    await sync();
     return;
   }
 
@@ -415,12 +428,65 @@ function playLibrary(tracks: Track[], startTrackId: number): void {
   playTracks(tracks, null, startTrackId);
 }
 
+// ── Event stream ──────────────────────────────────────────────────────────
+
 let pollTimer: number | null = null;
+let events: EventSource | null = null;
+let streamOpen = false;
+
+function startPolling(): void {
+  if (pollTimer === null) pollTimer = window.setInterval(() => void poll(), POLL_MS);
+}
+
+function stopPolling(): void {
+  if (pollTimer !== null) {
+    window.clearInterval(pollTimer);
+    pollTimer = null;
+  }
+}
+
+function on<T>(name: string, handle: (data: T) => void): void {
+  events?.addEventListener(name, (event) => handle(JSON.parse((event as MessageEvent).data) as T));
+}
+
+function connectEvents(): void {
+  if (events) return;
+  events = new EventSource(EVENTS_URL);
+  events.addEventListener('open', () => {
+    streamOpen = true;
+    stopPolling();
+  });
+  events.addEventListener('error', () => {
+    // EventSource reconnects by itself (and the server re-sends a snapshot);
+    // poll meanwhile so the UI does not freeze. A closed stream (e.g. 401)
+    // stays closed, and the poll's own 401 handling takes over.
+    streamOpen = false;
+    startPolling();
+  });
+
+  on<ServerState>('state', applyState);
+  on<Pick<ServerState, 'current' | 'position_sec' | 'playing' | 'paused'>>('track', (data) =>
+    applyState({ ...server.value, ...data }),
+  );
+  on<{ paused: boolean; position_sec: number }>('paused', (data) =>
+    applyState({ ...server.value, ...data, playing: !data.paused }),
+  );
+  on<{ volume: number }>('volume', (data) => {
+    server.value = { ...server.value, volume: data.volume };
+  });
+  on<{ shuffled: boolean; order: number[] }>('queue', (data) => {
+    // Only the order is sent; the tracks themselves are already here.
+    const byId = new Map(server.value.queue.map((t) => [t.id, t]));
+    const queue = data.order.map((id) => byId.get(id)).filter((t): t is Track => !!t);
+    applyState({ ...server.value, shuffled: data.shuffled, queue });
+  });
+}
 
 function init(): void {
   void fetchDevices();
   void poll();
-  if (pollTimer === null) pollTimer = window.setInterval(() => void poll(), POLL_MS);
+  if (typeof EventSource === 'undefined') startPolling();
+  else connectEvents();
 }
 
 export const player = {
@@ -2,12 +2,17 @@
  * The two collections every view reads from. Kept in one place so that adding a
  * track in the library and seeing the playlist counts update does not depend on
  * which component happened to fetch last.
+ *
+ * The library comes a page at a time, newest first: the first screen costs the
+ * same however big the library gets.
  */
 import { ref } from 'vue';
 import { api, type Playlist, type Track } from './api';
 
 export const playlists = ref<Playlist[]>([]);
 export const libraryTracks = ref<Track[]>([]);
+export const libraryTotal = ref(0);
+export const libraryCursor = ref<string | null>(null);
 export const playlistsLoaded = ref(false);
 export const libraryLoaded = ref(false);
 
@@ -17,8 +22,43 @@ export async function refreshPlaylists(): Promise<void> {
   playlistsLoaded.value = true;
 }
 
+const LIBRARY_PAGE = 100;
+
+/** Reload the first page, dropping any further pages already loaded. */
 export async function refreshLibrary(): Promise<void> {
-  const data = await api.libraryTracks();
-  if (data) libraryTracks.value = data;
+  const data = await api.libraryPage({ limit: LIBRARY_PAGE });
+  if (data) {
+    libraryTracks.value = data.tracks;
+    libraryCursor.value = data.next_cursor;
+    libraryTotal.value = data.total ?? data.tracks.length;
+  }
   libraryLoaded.value = true;
 }
+
+/** Pages fetched at once when the whole library is needed (the server's maximum). */
+const LIBRARY_FETCH_ALL_PAGE = 500;
+
+/**
+ * Every track in the library, newest first: the pages already loaded plus the
+ * rest, fetched with the same cursor. The list on screen is left as it is.
+ * Null if a page could not be read.
+ */
+export async function wholeLibrary(): Promise<Track[] | null> {
+  let tracks = libraryTracks.value;
+  let cursor = libraryCursor.value;
+  while (cursor) {
+    const data = await api.libraryPage({ limit: LIBRARY_FETCH_ALL_PAGE, cursor });
+    if (!data) return null;
+    tracks = tracks.concat(data.tracks);
+    cursor = data.next_cursor;
+  }
+  return tracks;
+}
+
+export async function loadMoreLibrary(): Promise<void> {
+  if (!libraryCursor.value) return;
+  const data = await api.libraryPage({ limit: LIBRARY_PAGE, cursor: libraryCursor.value });
+  if (!data) return;
+  libraryTracks.value = libraryTracks.value.concat(data.tracks);
+  libraryCursor.value = data.next_cursor;
+}